@@ -0,0 +1,108 @@
+"""Compare download-then-extract with extracting a project package while it downloads.
+
+Builds a synthetic package (one large incompressible .blend, a set of compressible
+textures and many small cache files), serves it over local HTTP and times both
+worker paths.
+
+    python benchmarks/extract_pipeline.py --size-gb 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from renderfarm import worker
+from renderfarm.storage import sha256_file
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        return None
+
+
+def build_package(path: Path, size: int) -> None:
+    block = os.urandom(1024**2)
+    with ZipFile(path, "w", ZIP_DEFLATED, allowZip64=True) as archive:
+        with archive.open("scene.blend", "w", force_zip64=True) as entry:
+            for index in range(size // 2 // len(block)):
+                entry.write(block[index % 7:] + block[:index % 7])
+        for index in range(size // 4 // (32 * 1024**2)):
+            archive.writestr(f"textures/texture-{index:03d}.exr", os.urandom(8 * 1024**2) * 4)
+        written = size // 2 + size // 4
+        index = 0
+        while written < size:
+            data = os.urandom(64 * 1024)
+            archive.writestr(f"cache/fluid-{index:06d}.vdb", data, compress_type=ZIP_STORED)
+            written += len(data)
+            index += 1
+
+
+def peak_usage(folder: Path, stop: threading.Event, peak: list[int]) -> None:
+    while not stop.wait(0.2):
+        # Hardlinked project files and their blobs are one inode.
+        inodes = {(info := f.stat()).st_ino: info.st_size for f in folder.rglob("*") if f.is_file()}
+        peak[0] = max(peak[0], sum(inodes.values()))
+
+
+def timed(label: str, folder: Path, run) -> None:
+    shutil.rmtree(folder, ignore_errors=True)
+    folder.mkdir(parents=True)
+    stop, peak = threading.Event(), [0]
+    watcher = threading.Thread(target=peak_usage, args=(folder, stop, peak), daemon=True)
+    watcher.start()
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    watcher.join()
+    print(f"{label:<28} {elapsed:8.1f} s   peak disk {peak[0] / 1024**3:6.2f} GiB", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-gb", type=float, default=2)
+    parser.add_argument("--threads", type=int, default=worker.EXTRACT_THREADS)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory(prefix="blend-farm-bench-") as temp:
+        root = Path(temp)
+        served = root / "served"
+        served.mkdir()
+        package = served / "project.zip"
+        print(f"Building a {args.size_gb:g} GiB package…", flush=True)
+        build_package(package, int(args.size_gb * 1024**3))
+        checksum = sha256_file(package)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=str(served)))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        api = worker.Api({"server_url": f"http://127.0.0.1:{server.server_port}", "token": "bench"})
+        lease = {"package_url": api.base + "/project.zip", "lease_token": "bench", "package_sha256": checksum}
+        work = root / "work"
+        worker.CACHE_DIR = work
+
+        def download_then_extract() -> None:
+            archive = work / "project.zip.partial"
+            assert worker.download_package(api, lease, archive) == checksum
+            with ZipFile(archive) as source:
+                source.extractall(work / "project")
+            archive.unlink()
+
+        def pipelined() -> None:
+            assert worker.stream_package(api, lease, work / "project", work / "project.zip.partial", args.threads)[0] == checksum
+
+        try:
+            timed("download, hash, extract", work, download_then_extract)
+            timed(f"pipelined ({args.threads} threads)", work, pipelined)
+        finally:
+            server.shutdown()
+            api.client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ setup(
     package_data={"renderfarm": ["templates/*.html", "static/*"]},
     python_requires=">=3.10",
     install_requires=[
-        "fastapi>=0.110,<1", "uvicorn[standard]>=0.29,<1", "sqlalchemy>=2.0,<3",
+        "fastapi>=0.110,<1", "starlette>=0.39,<2", "uvicorn[standard]>=0.29,<1", "sqlalchemy>=2.0,<3",
         "jinja2>=3.1,<4", "python-multipart>=0.0.9,<1", "argon2-cffi>=23.1,<26",
         "itsdangerous>=2.1,<3", "boto3>=1.34,<2", "httpx>=0.27,<1", "platformdirs>=4.2,<5",
     ],
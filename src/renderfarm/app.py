@@ -7,34 +7,49 @@ import ipaddress
 import json
 import os
 import shutil
-import tempfile
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from datetime import timedelta
+from functools import lru_cache, partial
 from pathlib import Path
-from zipfile import ZIP_DEFLATED, ZipFile
+from urllib.parse import quote
 
 from fastapi import Depends, FastAPI, Form, Header, HTTPException, Request, Response
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from starlette.middleware.sessions import SessionMiddleware
 
+from .archive import archive_finished_jobs, frame_counts, job_frame, job_frames, restore_frames
 from .config import Settings
-from .database import Base, make_engine, make_session_factory, utcnow
-from .models import Admin, Enrollment, FarmSetting, Frame, FrameStatus, Job, JobStatus, UploadSession, Worker
-from .scheduler import Scheduler
+from .database import Base, make_engine, make_read_engine, make_session_factory, upgrade_schema, utcnow
+from .models import Admin, Chunk, Enrollment, FarmSetting, Frame, FrameStatus, Job, JobStatus, Package, UploadSession, Worker
+from .results import next_cursor, prebuild_results, result_entries, select_entries, stream_results
+from .scheduler import Scheduler, job_eta
 from .security import LoginLimiter, enrollment_expiry, hash_password, opaque_token, token_hash, verify_password
-from .storage import LocalStorage, StorageError, make_storage, materialize, sha256_file, validate_project_archive
+from .storage import LocalStorage, StorageError, UploadDigest, chunk_key, inspect_project_archive, make_storage, materialize, sha256_file
 
 settings = Settings.from_env()
 engine = make_engine(settings)
 SessionFactory = make_session_factory(engine)
+ReadSessionFactory = make_session_factory(make_read_engine(settings))
 storage = make_storage(settings)
-scheduler = Scheduler(SessionFactory)
+scheduler = Scheduler(SessionFactory, ReadSessionFactory)
 limiter = LoginLimiter()
+S3_MIN_PART = 5 * 1024**2
+S3_MAX_PART = 5 * 1024**3
+S3_MAX_PARTS = 10000
+PRESIGN_WINDOW = 32
+MAX_CHUNK_BYTES = 16 * 1024**2
+PEER_SEEN_SECONDS = 120
+# Multi-GB hashing, assembly and archive inspection get their own bounded pool so
+# a few large finalizations cannot exhaust the threads short requests rely on.
+transfers = ThreadPoolExecutor(max_workers=settings.transfer_threads, thread_name_prefix="blend-farm-transfer")
+upload_digests: dict[str, UploadDigest] = {}
 package_dir = Path(__file__).parent
 templates = Jinja2Templates(directory=str(package_dir / "templates"))
 
@@ -44,11 +59,18 @@ def bootstrap() -> None:
         raise RuntimeError("Set a strong SECRET_KEY and ADMIN_PASSWORD before starting an HTTPS deployment")
     settings.data_dir.mkdir(parents=True, exist_ok=True)
     Base.metadata.create_all(engine)
+    upgrade_schema(engine)
     with SessionFactory.begin() as db:
         if not db.scalar(select(Admin).limit(1)):
             db.add(Admin(username=settings.admin_username, password_hash=hash_password(settings.admin_password)))
         if not db.get(FarmSetting, "blender_version"):
             db.add(FarmSetting(key="blender_version", value=settings.blender_version))
+        if not db.get(FarmSetting, "peer_secret"):
+            db.add(FarmSetting(key="peer_secret", value=opaque_token(32)))
+
+
+async def in_transfer_pool(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(transfers, partial(function, *args))
 
 
 async def maintenance() -> None:
@@ -56,6 +78,34 @@ async def maintenance() -> None:
         await asyncio.sleep(15)
         await asyncio.to_thread(scheduler.reconcile)
         await asyncio.to_thread(cleanup_expired_uploads)
+        await asyncio.to_thread(archive_finished_jobs, SessionFactory)
+        await asyncio.to_thread(storage.ledger.save)
+
+
+async def results_builder() -> None:
+    """Grow each job's results ZIP as frames finish, so it is ready when the job ends."""
+    while True:
+        await asyncio.sleep(15)
+        try:
+            await asyncio.to_thread(prebuild_results, SessionFactory, storage, settings.data_dir / "results", settings.results_prebuild_bytes)
+        except Exception as exc:
+            print(f"Results prebuild failed: {exc}", flush=True)
+
+
+async def usage_reconciler() -> None:
+    """Correct drift in the storage usage ledger with an occasional full scan."""
+    while True:
+        try:
+            await asyncio.to_thread(storage.reconcile_usage)
+        except Exception as exc:
+            print(f"Storage usage scan failed: {exc}", flush=True)
+        await asyncio.sleep(settings.storage_reconcile_seconds)
+
+
+async def heartbeat_writer() -> None:
+    while True:
+        await asyncio.sleep(settings.heartbeat_flush_seconds)
+        await asyncio.to_thread(scheduler.flush_heartbeats)
 
 
 def cleanup_expired_uploads() -> int:
@@ -70,8 +120,21 @@ def cleanup_expired_uploads() -> int:
                 except Exception:
                     continue
             shutil.rmtree(settings.data_dir / "uploads" / upload.id, ignore_errors=True)
+            upload_digests.pop(upload.id, None)
             upload.status = "expired"
             cleaned += 1
+        # Finished project uploads that never became a job stop holding their package.
+        unused = db.scalars(select(UploadSession).where(UploadSession.purpose == "project", UploadSession.status == "ready", UploadSession.owner_id.is_(None), UploadSession.expires_at < now)).all()
+        for upload in unused:
+            upload.status = "expired"
+        db.flush()
+        for package in filter(None, (db.get(Package, sha256) for sha256 in {upload.sha256 for upload in unused})):
+            cleaned += reclaim_package(db, package)
+        # Chunks sent for a manifest that was never committed.
+        for chunk in db.scalars(select(Chunk).where(Chunk.ref_count <= 0, Chunk.created_at < now - timedelta(hours=24), unpinned(now))).all():
+            storage.delete_prefix(chunk_key(chunk.sha256))
+            db.delete(chunk)
+            cleaned += 1
     return cleaned
 
 
@@ -79,9 +142,15 @@ def cleanup_expired_uploads() -> int:
 async def lifespan(_app: FastAPI):
     bootstrap()
     scheduler.reconcile()
-    task = asyncio.create_task(maintenance())
+    tasks = [asyncio.create_task(maintenance()), asyncio.create_task(heartbeat_writer()), asyncio.create_task(usage_reconciler())]
+    if settings.results_prebuild:
+        tasks.append(asyncio.create_task(results_builder()))
     yield
-    task.cancel()
+    for task in tasks:
+        task.cancel()
+    scheduler.flush_heartbeats()
+    storage.ledger.save()
+    transfers.shutdown(wait=False, cancel_futures=True)
 
 
 app = FastAPI(title="Blend Farm", version="0.1.0", lifespan=lifespan)
@@ -121,6 +190,14 @@ def db_session():
         db.close()
 
 
+def read_session():
+    db = ReadSessionFactory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def admin_required(request: Request, db: Session = Depends(db_session)) -> Admin:
     admin_id = request.session.get("admin_id")
     admin = db.get(Admin, admin_id) if admin_id else None
@@ -161,7 +238,7 @@ def session_json(request: Request, **extra):
 @app.get("/healthz")
 def health():
     try:
-        with SessionFactory() as db:
+        with ReadSessionFactory() as db:
             db.execute(select(1))
         storage.health()
         return {"ok": True, "database": "ok", "storage": "ok"}
@@ -199,7 +276,7 @@ def logout(request: Request, _admin: Admin = Depends(admin_required), _csrf=Depe
 
 
 @app.get("/", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(db_session)):
+def dashboard(request: Request, db: Session = Depends(read_session)):
     admin_id = request.session.get("admin_id")
     if not admin_id or not db.get(Admin, admin_id):
         return RedirectResponse("/login", 303)
@@ -207,7 +284,8 @@ def dashboard(request: Request, db: Session = Depends(db_session)):
     workers = db.scalars(select(Worker).order_by(Worker.created_at.desc())).all()
     version = db.get(FarmSetting, "blender_version").value
     usage = storage.size()
-    counts = {j.id: dict(db.execute(select(Frame.status, func.count()).where(Frame.job_id == j.id).group_by(Frame.status)).all()) for j in jobs}
+    counts = {j.id: frame_counts(db, j) for j in jobs}
+    etas = {j.id: job_eta(db, j) for j in jobs if j.status in (JobStatus.queued.value, JobStatus.running.value)}
     active_frames = {worker.id: db.scalar(select(Frame).where(Frame.worker_id == worker.id, Frame.status.in_([FrameStatus.leased.value, FrameStatus.rendering.value]))) for worker in workers}
     tunnel_status = "not configured"
     if settings.exposure_mode == "cloudflare" and settings.tunnel_metrics_url:
@@ -216,19 +294,20 @@ def dashboard(request: Request, db: Session = Depends(db_session)):
                 tunnel_status = "connected" if response.status == 200 else "degraded"
         except Exception:
             tunnel_status = "disconnected"
-    return templates.TemplateResponse(request=request, name="dashboard.html", context=session_json(request, jobs=jobs, workers=workers, active_frames=active_frames, version=version, usage=usage, counts=counts, public_url=settings.public_url, storage_backend=settings.storage_backend, exposure_mode=settings.exposure_mode, tunnel_status=tunnel_status))
+    return templates.TemplateResponse(request=request, name="dashboard.html", context=session_json(request, jobs=jobs, workers=workers, active_frames=active_frames, version=version, usage=usage, counts=counts, etas=etas, public_url=settings.public_url, storage_backend=settings.storage_backend, exposure_mode=settings.exposure_mode, tunnel_status=tunnel_status))
 
 
 @app.get("/jobs/{job_id}", response_class=HTMLResponse)
-def job_detail(job_id: str, request: Request, _admin: Admin = Depends(admin_required), db: Session = Depends(db_session)):
+def job_detail(job_id: str, request: Request, _admin: Admin = Depends(admin_required), db: Session = Depends(read_session)):
     job = db.get(Job, job_id)
     if not job:
         raise HTTPException(404)
-    frames = db.scalars(select(Frame).where(Frame.job_id == job_id).order_by(Frame.frame_number)).all()
+    frames = job_frames(db, job)
+    usage = storage.usage(f"jobs/{job.id}") + storage.usage(job.package_key)
     return templates.TemplateResponse(
         request=request,
         name="job.html",
-        context=session_json(request, job=job, frames=frames, has_failed_frames=any(frame.status == FrameStatus.failed.value for frame in frames)),
+        context=session_json(request, job=job, frames=frames, usage=usage, has_failed_frames=any(frame.status == FrameStatus.failed.value for frame in frames)),
     )
 
 
@@ -241,13 +320,13 @@ def create_job(request: Request, name: str = Form(...), upload_id: str = Form(..
     upload = db.get(UploadSession, upload_id)
     if not upload or upload.owner_kind != "admin" or upload.purpose != "project" or upload.status != "ready":
         raise HTTPException(400, "project upload is not ready")
-    temp = materialize(storage, upload.storage_key)
-    try:
-        blend_path = validate_project_archive(temp, settings.max_archive_bytes, settings.max_expanded_bytes)
-    finally:
-        temp.unlink(missing_ok=True)
+    if upload.expires_at.replace(tzinfo=None) < utcnow().replace(tzinfo=None):
+        raise HTTPException(400, "project upload has expired; upload it again")
+    blend_path = project_archive(upload)["blend_path"]
+    package = db.get(Package, upload.sha256) or register_package(db, upload)
+    package.ref_count = Package.ref_count + 1
     next_order = (db.scalar(select(func.max(Job.queue_order))) or 0) + 1
-    job = Job(name=name[:160], frame_start=frame_start, frame_end=frame_end, output_format=output_format, package_key=upload.storage_key, package_sha256=upload.sha256, blend_path=blend_path, queue_order=next_order)
+    job = Job(name=name[:160], frame_start=frame_start, frame_end=frame_end, output_format=output_format, package_key=package.storage_key, package_sha256=package.sha256, blend_path=blend_path, queue_order=next_order)
     db.add(job)
     db.flush()
     db.add_all([Frame(job_id=job.id, frame_number=i) for i in range(frame_start, frame_end + 1)])
@@ -268,9 +347,13 @@ def job_action(job_id: str, request: Request, action: str = Form(...), _admin: A
     elif action == "cancel" and job.status not in (JobStatus.completed.value, JobStatus.failed.value):
         job.status = JobStatus.cancelled.value
     elif action == "retry":
-        for frame in job.frames:
+        for frame in restore_frames(db, job):
             if frame.status == FrameStatus.failed.value:
                 frame.status, frame.attempts, frame.error_text = FrameStatus.pending.value, 0, ""
+        if job.result_zip_key:
+            storage.delete_prefix(job.result_zip_key)
+            job.result_zip_key = None
+        (settings.data_dir / "results" / f"{job.id}.zip.partial").unlink(missing_ok=True)
         job.status = JobStatus.queued.value
     elif action in ("up", "down"):
         direction = -1 if action == "up" else 1
@@ -289,7 +372,7 @@ def delete_job(job_id: str, request: Request, confirm: str = Form(...), _admin:
     if not job or confirm != job.name:
         raise HTTPException(400, "type the job name exactly to confirm deletion")
     storage.delete_prefix(f"jobs/{job.id}")
-    storage.delete_prefix(job.package_key)
+    release_package(db, job)
     db.delete(job)
     db.commit()
     return RedirectResponse("/", 303)
@@ -333,59 +416,129 @@ def rename_worker(worker_id: str, request: Request, name: str = Form(...), _admi
     return RedirectResponse("/", 303)
 
 
-def create_upload(db: Session, *, purpose: str, owner_kind: str, owner_id: str | None, filename: str, total_size: int, checksum: str, content_type: str, storage_key: str | None = None) -> tuple[UploadSession, dict]:
+def upload_chunk_size(total_size: int, requested: int | None) -> int:
+    if settings.storage_backend != "s3":
+        # Local parts pass through the proxy's request body limit.
+        return min(requested or settings.chunk_size, settings.chunk_size)
+    chunk = min(max(requested or settings.chunk_size, S3_MIN_PART), S3_MAX_PART)
+    return max(chunk, -(-total_size // S3_MAX_PARTS))
+
+
+def create_upload(db: Session, *, purpose: str, owner_kind: str, owner_id: str | None, filename: str, total_size: int, checksum: str, content_type: str, storage_key: str | None = None, chunk_size: int | None = None) -> tuple[UploadSession, dict]:
     if total_size <= 0 or total_size > settings.max_archive_bytes:
         raise HTTPException(413, "artifact exceeds configured limit")
-    upload = UploadSession(purpose=purpose, owner_kind=owner_kind, owner_id=owner_id, storage_key=storage_key or f"uploads/{opaque_token(18)}", filename=Path(filename).name[:240], total_size=total_size, sha256=checksum or "pending", expires_at=utcnow() + timedelta(hours=24))
+    if chunk_size is not None and chunk_size < 1024**2:
+        raise HTTPException(400, "chunk size must be at least 1 MiB")
+    upload = UploadSession(purpose=purpose, owner_kind=owner_kind, owner_id=owner_id, storage_key=storage_key or f"uploads/{opaque_token(18)}", filename=Path(filename).name[:240], total_size=total_size, chunk_size=upload_chunk_size(total_size, chunk_size), sha256=checksum or "pending", expires_at=utcnow() + timedelta(hours=24))
     db.add(upload)
     db.flush()
-    response = {"id": upload.id, "backend": settings.storage_backend, "chunk_size": settings.chunk_size}
+    response = {"id": upload.id, "backend": settings.storage_backend, "chunk_size": upload.chunk_size, "part_count": part_count(upload), "concurrency": settings.upload_concurrency}
     if settings.storage_backend == "s3":
+        # Part URLs are presigned on demand in small windows; see presign_parts.
         upload.backend_upload_id = storage.begin_multipart(upload.storage_key, content_type)
-        count = (total_size + settings.chunk_size - 1) // settings.chunk_size
-        response["parts"] = [{"part_number": n, "url": storage.presign_part(upload.storage_key, upload.backend_upload_id, n)} for n in range(1, count + 1)]
     else:
         (settings.data_dir / "uploads" / upload.id).mkdir(parents=True, exist_ok=True)
     db.commit()
     return upload, response
 
 
+def presign_parts(upload: UploadSession, body: dict) -> dict:
+    if settings.storage_backend != "s3" or upload.status != "open":
+        raise HTTPException(400, "upload does not use presigned parts")
+    start = int(body.get("start", 1))
+    numbers = range(max(start, 1), min(start + min(int(body.get("count", PRESIGN_WINDOW)), PRESIGN_WINDOW), part_count(upload) + 1))
+    parts = [{"part_number": n, "url": storage.presign_part(upload.storage_key, upload.backend_upload_id, n, settings.presign_seconds)} for n in numbers]
+    return {"parts": parts, "expires_in": settings.presign_seconds}
+
+
 @app.post("/api/v1/uploads")
 async def admin_upload_init(request: Request, _admin: Admin = Depends(admin_required), _csrf=Depends(csrf_required), db: Session = Depends(db_session)):
     body = await request.json()
-    upload, response = create_upload(db, purpose="project", owner_kind="admin", owner_id=None, filename=body.get("filename", "project.zip"), total_size=int(body.get("total_size", 0)), checksum=body.get("sha256", ""), content_type="application/zip")
+    if body.get("sha256") and (reused := await asyncio.to_thread(reuse_package, db, body)):
+        return reused
+    upload, response = await asyncio.to_thread(partial(create_upload, db, purpose="project", owner_kind="admin", owner_id=None, filename=body.get("filename", "project.zip"), total_size=int(body.get("total_size", 0)), checksum=body.get("sha256", ""), content_type="application/zip", chunk_size=int(body["chunk_size"]) if body.get("chunk_size") else None))
     return response
 
 
+def admin_upload(db: Session, upload_id: str) -> UploadSession:
+    upload = db.get(UploadSession, upload_id)
+    if not upload or upload.owner_kind != "admin":
+        raise HTTPException(404)
+    return upload
+
+
+@app.post("/api/v1/uploads/{upload_id}/presign")
+async def admin_upload_presign(upload_id: str, request: Request, _admin: Admin = Depends(admin_required), _csrf=Depends(csrf_required), db: Session = Depends(db_session)):
+    body = await request.json()
+    return await asyncio.to_thread(lambda: presign_parts(admin_upload(db, upload_id), body))
+
+
+def part_count(upload: UploadSession) -> int:
+    chunk = upload.chunk_size or settings.chunk_size
+    return (upload.total_size + chunk - 1) // chunk
+
+
 async def save_local_part(upload: UploadSession, part_number: int, request: Request, checksum: str | None):
-    max_parts = (upload.total_size + settings.chunk_size - 1) // settings.chunk_size
-    if settings.storage_backend != "local" or part_number < 1 or part_number > max_parts or upload.expires_at.replace(tzinfo=None) < utcnow().replace(tzinfo=None):
+    if settings.storage_backend != "local" or part_number < 1 or part_number > part_count(upload) or upload.expires_at.replace(tzinfo=None) < utcnow().replace(tzinfo=None):
         raise HTTPException(400, "invalid local upload part")
-    target = settings.data_dir / "uploads" / upload.id / f"{part_number:05d}.part"
+    folder = settings.data_dir / "uploads" / upload.id
+    marker = folder / f"{part_number:05d}.done"
+    chunk = upload.chunk_size or settings.chunk_size
+    offset = (part_number - 1) * chunk
+    expected = min(chunk, upload.total_size - offset)
+    # Parts are written straight into place in one sparse file, so finalizing
+    # never has to concatenate them.
+    handle = os.open(folder / "data.partial", os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+    progress = upload_digests.setdefault(upload.id, UploadDigest())
+    whole = progress.candidate(part_number)
     digest = hashlib.sha256()
     size = 0
-    with target.open("wb") as output:
+    marker.unlink(missing_ok=True)
+    with os.fdopen(handle, "r+b") as output:
+        output.seek(offset)
         async for chunk in request.stream():
             size += len(chunk)
-            if size > settings.chunk_size:
-                target.unlink(missing_ok=True)
-                raise HTTPException(413, "chunk exceeds 32 MiB")
+            if size > expected:
+                raise HTTPException(413, "chunk exceeds its part size")
             digest.update(chunk)
+            if whole:
+                whole.update(chunk)
             output.write(chunk)
+    if size != expected:
+        raise HTTPException(422, "chunk is shorter than its part size")
     if checksum and not hmac.compare_digest(digest.hexdigest(), checksum.lower()):
-        target.unlink(missing_ok=True)
         raise HTTPException(422, "chunk checksum mismatch")
+    marker.write_text(json.dumps({"sha256": digest.hexdigest(), "size": size}), encoding="utf-8")
+    progress.accept(part_number, whole, size)
     return {"ok": True, "sha256": digest.hexdigest(), "size": size}
 
 
 @app.put("/api/v1/uploads/{upload_id}/parts/{part_number}")
 async def admin_upload_part(upload_id: str, part_number: int, request: Request, x_chunk_sha256: str | None = Header(None), _admin: Admin = Depends(admin_required), _csrf=Depends(csrf_required), db: Session = Depends(db_session)):
-    upload = db.get(UploadSession, upload_id)
+    upload = await asyncio.to_thread(db.get, UploadSession, upload_id)
     if not upload or upload.owner_kind != "admin" or upload.status != "open":
         raise HTTPException(404)
     return await save_local_part(upload, part_number, request, x_chunk_sha256)
 
 
+def received_parts(upload: UploadSession) -> dict:
+    if upload.status != "open":
+        raise HTTPException(409, "upload is no longer open")
+    if settings.storage_backend == "s3":
+        parts = storage.list_parts(upload.storage_key, upload.backend_upload_id)
+    else:
+        parts = []
+        for marker in sorted((settings.data_dir / "uploads" / upload.id).glob("*.done")):
+            record = json.loads(marker.read_text(encoding="utf-8") or "{}")
+            parts.append({"part_number": int(marker.stem), "sha256": record.get("sha256"), "size": record.get("size")})
+    return {"id": upload.id, "backend": settings.storage_backend, "chunk_size": upload.chunk_size or settings.chunk_size, "part_count": part_count(upload), "concurrency": settings.upload_concurrency, "parts": parts}
+
+
+@app.get("/api/v1/uploads/{upload_id}/parts")
+async def admin_upload_parts(upload_id: str, _admin: Admin = Depends(admin_required), db: Session = Depends(db_session)):
+    return await asyncio.to_thread(lambda: received_parts(admin_upload(db, upload_id)))
+
+
 def finalize_upload(db: Session, upload: UploadSession, parts: list[dict]) -> UploadSession:
     if upload.status == "ready":
         return upload
@@ -394,50 +547,280 @@ def finalize_upload(db: Session, upload: UploadSession, parts: list[dict]) -> Up
         temp = materialize(storage, upload.storage_key)
     else:
         folder = settings.data_dir / "uploads" / upload.id
-        temp = folder / "assembled.partial"
-        with temp.open("wb") as output:
-            for part in sorted(folder.glob("*.part")):
-                with part.open("rb") as source:
-                    shutil.copyfileobj(source, output)
-        if temp.stat().st_size != upload.total_size:
-            raise HTTPException(422, "assembled upload size does not match")
+        temp = folder / "data.partial"
+        if any(not (folder / f"{n:05d}.done").exists() for n in range(1, part_count(upload) + 1)):
+            raise HTTPException(422, "upload is missing parts")
     try:
         if temp.stat().st_size != upload.total_size:
             raise HTTPException(422, "uploaded artifact size does not match")
-        checksum = sha256_file(temp)
+        if settings.storage_backend == "local":
+            progress = upload_digests.pop(upload.id, None) or UploadDigest()
+            checksum = progress.finish(temp)
+        else:
+            checksum = sha256_file(temp)
         if upload.sha256 != "pending" and not hmac.compare_digest(checksum, upload.sha256):
             raise HTTPException(422, "artifact checksum mismatch")
         upload.sha256 = checksum
         if settings.storage_backend == "local":
-            storage.put_file(upload.storage_key, temp)
+            storage.move_file(upload.storage_key, temp)
     finally:
         if settings.storage_backend == "s3":
             temp.unlink(missing_ok=True)
         else:
             shutil.rmtree(settings.data_dir / "uploads" / upload.id, ignore_errors=True)
-    upload.status = "ready"
+    # A finished upload has a day to become a job before cleanup reclaims it.
+    upload.status, upload.expires_at = "ready", utcnow() + timedelta(hours=24)
     db.commit()
     return upload
 
 
+def project_archive(upload: UploadSession) -> dict:
+    """Validate an uploaded project once, in place, and cache the result on the upload."""
+    if not upload.archive_json:
+        with storage.open_read(upload.storage_key) as source:
+            archive = inspect_project_archive(source, settings.max_archive_bytes, settings.max_expanded_bytes)
+        upload.archive_json = json.dumps({"blend_path": archive.blend_path, "expanded_size": archive.expanded_size, "files": archive.files})
+    return json.loads(upload.archive_json)
+
+
+def register_package(db: Session, upload: UploadSession) -> Package:
+    package = Package(sha256=upload.sha256, storage_key=upload.storage_key, size=upload.total_size, archive_json=json.dumps(project_archive(upload)), ref_count=0)
+    db.add(package)
+    db.flush()
+    return package
+
+
+def package_pending(db: Session, sha256: str) -> bool:
+    """Whether a finished, unexpired project upload not yet used by a job still points at this package."""
+    return db.scalar(select(UploadSession.id).where(UploadSession.sha256 == sha256, UploadSession.purpose == "project", UploadSession.status == "ready", UploadSession.owner_id.is_(None), UploadSession.expires_at > utcnow()).limit(1)) is not None
+
+
+def reclaim_package(db: Session, package: Package) -> bool:
+    if package.ref_count > 0 or package_pending(db, package.sha256):
+        return False
+    storage.delete_prefix(package.storage_key)
+    if package.manifest_key:
+        release_chunks(db, package)
+    db.delete(package)
+    return True
+
+
+def release_package(db: Session, job: Job) -> None:
+    package = db.get(Package, job.package_sha256)
+    if package is None:
+        # Jobs created before packages were shared own their package outright.
+        if not db.scalar(select(func.count()).select_from(Job).where(Job.package_key == job.package_key, Job.id != job.id)):
+            storage.delete_prefix(job.package_key)
+        return
+    package.ref_count = Package.ref_count - 1
+    db.flush()
+    db.refresh(package)
+    reclaim_package(db, package)
+
+
+def reuse_package(db: Session, body: dict) -> dict | None:
+    """Skip the upload entirely when the farm already stores a package with this hash."""
+    package = db.get(Package, str(body.get("sha256", "")).lower())
+    if not package or package.size != int(body.get("total_size", 0)):
+        return None
+    upload = UploadSession(purpose="project", owner_kind="admin", owner_id=None, storage_key=f"uploads/{opaque_token(18)}", filename=Path(body.get("filename", "project.zip")).name[:240], total_size=package.size, sha256=package.sha256, archive_json=package.archive_json, status="ready", expires_at=utcnow() + timedelta(hours=24))
+    db.add(upload)
+    db.commit()
+    archive = json.loads(package.archive_json)
+    return {"id": upload.id, "status": "ready", "sha256": package.sha256, "blend_path": archive["blend_path"], "expanded_size": archive["expanded_size"]}
+
+
+def complete_admin_upload(db: Session, upload_id: str, parts: list[dict]) -> dict:
+    upload = admin_upload(db, upload_id)
+    finalize_upload(db, upload, parts)
+    package = db.get(Package, upload.sha256)
+    if not package:
+        try:
+            with db.begin_nested():
+                package = register_package(db, upload)
+        except IntegrityError:
+            # A concurrent completion of the same bytes registered the package first.
+            package = db.get(Package, upload.sha256)
+    if package.storage_key != upload.storage_key:
+        # Identical bytes are already stored; drop this copy and share that one.
+        storage.delete_prefix(upload.storage_key)
+        upload.archive_json = package.archive_json
+    archive = project_archive(upload)
+    db.commit()
+    return {"id": upload.id, "sha256": upload.sha256, "blend_path": archive["blend_path"], "expanded_size": archive["expanded_size"]}
+
+
 @app.post("/api/v1/uploads/{upload_id}/complete")
 async def admin_upload_complete(upload_id: str, request: Request, _admin: Admin = Depends(admin_required), _csrf=Depends(csrf_required), db: Session = Depends(db_session)):
-    upload = db.get(UploadSession, upload_id)
-    if not upload or upload.owner_kind != "admin":
-        raise HTTPException(404)
     body = await request.json()
-    finalize_upload(db, upload, body.get("parts", []))
-    temp = materialize(storage, upload.storage_key)
+    return await in_transfer_pool(complete_admin_upload, db, upload_id, body.get("parts", []))
+
+
+def delta_enabled() -> None:
+    if not settings.delta_uploads:
+        raise HTTPException(404, "delta uploads are disabled")
+
+
+def manifest_chunks(raw: list) -> list[tuple[str, int]]:
     try:
-        blend_path = validate_project_archive(temp, settings.max_archive_bytes, settings.max_expanded_bytes)
+        chunks = [(str(sha).lower(), int(size)) for sha, size in raw]
+        for sha, size in chunks:
+            chunk_key(sha)
+            if not 0 < size <= MAX_CHUNK_BYTES:
+                raise ValueError(sha)
+    except (TypeError, ValueError, StorageError):
+        raise HTTPException(400, "invalid chunk list") from None
+    return chunks
+
+
+def known_chunks(db: Session, hashes: set[str]) -> dict[str, Chunk]:
+    found: dict[str, Chunk] = {}
+    ordered = sorted(hashes)
+    for start in range(0, len(ordered), 500):
+        found.update((chunk.sha256, chunk) for chunk in db.scalars(select(Chunk).where(Chunk.sha256.in_(ordered[start:start + 500]))))
+    return found
+
+
+def unpinned(now):
+    return (Chunk.pinned_until.is_(None)) | (Chunk.pinned_until < now)
+
+
+def pin_chunks(db: Session, hashes: set[str]) -> dict[str, Chunk]:
+    """Stored chunks among hashes, kept for a day even if a job deletion releases them before the manifest is committed."""
+    ordered = sorted(hashes)
+    for start in range(0, len(ordered), 500):
+        db.execute(update(Chunk).where(Chunk.sha256.in_(ordered[start:start + 500])).values(pinned_until=utcnow() + timedelta(hours=24)))
+    db.commit()
+    return known_chunks(db, hashes)
+
+
+@app.post("/api/v1/chunks/missing")
+async def missing_chunks(request: Request, _admin: Admin = Depends(admin_required), _csrf=Depends(csrf_required), db: Session = Depends(db_session)):
+    delta_enabled()
+    body = await request.json()
+    hashes = [str(sha).lower() for sha in body.get("chunks", [])][:10000]
+    known = await asyncio.to_thread(pin_chunks, db, set(hashes))
+    return {"missing": [sha for sha in dict.fromkeys(hashes) if sha not in known]}
+
+
+def store_chunk(db: Session, sha256: str, temp: Path, size: int) -> None:
+    if db.get(Chunk, sha256) is None:
+        storage.move_file(chunk_key(sha256), temp)
+        db.add(Chunk(sha256=sha256, size=size))
+        db.commit()
+
+
+@app.put("/api/v1/chunks/{sha256}")
+async def upload_chunk(sha256: str, request: Request, _admin: Admin = Depends(admin_required), _csrf=Depends(csrf_required), db: Session = Depends(db_session)):
+    delta_enabled()
+    try:
+        chunk_key(sha256)
+    except StorageError:
+        raise HTTPException(400, "invalid chunk hash") from None
+    folder = settings.data_dir / "uploads"
+    folder.mkdir(parents=True, exist_ok=True)
+    temp = folder / f"chunk-{opaque_token(12)}.partial"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with temp.open("wb") as output:
+            async for piece in request.stream():
+                size += len(piece)
+                if size > MAX_CHUNK_BYTES:
+                    raise HTTPException(413, "chunk is too large")
+                digest.update(piece)
+                output.write(piece)
+        if not hmac.compare_digest(digest.hexdigest(), sha256):
+            raise HTTPException(422, "chunk checksum mismatch")
+        await asyncio.to_thread(store_chunk, db, sha256, temp, size)
     finally:
         temp.unlink(missing_ok=True)
-    return {"id": upload.id, "sha256": upload.sha256, "blend_path": blend_path}
+    return {"ok": True, "size": size}
 
 
-@app.post("/api/v1/worker/enroll")
-async def enroll_worker(request: Request, db: Session = Depends(db_session)):
+def manifest_key(sha256: str) -> str:
+    return f"manifests/{sha256}.json"
+
+
+def read_manifest(package: Package) -> dict:
+    with storage.open_read(package.manifest_key) as source:
+        return json.loads(source.read())
+
+
+def attach_manifest(db: Session, package: Package, chunks: list[tuple[str, int]]) -> None:
+    temp = settings.data_dir / "uploads" / f"manifest-{opaque_token(12)}.partial"
+    temp.write_text(json.dumps({"sha256": package.sha256, "size": package.size, "chunks": chunks}, separators=(",", ":")), encoding="utf-8")
+    storage.move_file(manifest_key(package.sha256), temp, "application/json")
+    package.manifest_key = manifest_key(package.sha256)
+    hashes = sorted({sha for sha, _size in chunks})
+    for start in range(0, len(hashes), 500):
+        db.execute(update(Chunk).where(Chunk.sha256.in_(hashes[start:start + 500])).values(ref_count=Chunk.ref_count + 1))
+
+
+def release_chunks(db: Session, package: Package) -> None:
+    hashes = sorted({sha for sha, _size in read_manifest(package)["chunks"]})
+    for start in range(0, len(hashes), 500):
+        batch = hashes[start:start + 500]
+        db.execute(update(Chunk).where(Chunk.sha256.in_(batch)).values(ref_count=Chunk.ref_count - 1))
+        for chunk in db.scalars(select(Chunk).where(Chunk.sha256.in_(batch), Chunk.ref_count <= 0, unpinned(utcnow()))).all():
+            storage.delete_prefix(chunk_key(chunk.sha256))
+            db.delete(chunk)
+    storage.delete_prefix(package.manifest_key)
+    # The same package may come back with different chunk boundaries.
+    manifest_hashes.cache_clear()
+
+
+def commit_manifest(db: Session, body: dict) -> dict:
+    """Rebuild a project package from stored chunks and register it with its manifest."""
+    chunks = manifest_chunks(body.get("chunks", []))
+    total = sum(size for _sha, size in chunks)
+    if not chunks or total > settings.max_archive_bytes:
+        raise HTTPException(413, "artifact exceeds configured limit")
+    missing = sorted({sha for sha, _size in chunks} - set(known_chunks(db, {sha for sha, _size in chunks})))
+    if missing:
+        raise HTTPException(409, {"message": "chunks are missing", "missing": missing[:1000]})
+    upload = UploadSession(purpose="project", owner_kind="admin", owner_id=None, storage_key=f"uploads/{opaque_token(18)}", filename=Path(body.get("filename", "project.zip")).name[:240], total_size=total, sha256="pending", expires_at=utcnow() + timedelta(hours=24))
+    db.add(upload)
+    db.flush()
+    folder = settings.data_dir / "uploads" / upload.id
+    folder.mkdir(parents=True, exist_ok=True)
+    temp = folder / "data.partial"
+    try:
+        digest = hashlib.sha256()
+        with temp.open("wb") as output:
+            for sha, _size in chunks:
+                with storage.open_read(chunk_key(sha)) as source:
+                    while block := source.read(1024 * 1024):
+                        digest.update(block)
+                        output.write(block)
+        upload.sha256 = digest.hexdigest()
+        package = db.get(Package, upload.sha256)
+        if package:
+            upload.archive_json = package.archive_json
+        else:
+            with temp.open("rb") as source:
+                archive = inspect_project_archive(source, settings.max_archive_bytes, settings.max_expanded_bytes)
+            upload.archive_json = json.dumps({"blend_path": archive.blend_path, "expanded_size": archive.expanded_size, "files": archive.files})
+            storage.move_file(upload.storage_key, temp, "application/zip")
+            package = register_package(db, upload)
+        if not package.manifest_key:
+            attach_manifest(db, package, chunks)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    upload.status = "ready"
+    db.commit()
+    archive = json.loads(upload.archive_json)
+    return {"id": upload.id, "sha256": upload.sha256, "blend_path": archive["blend_path"], "expanded_size": archive["expanded_size"]}
+
+
+@app.post("/api/v1/uploads/manifest")
+async def admin_upload_manifest(request: Request, _admin: Admin = Depends(admin_required), _csrf=Depends(csrf_required), db: Session = Depends(db_session)):
+    delta_enabled()
     body = await request.json()
+    return await in_transfer_pool(commit_manifest, db, body)
+
+
+def register_worker(db: Session, body: dict) -> dict:
     enrollment = db.scalar(select(Enrollment).where(Enrollment.code_hash == token_hash(str(body.get("code", "")).upper()), Enrollment.used_at.is_(None), Enrollment.expires_at > utcnow()))
     if not enrollment:
         raise HTTPException(401, "enrollment code is invalid or expired")
@@ -449,31 +832,71 @@ async def enroll_worker(request: Request, db: Session = Depends(db_session)):
     return {"worker_id": worker.id, "token": raw_token}
 
 
+@app.post("/api/v1/worker/enroll")
+async def enroll_worker(request: Request, db: Session = Depends(db_session)):
+    body = await request.json()
+    return await asyncio.to_thread(register_worker, db, body)
+
+
+def farm_blender_version(db: Session) -> str:
+    return db.get(FarmSetting, "blender_version").value
+
+
+def online_peers(db: Session, worker_id: str, sha256: str | None = None) -> list[dict]:
+    """Other recently seen workers serving their cache on the LAN, optionally only those holding a package."""
+    query = select(Worker).where(Worker.id != worker_id, Worker.disabled.is_(False), Worker.last_seen_at >= utcnow() - timedelta(seconds=PEER_SEEN_SECONDS), Worker.capabilities_json.contains('"peer"'))
+    if sha256:
+        query = query.where(Worker.capabilities_json.contains(sha256))
+    peers = []
+    for other in db.scalars(query):
+        peer = json.loads(other.capabilities_json).get("peer") or {}
+        if peer.get("url") and (not sha256 or sha256 in peer.get("packages", [])):
+            peers.append({"url": peer["url"], "blender": peer.get("blender", [])})
+    return peers
+
+
+def record_heartbeat(db: Session, worker: Worker, body: dict) -> dict:
+    active = scheduler.record_heartbeat(worker.id, body.get("lease_token"), body.get("capabilities"))
+    result = {"ok": True, "lease_active": active, "blender_version": farm_blender_version(db)}
+    secret = db.get(FarmSetting, "peer_secret")
+    if secret and (body.get("capabilities") or {}).get("peer"):
+        result["peer_secret"] = secret.value
+        result["peers"] = online_peers(db, worker.id)
+    return result
+
+
 @app.post("/api/v1/worker/heartbeat")
 async def worker_heartbeat(request: Request, worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
     body = await request.json()
-    worker.last_seen_at = utcnow()
-    if "capabilities" in body:
-        worker.capabilities_json = json.dumps(body["capabilities"])
-    db.commit()
-    lease = body.get("lease_token")
-    active = scheduler.heartbeat(worker.id, lease) if lease else None
-    version = db.get(FarmSetting, "blender_version").value
-    return {"ok": True, "lease_active": bool(active) if lease else None, "blender_version": version}
+    return await asyncio.to_thread(record_heartbeat, db, worker, body)
+
+
+def prefetch_hint(db: Session, worker: Worker, sha256: str | None) -> dict | None:
+    # Without a package row the extracted size is unknown, so workers could not budget for it.
+    package = db.get(Package, sha256) if sha256 else None
+    if not package:
+        return None
+    peers = [peer["url"] for peer in online_peers(db, worker.id, package.sha256)]
+    return {"sha256": package.sha256, "expanded_size": json.loads(package.archive_json)["expanded_size"], "url": f"{settings.public_url}/api/v1/worker/packages/{package.sha256}", "peers": peers}
 
 
 @app.post("/api/v1/worker/lease")
-async def acquire_lease(wait: int = 20, count: int = 1, worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
-    worker.last_seen_at = utcnow()
-    db.commit()
+async def acquire_lease(wait: int = 20, count: int = 1, slot: int = 0, worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    scheduler.record_heartbeat(worker.id)
     deadline = asyncio.get_running_loop().time() + min(max(wait, 0), 20)
     while True:
-        results = await asyncio.to_thread(scheduler.lease_batch, worker, min(max(count, 1), 20))
+        results = await asyncio.to_thread(scheduler.lease_batch, worker, min(max(count, 1), 20), min(max(slot, 0), 15))
         if results:
-            version = db.get(FarmSetting, "blender_version").value
+            version = await asyncio.to_thread(farm_blender_version, db)
+            upcoming = await asyncio.to_thread(prefetch_hint, db, worker, results[0].pop("next_package_sha256", None))
+            peers = await asyncio.to_thread(online_peers, db, worker.id, results[0]["package_sha256"])
             for result in results:
+                result.pop("next_package_sha256", None)
                 result["package_url"] = f"{settings.public_url}/api/v1/worker/package/{result['frame_id']}"
+                result["package_peers"] = [peer["url"] for peer in peers]
                 result["blender_version"] = version
+                if upcoming:
+                    result["next_package"] = upcoming
             return {"assignments": results} if count > 1 else results[0]
         if asyncio.get_running_loop().time() >= deadline:
             return Response(status_code=204)
@@ -488,118 +911,189 @@ def download_package(frame_id: str, x_lease_token: str = Header(...), worker: Wo
     url = storage.presigned_get(job.package_key)
     if url:
         return {"url": url, "sha256": job.package_sha256}
-    assert isinstance(storage, LocalStorage)
-    return FileResponse(storage.path_for(job.package_key), filename="project.zip", media_type="application/zip")
+    return local_file(job.package_key, "application/zip", "project.zip")
 
 
-@app.post("/api/v1/worker/leases/{frame_id}/uploads")
-async def worker_upload_init(frame_id: str, request: Request, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
-    raw_lease = x_lease_token
+@app.get("/api/v1/worker/packages/{sha256}")
+def prefetch_package(sha256: str, worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    package = db.get(Package, sha256)
+    waiting = db.scalar(select(Job.id).where(Job.package_sha256 == sha256, Job.status.in_([JobStatus.queued.value, JobStatus.running.value])).limit(1))
+    if not package or not waiting:
+        raise HTTPException(404)
+    url = storage.presigned_get(package.storage_key)
+    if url:
+        return {"url": url, "sha256": package.sha256}
+    return local_file(package.storage_key, "application/zip", "project.zip")
+
+
+def leased_package(db: Session, worker: Worker, raw_lease: str) -> Package:
+    frame = lease_frame(db, worker, raw_lease)
+    package = db.get(Package, db.get(Job, frame.job_id).package_sha256)
+    if not package or not package.manifest_key:
+        raise HTTPException(404, "package has no chunk manifest")
+    return package
+
+
+@app.get("/api/v1/worker/leases/{frame_id}/package/manifest")
+def download_manifest(frame_id: str, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    return read_manifest(leased_package(db, worker, x_lease_token))
+
+
+@lru_cache(maxsize=32)
+def manifest_hashes(key: str) -> frozenset[str]:
+    """Chunk hashes a stored manifest lists, read once per package rather than per chunk request."""
+    with storage.open_read(key) as source:
+        return frozenset(sha for sha, _size in json.loads(source.read())["chunks"])
+
+
+@app.get("/api/v1/worker/leases/{frame_id}/chunks/{sha256}")
+def download_chunk(frame_id: str, sha256: str, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    package = leased_package(db, worker, x_lease_token)
+    if sha256 not in manifest_hashes(package.manifest_key) or not db.get(Chunk, sha256):
+        raise HTTPException(404)
+    url = storage.presigned_get(chunk_key(sha256))
+    if url:
+        return {"url": url, "sha256": sha256}
+    return local_file(chunk_key(sha256), "application/octet-stream")
+
+
+def init_worker_upload(db: Session, worker: Worker, raw_lease: str, body: dict) -> dict:
     frame = lease_frame(db, worker, raw_lease)
-    body = await request.json()
     purpose = body.get("purpose")
     if purpose not in {"output", "preview"}:
         raise HTTPException(400, "invalid artifact purpose")
     ext = {"PNG": "png", "JPEG": "jpg", "OPEN_EXR": "exr"}[frame.job.output_format] if purpose == "output" else "jpg"
     artifact_key = f"jobs/{frame.job_id}/frames/{frame.frame_number:06d}/{purpose}.{ext}"
-    upload, response = create_upload(db, purpose=purpose, owner_kind="worker", owner_id=frame.id, filename=f"{frame.frame_number:06d}.{ext}", total_size=int(body.get("total_size", 0)), checksum=body.get("sha256", ""), content_type=body.get("content_type", "application/octet-stream"), storage_key=artifact_key)
+    upload, response = create_upload(db, purpose=purpose, owner_kind="worker", owner_id=frame.id, filename=f"{frame.frame_number:06d}.{ext}", total_size=int(body.get("total_size", 0)), checksum=body.get("sha256", ""), content_type=body.get("content_type", "application/octet-stream"), storage_key=artifact_key, chunk_size=int(body["chunk_size"]) if body.get("chunk_size") else None)
     return response
 
 
-@app.put("/api/v1/worker/leases/{frame_id}/uploads/{upload_id}/parts/{part_number}")
-async def worker_upload_part(frame_id: str, upload_id: str, part_number: int, request: Request, x_lease_token: str = Header(...), x_chunk_sha256: str | None = Header(None), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
-    raw_lease = x_lease_token
+@app.post("/api/v1/worker/leases/{frame_id}/uploads")
+async def worker_upload_init(frame_id: str, request: Request, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    body = await request.json()
+    return await asyncio.to_thread(init_worker_upload, db, worker, x_lease_token, body)
+
+
+def worker_upload(db: Session, worker: Worker, raw_lease: str, upload_id: str, require_open: bool) -> UploadSession:
     frame = lease_frame(db, worker, raw_lease)
     upload = db.get(UploadSession, upload_id)
-    if not upload or upload.owner_id != frame.id or upload.status != "open":
+    if not upload or upload.owner_id != frame.id or (require_open and upload.status != "open"):
         raise HTTPException(404)
+    return upload
+
+
+@app.put("/api/v1/worker/leases/{frame_id}/uploads/{upload_id}/parts/{part_number}")
+async def worker_upload_part(frame_id: str, upload_id: str, part_number: int, request: Request, x_lease_token: str = Header(...), x_chunk_sha256: str | None = Header(None), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    upload = await asyncio.to_thread(worker_upload, db, worker, x_lease_token, upload_id, True)
     return await save_local_part(upload, part_number, request, x_chunk_sha256)
 
 
+@app.get("/api/v1/worker/leases/{frame_id}/uploads/{upload_id}/parts")
+async def worker_upload_parts(frame_id: str, upload_id: str, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    return await asyncio.to_thread(lambda: received_parts(worker_upload(db, worker, x_lease_token, upload_id, False)))
+
+
+@app.post("/api/v1/worker/leases/{frame_id}/uploads/{upload_id}/presign")
+async def worker_upload_presign(frame_id: str, upload_id: str, request: Request, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    body = await request.json()
+    return await asyncio.to_thread(lambda: presign_parts(worker_upload(db, worker, x_lease_token, upload_id, True), body))
+
+
+def complete_worker_upload(db: Session, worker: Worker, raw_lease: str, upload_id: str, parts: list[dict]) -> dict:
+    upload = worker_upload(db, worker, raw_lease, upload_id, False)
+    finalize_upload(db, upload, parts)
+    return {"id": upload.id, "key": upload.storage_key, "sha256": upload.sha256}
+
+
 @app.post("/api/v1/worker/leases/{frame_id}/uploads/{upload_id}/complete")
 async def worker_upload_complete(frame_id: str, upload_id: str, request: Request, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
-    raw_lease = x_lease_token
-    frame = lease_frame(db, worker, raw_lease)
-    upload = db.get(UploadSession, upload_id)
-    if not upload or upload.owner_id != frame.id:
-        raise HTTPException(404)
     body = await request.json()
-    finalize_upload(db, upload, body.get("parts", []))
-    return {"id": upload.id, "key": upload.storage_key, "sha256": upload.sha256}
+    return await in_transfer_pool(complete_worker_upload, db, worker, x_lease_token, upload_id, body.get("parts", []))
 
 
-@app.post("/api/v1/worker/leases/{frame_id}/complete")
-async def complete_frame(frame_id: str, request: Request, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
-    raw_lease = x_lease_token
+def complete_leased_frame(db: Session, worker: Worker, raw_lease: str, body: dict) -> dict:
     frame = lease_frame(db, worker, raw_lease)
-    body = await request.json()
     output = db.get(UploadSession, body.get("output_upload_id"))
     preview = db.get(UploadSession, body.get("preview_upload_id")) if body.get("preview_upload_id") else None
     if not output or output.owner_id != frame.id or output.purpose != "output" or output.status != "ready" or (preview and (preview.owner_id != frame.id or preview.status != "ready")):
         raise HTTPException(400, "frame artifacts are not ready")
-    ok = scheduler.complete(worker.id, raw_lease, output.storage_key, preview.storage_key if preview else None, output.sha256, float(body.get("duration_seconds", 0)), str(body.get("logs", "")))
+    telemetry = body.get("telemetry")
+    telemetry = {key: value for key, value in telemetry.items() if isinstance(value, (int, float))} if isinstance(telemetry, dict) else None
+    ok = scheduler.complete(worker.id, raw_lease, output.storage_key, preview.storage_key if preview else None, output.sha256, float(body.get("duration_seconds", 0)), str(body.get("logs", "")), telemetry)
     if not ok:
         raise HTTPException(409, "lease is no longer active")
     return {"ok": True}
 
 
+@app.post("/api/v1/worker/leases/{frame_id}/complete")
+async def complete_frame(frame_id: str, request: Request, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required), db: Session = Depends(db_session)):
+    body = await request.json()
+    return await asyncio.to_thread(complete_leased_frame, db, worker, x_lease_token, body)
+
+
 @app.post("/api/v1/worker/leases/{frame_id}/fail")
 async def fail_frame(frame_id: str, request: Request, x_lease_token: str = Header(...), worker: Worker = Depends(worker_required)):
     raw_lease = x_lease_token
     body = await request.json()
-    if not scheduler.fail(worker.id, raw_lease, str(body.get("error", "render failed")), str(body.get("logs", ""))):
+    if not await asyncio.to_thread(scheduler.fail, worker.id, raw_lease, str(body.get("error", "render failed")), str(body.get("logs", ""))):
         raise HTTPException(409, "lease is no longer active")
     return {"ok": True}
 
 
-@app.get("/frames/{frame_id}/preview")
-def frame_preview(frame_id: str, _admin: Admin = Depends(admin_required), db: Session = Depends(db_session)):
-    frame = db.get(Frame, frame_id)
-    if not frame or not frame.preview_key:
+def local_file(key: str, media_type: str, filename: str | None = None) -> Response:
+    """Serve a local artifact; with ACCEL_REDIRECT_PREFIX set, nginx sends the bytes and handles Range."""
+    assert isinstance(storage, LocalStorage)
+    path = storage.path_for(key)
+    if not settings.accel_redirect_prefix:
+        return FileResponse(path, filename=filename, media_type=media_type)
+    headers = {"X-Accel-Redirect": f"{settings.accel_redirect_prefix}/{quote(path.relative_to(storage.root).as_posix())}", "Content-Type": media_type}
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return Response(headers=headers)
+
+
+def preview_response(preview_key: str | None):
+    if not preview_key:
         raise HTTPException(404)
-    url = storage.presigned_get(frame.preview_key)
+    url = storage.presigned_get(preview_key)
     if url:
         return RedirectResponse(url, 307)
-    return FileResponse(storage.path_for(frame.preview_key), media_type="image/jpeg")
-
-
-def build_results(job: Job, frames: list[Frame]) -> Path:
-    handle, name = tempfile.mkstemp(suffix=".zip", prefix="blend-farm-results-")
-    os.close(handle)
-    target = Path(name)
-    manifest = {"job": job.name, "status": job.status, "frames": []}
-    with ZipFile(target, "w", ZIP_DEFLATED) as archive:
-        for frame in frames:
-            row = {"frame": frame.frame_number, "status": frame.status, "attempts": frame.attempts, "error": frame.error_text}
-            manifest["frames"].append(row)
-            if frame.output_key:
-                temp = materialize(storage, frame.output_key)
-                try:
-                    archive.write(temp, f"frames/frame-{frame.frame_number:06d}{Path(frame.output_key).suffix}")
-                finally:
-                    temp.unlink(missing_ok=True)
-        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
-    return target
+    return local_file(preview_key, "image/jpeg")
+
+
+@app.get("/frames/{frame_id}/preview")
+def frame_preview(frame_id: str, _admin: Admin = Depends(admin_required), db: Session = Depends(db_session)):
+    frame = db.get(Frame, frame_id)
+    return preview_response(frame.preview_key if frame else None)
+
+
+@app.get("/jobs/{job_id}/frames/{frame_number}/preview")
+def job_frame_preview(job_id: str, frame_number: int, _admin: Admin = Depends(admin_required), db: Session = Depends(read_session)):
+    job = db.get(Job, job_id)
+    frame = job_frame(db, job, frame_number) if job else None
+    return preview_response(frame.preview_key if frame else None)
 
 
 @app.get("/jobs/{job_id}/results")
-def results_zip(job_id: str, _admin: Admin = Depends(admin_required), db: Session = Depends(db_session)):
+def results_zip(job_id: str, frames: str | None = None, status: str | None = None, since: str | None = None, _admin: Admin = Depends(admin_required), db: Session = Depends(db_session)):
     job = db.get(Job, job_id)
-    if not job or job.status not in (JobStatus.completed.value, JobStatus.failed.value):
-        raise HTTPException(409, "job has not reached a terminal state")
-    if not job.result_zip_key:
-        frames = db.scalars(select(Frame).where(Frame.job_id == job.id).order_by(Frame.frame_number)).all()
-        temp = build_results(job, frames)
-        try:
-            job.result_zip_key = f"jobs/{job.id}/results.zip"
-            storage.put_file(job.result_zip_key, temp, "application/zip")
-            db.commit()
-        finally:
-            temp.unlink(missing_ok=True)
-    url = storage.presigned_get(job.result_zip_key)
-    if url:
-        return RedirectResponse(url, 307)
-    return FileResponse(storage.path_for(job.result_zip_key), filename=f"{job.name}-results.zip", media_type="application/zip")
+    if not job:
+        raise HTTPException(404)
+    if job.result_zip_key and not (frames or status or since):
+        url = storage.presigned_get(job.result_zip_key)
+        if url:
+            return RedirectResponse(url, 307)
+        return local_file(job.result_zip_key, "application/zip", f"{job.name}-results.zip")
+    try:
+        entries = select_entries(result_entries(job_frames(db, job)), frames, status, since)
+    except ValueError:
+        raise HTTPException(400, "invalid results filter") from None
+    # Pass the cursor back as ?since= to fetch only frames finished after this download.
+    cursor = next_cursor(entries, since)
+    if since and not entries:
+        return Response(status_code=204, headers={"X-Results-Cursor": cursor})
+    filename = quote(f"{job.name}-results.zip")
+    return StreamingResponse(stream_results(storage, job.name, job.status, entries, cursor), media_type="application/zip", headers={"Content-Disposition": f"attachment; filename*=UTF-8''{filename}", "X-Results-Cursor": cursor})
 
 
 def run():
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+
+from .models import Frame, FrameStatus, Job, JobStatus
+
+TERMINAL = (JobStatus.completed.value, JobStatus.failed.value)
+
+
+@dataclass(frozen=True)
+class FrameSummary:
+    """Read-only stand-in for an archived ``Frame`` row."""
+    id: str
+    frame_number: int
+    status: str
+    attempts: int
+    duration_seconds: float | None
+    output_key: str | None
+    preview_key: str | None
+    output_sha256: str | None
+    error_text: str
+    completed_at: datetime | None = None
+    log_text: str = ""
+    telemetry_json: str | None = None
+
+
+ARCHIVE_FIELDS = [field.name for field in fields(FrameSummary)]
+# Only failed frames keep their log once archived, and only its tail, which is where Blender reports the failure.
+ARCHIVED_LOG_CHARS = 8192
+
+
+def archived_value(frame: Frame, name: str):
+    value = getattr(frame, name)
+    if name == "log_text":
+        return (value or "")[-ARCHIVED_LOG_CHARS:] if frame.status == FrameStatus.failed.value else ""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def summaries_from_archive(data: str) -> list[FrameSummary]:
+    archive = json.loads(data)
+    summaries = []
+    for row in archive["rows"]:
+        values = dict(zip(archive["fields"], row))
+        if values.get("completed_at"):
+            values["completed_at"] = datetime.fromisoformat(values["completed_at"])
+        summaries.append(FrameSummary(**values))
+    return summaries
+
+
+def job_frames(db, job: Job) -> list:
+    """Live frames, or their archived summaries, in frame order."""
+    if job.frames_archive:
+        return summaries_from_archive(job.frames_archive)
+    return list(db.scalars(select(Frame).where(Frame.job_id == job.id).order_by(Frame.frame_number)))
+
+
+def job_frame(db, job: Job, frame_number: int):
+    if job.frames_archive:
+        return next((frame for frame in summaries_from_archive(job.frames_archive) if frame.frame_number == frame_number), None)
+    return db.scalar(select(Frame).where(Frame.job_id == job.id, Frame.frame_number == frame_number))
+
+
+def frame_counts(db, job: Job) -> dict[str, int]:
+    if job.frames_archive:
+        counts: dict[str, int] = {}
+        for frame in summaries_from_archive(job.frames_archive):
+            counts[frame.status] = counts.get(frame.status, 0) + 1
+        return counts
+    return dict(db.execute(select(Frame.status, func.count()).where(Frame.job_id == job.id).group_by(Frame.status)).all())
+
+
+def archive_job(db, job: Job) -> bool:
+    if job.frames_archive or job.status not in TERMINAL:
+        return False
+    frames = db.scalars(select(Frame).where(Frame.job_id == job.id).order_by(Frame.frame_number)).all()
+    rows = [[archived_value(frame, name) for name in ARCHIVE_FIELDS] for frame in frames]
+    job.frames_archive = json.dumps({"fields": ARCHIVE_FIELDS, "rows": rows}, separators=(",", ":"))
+    db.execute(delete(Frame).where(Frame.job_id == job.id))
+    db.expire(job, ["frames"])
+    return True
+
+
+def restore_frames(db, job: Job) -> list[Frame]:
+    """Recreate live frame rows so an archived job can be retried."""
+    if not job.frames_archive:
+        return list(job.frames)
+    frames = [Frame(job_id=job.id, **asdict(summary)) for summary in summaries_from_archive(job.frames_archive)]
+    db.add_all(frames)
+    job.frames_archive = None
+    db.flush()
+    db.expire(job, ["frames"])
+    return frames
+
+
+def archive_finished_jobs(session_factory) -> int:
+    with session_factory.begin() as db:
+        jobs = db.scalars(select(Job).where(Job.status.in_(TERMINAL), Job.frames_archive.is_(None))).all()
+        return sum(archive_job(db, job) for job in jobs)
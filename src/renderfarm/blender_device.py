@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 
-def configure_cycles_device(scene, preferences, requested: str) -> list[str]:
+def configure_cycles_device(scene, preferences, requested: str, slot: int | None = None) -> list[str]:
     """Select a Cycles backend and return the enabled device names.
 
+    With ``slot``, only that GPU of the backend is enabled, so several Blender
+    processes can each render on their own device.
+
     This module deliberately does not import bpy so the selection policy can be
     tested outside Blender. Blender's Cycles preferences object is passed in.
     """
@@ -36,6 +39,10 @@ def configure_cycles_device(scene, preferences, requested: str) -> list[str]:
         raise RuntimeError(
             f"Cycles found no {requested} GPU. Available devices: {available}"
         )
+    if slot is not None:
+        if slot >= len(selected):
+            raise RuntimeError(f"Cycles found {len(selected)} {requested} GPUs; there is no GPU for slot {slot}")
+        selected = [selected[slot]]
 
     # Do not silently use the CPU alongside the requested GPU backend.
     selected_ids = {id(item) for item in selected}
@@ -6,6 +6,11 @@ import json
 import time
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 # Blender runs scripts with its bundled Python and does not inherit the worker
 # interpreter's site-packages search path. Add the package root explicitly.
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -15,25 +20,44 @@ import bpy
 from renderfarm.blender_device import configure_cycles_device
 
 
-def main() -> None:
-    args = sys.argv[sys.argv.index("--") + 1:]
-    if len(args) != 1:
-        raise RuntimeError("expected: batch manifest path")
-    manifest_path = Path(args[0])
-    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
-    scene = bpy.context.scene
+def reset_peak_memory() -> bool:
+    """Restart the resident-memory high-water mark so it covers one frame; Linux only."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_memory(since_reset: bool) -> dict:
+    """Peak resident memory in bytes: of the frame after a reset, else of the whole Blender process."""
+    if since_reset:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return {"peak_memory_bytes": int(line.split()[1]) * 1024}
+    if resource is None:
+        return {}
+    # ru_maxrss never resets, so with a resident Blender it spans every batch rendered so far.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"process_peak_memory_bytes": peak if sys.platform == "darwin" else peak * 1024}
+
+
+def render_frames(scene, manifest: dict) -> None:
     prefs = bpy.context.preferences.addons["cycles"].preferences
-    configure_cycles_device(scene, prefs, manifest["device"])
+    configure_cycles_device(scene, prefs, manifest["device"], manifest.get("device_slot"))
     total = len(manifest["frames"])
     for index, item in enumerate(manifest["frames"], 1):
         started = time.monotonic()
+        since_reset = reset_peak_memory()
         print(f"Blend Farm: rendering frame {item['frame']} ({index}/{total})", flush=True)
         scene.frame_set(int(item["frame"]))
+        synced = time.monotonic()
         scene.render.filepath = item["output"]
         scene.render.image_settings.file_format = item["output_format"]
         output_color_mode = scene.render.image_settings.color_mode
         output_quality = scene.render.image_settings.quality
         bpy.ops.render.render(write_still=True)
+        rendered = time.monotonic()
         scene.render.image_settings.file_format = "JPEG"
         scene.render.image_settings.color_mode = "RGB"
         scene.render.image_settings.quality = 80
@@ -43,7 +67,32 @@ def main() -> None:
         scene.render.image_settings.file_format = item["output_format"]
         scene.render.image_settings.color_mode = output_color_mode
         scene.render.image_settings.quality = output_quality
-        print(f"Blend Farm: frame {item['frame']} rendered in {time.monotonic() - started:.2f}s", flush=True)
+        finished = time.monotonic()
+        telemetry = {"frame": item["frame"], "sync_seconds": round(synced - started, 3), "render_seconds": round(rendered - synced, 3), "save_seconds": round(finished - rendered, 3), **peak_memory(since_reset)}
+        print("Blend Farm: telemetry " + json.dumps(telemetry), flush=True)
+        print(f"Blend Farm: frame {item['frame']} rendered in {finished - started:.2f}s", flush=True)
+
+
+def serve(scene) -> None:
+    """Render one JSON manifest per stdin line with the scene kept loaded, until stdin closes."""
+    # Cycles keeps BVH, textures and kernels between renders of the same scene.
+    scene.render.use_persistent_data = True
+    print("Blend Farm: server ready", flush=True)
+    for line in sys.stdin:
+        if line.strip():
+            render_frames(scene, json.loads(line))
+            print("Blend Farm: batch finished", flush=True)
+
+
+def main() -> None:
+    args = sys.argv[sys.argv.index("--") + 1:]
+    if len(args) != 1:
+        raise RuntimeError("expected: batch manifest path or --serve")
+    if args[0] == "--serve":
+        serve(bpy.context.scene)
+        return
+    manifest_path = Path(args[0])
+    render_frames(bpy.context.scene, json.loads(manifest_path.read_text(encoding="utf-8")))
 
 
 main()
@@ -13,6 +13,8 @@ def _bool(name: str, default: bool = False) -> bool:
 class Settings:
     data_dir: Path
     database_url: str
+    database_read_url: str | None
+    sqlite_profile: str
     secret_key: str
     admin_username: str
     admin_password: str
@@ -23,6 +25,12 @@ class Settings:
     max_archive_bytes: int
     max_expanded_bytes: int
     chunk_size: int
+    upload_concurrency: int
+    presign_seconds: int
+    delta_uploads: bool
+    results_prebuild: bool
+    results_prebuild_bytes: int
+    accel_redirect_prefix: str | None
     s3_endpoint: str | None
     s3_region: str
     s3_bucket: str | None
@@ -32,6 +40,9 @@ class Settings:
     trusted_proxy_networks: tuple[str, ...]
     exposure_mode: str
     tunnel_metrics_url: str | None
+    transfer_threads: int
+    heartbeat_flush_seconds: float
+    storage_reconcile_seconds: int
 
     @classmethod
     def from_env(cls) -> "Settings":
@@ -39,6 +50,8 @@ class Settings:
         return cls(
             data_dir=data,
             database_url=os.getenv("DATABASE_URL", f"sqlite:///{data / 'farm.db'}"),
+            database_read_url=os.getenv("DATABASE_READ_URL") or None,
+            sqlite_profile=os.getenv("SQLITE_PROFILE", "tuned").lower(),
             secret_key=os.getenv("SECRET_KEY", "change-me-before-production"),
             admin_username=os.getenv("ADMIN_USERNAME", "admin"),
             admin_password=os.getenv("ADMIN_PASSWORD", "change-me-before-production"),
@@ -49,6 +62,12 @@ class Settings:
             max_archive_bytes=int(os.getenv("MAX_ARCHIVE_BYTES", str(20 * 1024**3))),
             max_expanded_bytes=int(os.getenv("MAX_EXPANDED_BYTES", str(100 * 1024**3))),
             chunk_size=32 * 1024**2,
+            upload_concurrency=min(max(int(os.getenv("UPLOAD_CONCURRENCY", "4")), 1), 16),
+            presign_seconds=max(int(os.getenv("PRESIGN_SECONDS", "900")), 60),
+            delta_uploads=_bool("DELTA_UPLOADS", False),
+            results_prebuild=_bool("RESULTS_PREBUILD", False),
+            results_prebuild_bytes=int(os.getenv("RESULTS_PREBUILD_MAX_BYTES", str(50 * 1024**3))),
+            accel_redirect_prefix=os.getenv("ACCEL_REDIRECT_PREFIX", "").rstrip("/") or None,
             s3_endpoint=os.getenv("S3_ENDPOINT") or None,
             s3_region=os.getenv("S3_REGION", "us-east-1"),
             s3_bucket=os.getenv("S3_BUCKET") or None,
@@ -58,4 +77,7 @@ class Settings:
             trusted_proxy_networks=tuple(x.strip() for x in os.getenv("TRUSTED_PROXY_NETWORKS", "127.0.0.1/32,172.16.0.0/12").split(",") if x.strip()),
             exposure_mode=os.getenv("EXPOSURE_MODE", "direct"),
             tunnel_metrics_url=os.getenv("TUNNEL_METRICS_URL") or None,
+            transfer_threads=max(int(os.getenv("TRANSFER_THREADS", "4")), 1),
+            heartbeat_flush_seconds=max(float(os.getenv("HEARTBEAT_FLUSH_SECONDS", "1")), 0.1),
+            storage_reconcile_seconds=max(int(os.getenv("STORAGE_RECONCILE_SECONDS", str(6 * 3600))), 60),
         )
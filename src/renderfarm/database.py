@@ -3,11 +3,21 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from pathlib import Path
 
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from .config import Settings
 
+# Tuned profile for single-node SQLite: WAL makes synchronous=NORMAL crash-safe
+# (only the last commits can be lost on power failure), and the page cache and
+# memory map keep dashboard scans off the disk.
+SQLITE_TUNED_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
+
 
 def utcnow() -> datetime:
     return datetime.now(timezone.utc)
@@ -17,21 +27,50 @@ class Base(DeclarativeBase):
     pass
 
 
-def make_engine(settings: Settings):
-    if settings.database_url.startswith("sqlite"):
-        Path(settings.database_url.removeprefix("sqlite:///" )).parent.mkdir(parents=True, exist_ok=True)
-    engine = create_engine(settings.database_url, connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {})
-    if settings.database_url.startswith("sqlite"):
+def make_engine(settings: Settings, read_only: bool = False):
+    url = settings.database_read_url if read_only and settings.database_read_url else settings.database_url
+    sqlite = url.startswith("sqlite")
+    if sqlite:
+        Path(url.removeprefix("sqlite:///" )).parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(url, connect_args={"check_same_thread": False} if sqlite else {})
+    if sqlite:
         @event.listens_for(engine, "connect")
         def sqlite_pragmas(connection, _record):
             cursor = connection.cursor()
-            cursor.execute("PRAGMA journal_mode=WAL")
+            if not read_only:
+                cursor.execute("PRAGMA journal_mode=WAL")
             cursor.execute("PRAGMA foreign_keys=ON")
             cursor.execute("PRAGMA busy_timeout=5000")
+            if settings.sqlite_profile == "tuned":
+                for pragma in SQLITE_TUNED_PRAGMAS:
+                    cursor.execute(pragma)
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
             cursor.close()
     return engine
 
 
+def make_read_engine(settings: Settings):
+    """Engine for dashboards and job pages; SQLite connections refuse writes."""
+    return make_engine(settings, read_only=True)
+
+
+def upgrade_schema(engine) -> None:
+    """Add columns introduced after a deployment created its tables.
+
+    New columns are always nullable, so an in-place ``ALTER TABLE`` is enough and
+    the farm does not need a migration tool.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"))
+
+
 def make_session_factory(engine):
     return sessionmaker(bind=engine, expire_on_commit=False)
-
@@ -77,6 +77,9 @@ class Job(Base):
     package_sha256: Mapped[str] = mapped_column(String(64))
     blend_path: Mapped[str] = mapped_column(String(500))
     result_zip_key: Mapped[str | None] = mapped_column(String(500))
+    # Compact JSON frame summaries; set once the job is terminal, its results
+    # are built and its frame rows have been removed from the live table.
+    frames_archive: Mapped[str | None] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
     frames: Mapped[list["Frame"]] = relationship(back_populates="job", cascade="all, delete-orphan")
@@ -91,12 +94,16 @@ class Frame(Base):
     status: Mapped[str] = mapped_column(String(20), default=FrameStatus.pending.value, index=True)
     attempts: Mapped[int] = mapped_column(Integer, default=0)
     worker_id: Mapped[str | None] = mapped_column(ForeignKey("workers.id", ondelete="SET NULL"))
+    # Render slot (one per GPU) of a multi-slot worker holding the lease.
+    worker_slot: Mapped[int | None] = mapped_column(Integer)
     lease_hash: Mapped[str | None] = mapped_column(String(64), index=True)
     lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     output_key: Mapped[str | None] = mapped_column(String(500))
     preview_key: Mapped[str | None] = mapped_column(String(500))
     output_sha256: Mapped[str | None] = mapped_column(String(64))
     duration_seconds: Mapped[float | None] = mapped_column(Float)
+    # Runner timings for the frame: load, sync, render and save seconds, peak memory (per frame, or process-lifetime where it cannot be reset).
+    telemetry_json: Mapped[str | None] = mapped_column(Text)
     log_text: Mapped[str] = mapped_column(Text, default="")
     error_text: Mapped[str] = mapped_column(Text, default="")
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -104,6 +111,32 @@ class Frame(Base):
     job: Mapped[Job] = relationship(back_populates="frames")
 
 
+class Package(Base):
+    # A project package is stored once per SHA-256 and shared by every job that
+    # references it; storage is released when the last of them is deleted.
+    __tablename__ = "packages"
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    storage_key: Mapped[str] = mapped_column(String(500), unique=True)
+    size: Mapped[int] = mapped_column(Integer)
+    archive_json: Mapped[str] = mapped_column(Text)
+    # Chunk manifest for packages sent as content-defined chunks (see Chunk).
+    manifest_key: Mapped[str | None] = mapped_column(String(500))
+    ref_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+
+class Chunk(Base):
+    # Content-addressed piece of one or more package manifests; ref_count counts
+    # the manifests that list it, so unchanged textures are stored only once.
+    __tablename__ = "chunks"
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(Integer)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+    # Reported to an uploader as already stored; kept until then even if no manifest lists it.
+    pinned_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
 class UploadSession(Base):
     __tablename__ = "upload_sessions"
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=uid)
@@ -113,8 +146,12 @@ class UploadSession(Base):
     storage_key: Mapped[str] = mapped_column(String(500), unique=True)
     filename: Mapped[str] = mapped_column(String(240))
     total_size: Mapped[int] = mapped_column(Integer)
+    chunk_size: Mapped[int | None] = mapped_column(Integer)
     sha256: Mapped[str] = mapped_column(String(64))
     backend_upload_id: Mapped[str | None] = mapped_column(String(500))
+    # Project validation result (blend path, expanded size, file list), cached so
+    # an upload is inspected once however many times it is referenced.
+    archive_json: Mapped[str | None] = mapped_column(Text)
     status: Mapped[str] = mapped_column(String(20), default="open")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
     expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
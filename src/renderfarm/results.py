@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from zipfile import ZIP_STORED, BadZipFile, ZipFile
+
+from sqlalchemy import select
+
+from .archive import TERMINAL, job_frames
+from .models import Frame, FrameStatus, Job, JobStatus
+from .storage import Storage
+
+PREFETCH_FRAMES = 4
+PREFETCH_BYTES = 8 * 1024**2
+BLOCK_SIZE = 1024**2
+LATE_COMMIT = timedelta(seconds=60)
+
+
+@dataclass(frozen=True)
+class ResultEntry:
+    """The part of a frame a results archive needs, detached from any session."""
+    frame_number: int
+    status: str
+    attempts: int
+    error_text: str
+    output_key: str | None
+    completed_at: datetime | None = None
+
+    @property
+    def name(self) -> str:
+        return f"frames/frame-{self.frame_number:06d}{Path(self.output_key).suffix}"
+
+    def manifest_row(self) -> dict:
+        return {"frame": self.frame_number, "status": self.status, "attempts": self.attempts, "error": self.error_text}
+
+
+def result_entries(frames) -> list[ResultEntry]:
+    return [ResultEntry(frame.frame_number, frame.status, frame.attempts, frame.error_text, frame.output_key, frame.completed_at) for frame in frames]
+
+
+def cursor_of(moment: datetime) -> int:
+    """Results cursor for a completion time: microseconds since the epoch, UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1_000_000)
+
+
+def parse_frames(text: str) -> list[tuple[int, int]]:
+    """``"1-500,640,700-710"`` as inclusive ranges; raises ``ValueError`` when malformed."""
+    ranges = []
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        ranges.append((int(first), int(last or first)))
+    if any(first > last for first, last in ranges):
+        raise ValueError(text)
+    return ranges
+
+
+def select_entries(entries: list[ResultEntry], frames: str | None = None, status: str | None = None, since: str | None = None) -> list[ResultEntry]:
+    """Filter entries by frame ranges, comma-separated statuses and a completion cursor."""
+    if frames:
+        ranges = parse_frames(frames)
+        entries = [entry for entry in entries if any(first <= entry.frame_number <= last for first, last in ranges)]
+    if status:
+        wanted = {value.strip() for value in status.split(",")}
+        if not wanted <= {state.value for state in FrameStatus}:
+            raise ValueError(status)
+        entries = [entry for entry in entries if entry.status in wanted]
+    if since:
+        after = int(since)
+        entries = [entry for entry in entries if entry.completed_at and cursor_of(entry.completed_at) > after]
+    return entries
+
+
+def next_cursor(entries: list[ResultEntry], since: str | None = None) -> str:
+    """Cursor to pass as ``since`` next time to get only frames finished after these."""
+    return str(max([cursor_of(entry.completed_at) for entry in entries if entry.completed_at] + [int(since or 0)]))
+
+
+class _Sink:
+    """Write-only, unseekable target; ``zipfile`` then emits data descriptors and ZIP64 records as needed."""
+
+    def __init__(self):
+        self.pending: list[bytes] = []
+
+    def write(self, data) -> int:
+        self.pending.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        return None
+
+    def drain(self) -> Iterator[bytes]:
+        pending, self.pending = self.pending, []
+        yield from pending
+
+
+def _open(storage: Storage, key: str) -> tuple[BinaryIO, bytes]:
+    # Reading the head of an object pays its first-byte latency ahead of time.
+    source = storage.open_read(key)
+    try:
+        return source, source.read(PREFETCH_BYTES)
+    except BaseException:
+        source.close()
+        raise
+
+
+def _copy(archive: ZipFile, name: str, source: BinaryIO, head: bytes, sink: _Sink | None = None) -> Iterator[bytes]:
+    with source, archive.open(name, "w", force_zip64=True) as entry:
+        block = head
+        while block:
+            entry.write(block)
+            if sink:
+                yield from sink.drain()
+            block = source.read(BLOCK_SIZE)
+
+
+def stream_results(storage: Storage, job_name: str, job_status: str, entries: list[ResultEntry], cursor: str | None = None) -> Iterator[bytes]:
+    """Yield a results ZIP: stored frames read straight from storage, manifest last."""
+    sink = _Sink()
+    outputs = [entry for entry in entries if entry.output_key]
+    with ThreadPoolExecutor(max_workers=PREFETCH_FRAMES, thread_name_prefix="blend-farm-results") as pool:
+        ahead: deque = deque()
+        try:
+            with ZipFile(sink, "w", ZIP_STORED, allowZip64=True) as archive:
+                for index, entry in enumerate(outputs):
+                    while len(ahead) < PREFETCH_FRAMES and index + len(ahead) < len(outputs):
+                        ahead.append(pool.submit(_open, storage, outputs[index + len(ahead)].output_key))
+                    source, head = ahead.popleft().result()
+                    yield from _copy(archive, entry.name, source, head, sink)
+                manifest = {"job": job_name, "status": job_status, "frames": [entry.manifest_row() for entry in entries]}
+                if cursor:
+                    manifest["cursor"] = cursor
+                archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+            yield from sink.drain()
+        finally:
+            # A client that disconnects early leaves prefetched streams behind.
+            for future in ahead:
+                if not future.cancel() and future.exception() is None:
+                    future.result()[0].close()
+
+
+def _append_results(db, storage: Storage, job: Job, partial: Path) -> bool:
+    """Append the job's newly finished frames to its partial ZIP, whose comment holds the results cursor; publish it once the job is terminal."""
+    done: set[str] = set()
+    since = None
+    if partial.exists():
+        with ZipFile(partial) as existing:
+            done = set(existing.namelist())
+            since = existing.comment.decode() or None
+    terminal = job.status in TERMINAL
+    if terminal or since is None:
+        entries = result_entries(job_frames(db, job))
+    else:
+        # Only frames finished since the last pass; the margin covers completions committed late.
+        after = datetime.fromtimestamp(int(since) / 1_000_000, timezone.utc) - LATE_COMMIT
+        entries = result_entries(db.scalars(select(Frame).where(Frame.job_id == job.id, Frame.status == FrameStatus.succeeded.value, Frame.completed_at >= after).order_by(Frame.frame_number)))
+    with ZipFile(partial, "a", ZIP_STORED, allowZip64=True) as archive:
+        for entry in entries:
+            if entry.status == FrameStatus.succeeded.value and entry.output_key and entry.name not in done:
+                source, head = _open(storage, entry.output_key)
+                for _ in _copy(archive, entry.name, source, head):
+                    pass
+        archive.comment = next_cursor(entries, since).encode()
+        if terminal and "manifest.json" not in done:
+            manifest = {"job": job.name, "status": job.status, "frames": [entry.manifest_row() for entry in entries]}
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    if not terminal:
+        return False
+    job.result_zip_key = f"jobs/{job.id}/results.zip"
+    storage.move_file(job.result_zip_key, partial, "application/zip")
+    db.commit()
+    return True
+
+
+def prebuild_results(session_factory, storage: Storage, folder: Path, max_bytes: int | None = None) -> int:
+    """Append newly finished frames to each job's partial results ZIP; publish it once the job is terminal."""
+    folder.mkdir(parents=True, exist_ok=True)
+    published = 0
+    with session_factory() as db:
+        rendered = select(Frame.id).where(Frame.job_id == Job.id, Frame.status == FrameStatus.succeeded.value).exists()
+        active = Job.status.in_((JobStatus.queued.value, JobStatus.running.value, JobStatus.paused.value)) & rendered
+        jobs = db.scalars(select(Job).where(active | Job.status.in_(TERMINAL), Job.result_zip_key.is_(None)).order_by(Job.queue_order)).all()
+        live = {job.id for job in jobs}
+        for stale in folder.glob("*.zip.partial"):
+            if stale.name.removesuffix(".zip.partial") not in live:
+                stale.unlink(missing_ok=True)
+        used = sum(partial.stat().st_size for partial in folder.glob("*.zip.partial"))
+        # One job's damaged partial or missing output must not hold back the others.
+        for job in jobs:
+            partial = folder / f"{job.id}.zip.partial"
+            before = partial.stat().st_size if partial.exists() else None
+            # Partials are local copies even on S3; past the cap, new jobs' results are only streamed on demand.
+            if before is None and max_bytes is not None and used >= max_bytes:
+                continue
+            try:
+                published += _append_results(db, storage, job, partial)
+            except BadZipFile:
+                print(f"Results prebuild for job {job.id}: partial archive is damaged, starting it again", flush=True)
+                partial.unlink(missing_ok=True)
+            except Exception as exc:
+                db.rollback()
+                print(f"Results prebuild failed for job {job.id}: {exc}", flush=True)
+            used += (partial.stat().st_size if partial.exists() else 0) - (before or 0)
+    return published
@@ -5,26 +5,91 @@ import secrets
 from datetime import timedelta
 from threading import Lock
 
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
 
 from .database import utcnow
 from .models import Frame, FrameStatus, Job, JobStatus, Worker
 from .security import token_hash
 
+# Longest a batch should take at a job's average frame time, so slow frames are
+# spread over more workers instead of queuing behind one.
+BATCH_TARGET_SECONDS = 900
+ACTIVE = (FrameStatus.leased.value, FrameStatus.rendering.value)
+
+
+def average_frame_seconds(db, job_id: str) -> float | None:
+    """Mean render time of the job's finished frames, as measured by the workers' runners."""
+    return db.scalar(select(func.avg(Frame.duration_seconds)).where(Frame.job_id == job_id, Frame.status == FrameStatus.succeeded.value, Frame.duration_seconds.is_not(None)))
+
+
+def job_eta(db, job: Job) -> float | None:
+    """Seconds until ``job`` finishes at its average frame time over the render slots working on it now."""
+    average = average_frame_seconds(db, job.id)
+    if not average or job.status not in (JobStatus.queued.value, JobStatus.running.value):
+        return None
+    remaining = db.scalar(select(func.count()).where(Frame.job_id == job.id, Frame.status.in_([FrameStatus.pending.value, *ACTIVE])))
+    slots = len(set(db.execute(select(Frame.worker_id, Frame.worker_slot).where(Frame.job_id == job.id, Frame.status.in_(ACTIVE))).all()))
+    return remaining * average / max(slots, 1)
+
 
 class Scheduler:
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, read_session_factory=None):
         self.sessions = session_factory
+        self.read_sessions = read_session_factory or session_factory
         self.lock = Lock()
+        # Heartbeats are validated on the read path and their writes coalesced
+        # here until the next flush, so polling workers never queue behind leases.
+        self.pending_lock = Lock()
+        self.pending_seen: dict[str, str | None] = {}
+        self.pending_leases: dict[str, tuple[str, str]] = {}
+
+    def record_heartbeat(self, worker_id: str, raw_lease: str | None = None, capabilities: dict | None = None) -> bool | None:
+        active = None
+        if raw_lease:
+            lease_hash = token_hash(raw_lease)
+            with self.read_sessions() as db:
+                frame_id = db.scalar(select(Frame.id).join(Job).where(
+                    Frame.worker_id == worker_id, Frame.lease_hash == lease_hash,
+                    Frame.status.in_([FrameStatus.leased.value, FrameStatus.rendering.value]),
+                    Job.status.not_in([JobStatus.cancelled.value, JobStatus.paused.value]),
+                ))
+            active = bool(frame_id)
+        with self.pending_lock:
+            if capabilities is not None or worker_id not in self.pending_seen:
+                self.pending_seen[worker_id] = json.dumps(capabilities) if capabilities is not None else None
+            if active:
+                self.pending_leases[frame_id] = (worker_id, lease_hash)
+        return active
+
+    def flush_heartbeats(self) -> int:
+        with self.lock, self.sessions.begin() as db:
+            return self._flush_heartbeats(db)
+
+    def _flush_heartbeats(self, db) -> int:
+        with self.pending_lock:
+            seen, leases = self.pending_seen, self.pending_leases
+            self.pending_seen, self.pending_leases = {}, {}
+        now = utcnow()
+        for worker_id, capabilities in seen.items():
+            values = {"last_seen_at": now} if capabilities is None else {"last_seen_at": now, "capabilities_json": capabilities}
+            db.execute(update(Worker).where(Worker.id == worker_id).values(**values))
+        for frame_id, (worker_id, lease_hash) in leases.items():
+            db.execute(update(Frame).where(
+                Frame.id == frame_id, Frame.worker_id == worker_id, Frame.lease_hash == lease_hash,
+                Frame.status.in_([FrameStatus.leased.value, FrameStatus.rendering.value]),
+            ).values(status=FrameStatus.rendering.value, lease_expires_at=now + timedelta(seconds=60)))
+        return len(seen) + len(leases)
 
     def reconcile(self) -> int:
         now = utcnow()
         changed = 0
         with self.lock, self.sessions.begin() as db:
+            self._flush_heartbeats(db)
             expired = db.scalars(select(Frame).where(Frame.status.in_([FrameStatus.leased.value, FrameStatus.rendering.value]), Frame.lease_expires_at < now)).all()
             for frame in expired:
                 frame.log_text = (frame.log_text + "\nLease expired; assignment returned to queue.")[-65536:]
                 frame.worker_id = None
+                frame.worker_slot = None
                 frame.lease_hash = None
                 frame.lease_expires_at = None
                 frame.status = FrameStatus.failed.value if frame.attempts >= 3 else FrameStatus.pending.value
@@ -37,19 +102,23 @@ class Scheduler:
         leases = self.lease_batch(worker, 1)
         return leases[0] if leases else None
 
-    def lease_batch(self, worker: Worker, count: int) -> list[dict]:
+    def lease_batch(self, worker: Worker, count: int, slot: int = 0) -> list[dict]:
         with self.lock, self.sessions.begin() as db:
+            self._flush_heartbeats(db)
             now = utcnow()
             expired = db.scalars(select(Frame).where(Frame.status.in_([FrameStatus.leased.value, FrameStatus.rendering.value]), Frame.lease_expires_at < now)).all()
             for stale in expired:
                 stale.worker_id = None
+                stale.worker_slot = None
                 stale.lease_hash = None
                 stale.lease_expires_at = None
                 stale.status = FrameStatus.failed.value if stale.attempts >= 3 else FrameStatus.pending.value
             # A duplicated service/notebook process must not acquire another
-            # batch with the same credential while its current batch is active.
+            # batch with the same credential while its current batch is active;
+            # each render slot of a multi-GPU worker holds its own batch.
             active = db.scalar(select(Frame.id).where(
                 Frame.worker_id == worker.id,
+                func.coalesce(Frame.worker_slot, 0) == slot,
                 Frame.status.in_([FrameStatus.leased.value, FrameStatus.rendering.value]),
                 Frame.lease_expires_at >= now,
             ).limit(1))
@@ -63,6 +132,9 @@ class Scheduler:
             )
             if not job:
                 return []
+            average = average_frame_seconds(db, job.id)
+            if average:
+                count = min(count, max(1, int(BATCH_TARGET_SECONDS // average)))
             frames = db.scalars(
                 select(Frame).where(
                     Frame.job_id == job.id,
@@ -76,6 +148,7 @@ class Scheduler:
                 raw_lease = secrets.token_urlsafe(32)
                 frame.status = FrameStatus.leased.value
                 frame.worker_id = worker.id
+                frame.worker_slot = slot
                 frame.attempts += 1
                 frame.lease_hash = token_hash(raw_lease)
                 frame.lease_expires_at = now + timedelta(seconds=60)
@@ -84,24 +157,21 @@ class Scheduler:
                     "lease_token": raw_lease, "frame_id": frame.id, "job_id": job.id,
                     "frame": frame.frame_number, "output_format": job.output_format,
                     "package_sha256": job.package_sha256, "blend_path": job.blend_path,
-                    "lease_expires_at": frame.lease_expires_at.isoformat(),
+                    "lease_expires_at": frame.lease_expires_at.isoformat(), "slot": slot,
                 })
+            # The next different package in queue order, for workers to fetch while they render.
+            upcoming = db.scalar(
+                select(Job.package_sha256).join(Frame).where(
+                    Frame.status == FrameStatus.pending.value,
+                    Job.status.in_([JobStatus.queued.value, JobStatus.running.value]),
+                    Job.package_sha256 != job.package_sha256,
+                ).order_by(Job.queue_order.asc(), Job.created_at.asc()).limit(1)
+            )
+            if upcoming:
+                for lease in leases:
+                    lease["next_package_sha256"] = upcoming
             return leases
 
-    def heartbeat(self, worker_id: str, raw_lease: str) -> Frame | None:
-        with self.sessions.begin() as db:
-            frame = db.scalar(select(Frame).where(Frame.worker_id == worker_id, Frame.lease_hash == token_hash(raw_lease), Frame.status.in_([FrameStatus.leased.value, FrameStatus.rendering.value])))
-            if not frame:
-                return None
-            job = db.get(Job, frame.job_id)
-            if job.status in (JobStatus.cancelled.value, JobStatus.paused.value):
-                return None
-            frame.status = FrameStatus.rendering.value
-            frame.lease_expires_at = utcnow() + timedelta(seconds=60)
-            db.flush()
-            db.expunge(frame)
-            return frame
-
     def fail(self, worker_id: str, raw_lease: str, error: str, logs: str) -> bool:
         with self.lock, self.sessions.begin() as db:
             frame = db.scalar(select(Frame).where(Frame.worker_id == worker_id, Frame.lease_hash == token_hash(raw_lease)))
@@ -111,12 +181,13 @@ class Scheduler:
             frame.log_text = logs[-65536:]
             frame.status = FrameStatus.failed.value if frame.attempts >= 3 else FrameStatus.pending.value
             frame.worker_id = None
+            frame.worker_slot = None
             frame.lease_hash = None
             frame.lease_expires_at = None
             self._aggregate(db, frame.job_id)
             return True
 
-    def complete(self, worker_id: str, raw_lease: str, output_key: str, preview_key: str | None, checksum: str, duration: float, logs: str) -> bool:
+    def complete(self, worker_id: str, raw_lease: str, output_key: str, preview_key: str | None, checksum: str, duration: float, logs: str, telemetry: dict | None = None) -> bool:
         with self.lock, self.sessions.begin() as db:
             frame = db.scalar(select(Frame).where(Frame.worker_id == worker_id, Frame.lease_hash == token_hash(raw_lease)))
             if not frame or frame.status == FrameStatus.succeeded.value:
@@ -128,6 +199,7 @@ class Scheduler:
             frame.preview_key = preview_key
             frame.output_sha256 = checksum
             frame.duration_seconds = duration
+            frame.telemetry_json = json.dumps(telemetry) if telemetry else None
             frame.log_text = logs[-65536:]
             frame.completed_at = utcnow()
             frame.lease_expires_at = None
@@ -5,6 +5,139 @@ document.querySelectorAll('[data-dialog]').forEach(button => {
 });
 document.querySelectorAll('.dialog-close').forEach(button => button.addEventListener('click', () => button.closest('dialog').close()));
 
+const sha256Hex = async blob => [...new Uint8Array(await crypto.subtle.digest('SHA-256', await blob.arrayBuffer()))].map(x=>x.toString(16).padStart(2,'0')).join('');
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+// Retries network errors, throttling and server errors; client errors fail fast.
+async function withRetry(send, attempts = 4) {
+  for (let attempt = 1; ; attempt++) {
+    let response = null;
+    try {
+      response = await send();
+      if (response.ok) return response;
+    } catch (error) {
+      if (attempt >= attempts) throw error;
+    }
+    if (response && (attempt >= attempts || (response.status < 500 && ![408, 429].includes(response.status)))) throw new Error(await response.text());
+    await sleep(Math.min(2 ** attempt, 30) * 1000 * (0.5 + Math.random() / 2));
+  }
+}
+
+// Runs task(1..count) with at most `limit` in flight.
+async function runPool(count, limit, task) {
+  let next = 1;
+  const lane = async () => { while (next <= count) await task(next++); };
+  await Promise.all(Array.from({length: Math.min(limit, count)}, lane));
+}
+
+// Presigned part URLs are requested in small windows as the upload reaches
+// them, so slow uploads never run into expired signatures.
+function partUrls(uploadId) {
+  const urls = new Map();
+  let pending = null;
+  return async function get(part) {
+    const cached = urls.get(part);
+    if (cached && cached.expires > Date.now()) return cached.url;
+    while (pending) await pending;
+    if (urls.get(part)?.expires > Date.now()) return urls.get(part).url;
+    pending = (async () => {
+      const response = await withRetry(() => fetch(`/api/v1/uploads/${uploadId}/presign`, {method:'POST', headers:{'content-type':'application/json','x-csrf-token':csrf}, body:JSON.stringify({start:part,count:16})}));
+      const result = await response.json();
+      const expires = Date.now() + Math.max(result.expires_in - 60, 30) * 1000;
+      for (const item of result.parts) urls.set(item.part_number, {url:item.url, expires});
+    })();
+    try { await pending; } finally { pending = null; }
+    return urls.get(part).url;
+  };
+}
+
+// The upload session id is remembered per file, so choosing the same file after
+// a reload or a dropped connection only sends the parts the farm is missing.
+async function uploadSession(file) {
+  const key = `blend-farm-upload:${file.name}:${file.size}:${file.lastModified}`;
+  const saved = localStorage.getItem(key);
+  if (saved) {
+    const listing = await fetch(`/api/v1/uploads/${saved}/parts`);
+    if (listing.ok) return {key, ...await listing.json()};
+    localStorage.removeItem(key);
+  }
+  // Hashing up front lets the farm skip packages it already stores; larger
+  // files are deduplicated after upload instead.
+  const sha256 = file.size <= 256 * 1024 ** 2 ? await sha256Hex(file) : undefined;
+  const init = await fetch('/api/v1/uploads', {method:'POST', headers:{'content-type':'application/json','x-csrf-token':csrf}, body:JSON.stringify({filename:file.name,total_size:file.size,sha256,chunk_size:file.size > 8 * 1024 ** 3 ? 128 * 1024 ** 2 : undefined})});
+  if (!init.ok) throw new Error(await init.text());
+  const session = await init.json();
+  if (session.status === 'ready') return session;
+  localStorage.setItem(key, session.id);
+  return {key, parts:[], ...session};
+}
+
+// Content-defined chunking: a rolling gear hash picks chunk boundaries from the
+// bytes themselves, so an edit to the .blend leaves unchanged textures with the
+// same chunks and only new chunks are sent.
+const GEAR = (() => {
+  const table = new Uint32Array(256);
+  let x = 0x9e3779b9;
+  for (let i = 0; i < 256; i++) { x ^= x << 13; x ^= x >>> 17; x ^= x << 5; table[i] = x >>> 0; }
+  return table;
+})();
+// A boundary needs the top 21 hash bits clear: about one cut per 2 MiB.
+const CHUNK_MIN = 512 * 1024, CHUNK_MAX = 8 * 1024 ** 2, CHUNK_SHIFT = 11;
+
+async function contentChunks(file, progress) {
+  const chunks = [];
+  let start = 0, hash = 0;
+  for (let offset = 0; offset < file.size; offset += 16 * 1024 ** 2) {
+    const bytes = new Uint8Array(await file.slice(offset, offset + 16 * 1024 ** 2).arrayBuffer());
+    for (let i = 0; i < bytes.length; i++) {
+      hash = ((hash << 1) + GEAR[bytes[i]]) >>> 0;
+      const length = offset + i + 1 - start;
+      if ((length >= CHUNK_MIN && (hash >>> CHUNK_SHIFT) === 0) || length >= CHUNK_MAX) {
+        chunks.push({offset:start, size:length});
+        start += length;
+        hash = 0;
+      }
+    }
+    progress(Math.min(offset + bytes.length, file.size));
+  }
+  if (start < file.size) chunks.push({offset:start, size:file.size - start});
+  for (const chunk of chunks) chunk.sha256 = await sha256Hex(file.slice(chunk.offset, chunk.offset + chunk.size));
+  return chunks;
+}
+
+// Returns null when the farm does not accept delta uploads.
+async function deltaUpload(file, status) {
+  const post = (url, body) => fetch(url, {method:'POST', headers:{'content-type':'application/json','x-csrf-token':csrf}, body:JSON.stringify(body)});
+  const probe = await post('/api/v1/chunks/missing', {chunks:[]});
+  if (probe.status === 404) return null;
+  const chunks = await contentChunks(file, done => { status.textContent = `Scanning ${Math.round(done/file.size*100)}%…`; });
+  const missing = new Set();
+  for (let start = 0; start < chunks.length; start += 10000) {
+    const response = await withRetry(() => post('/api/v1/chunks/missing', {chunks:chunks.slice(start, start + 10000).map(c => c.sha256)}));
+    for (const sha of (await response.json()).missing) missing.add(sha);
+  }
+  const send = async pending => {
+    const total = pending.reduce((sum, c) => sum + c.size, 0);
+    let sent = 0;
+    await runPool(pending.length, 4, async index => {
+      const chunk = pending[index-1];
+      await withRetry(() => fetch(`/api/v1/chunks/${chunk.sha256}`, {method:'PUT', headers:{'x-csrf-token':csrf}, body:file.slice(chunk.offset, chunk.offset + chunk.size)}));
+      sent += chunk.size;
+      status.textContent = `Uploading ${Math.round(sent/Math.max(total, 1)*100)}% of ${(total / 1024 ** 2).toFixed(0)} MiB changed…`;
+    });
+  };
+  await send(chunks.filter(c => missing.delete(c.sha256)));
+  for (let attempt = 1; ; attempt++) {
+    status.textContent = 'Validating project…';
+    const done = await post('/api/v1/uploads/manifest', {filename:file.name, chunks:chunks.map(c => [c.sha256, c.size])});
+    if (done.ok) return done.json();
+    if (done.status !== 409 || attempt === 3) throw new Error(await done.text());
+    // Chunks the farm dropped since it listed them as stored are sent again.
+    const gone = new Set((await done.json()).detail.missing);
+    await send(chunks.filter(c => gone.delete(c.sha256)));
+  }
+}
+
 const fileInput = document.getElementById('project-file');
 if (fileInput) fileInput.addEventListener('change', async () => {
   const file = fileInput.files[0];
@@ -14,23 +147,51 @@ if (fileInput) fileInput.addEventListener('change', async () => {
   submit.disabled = true;
   try {
     status.textContent = 'Preparing upload…';
-    const init = await fetch('/api/v1/uploads', {method:'POST', headers:{'content-type':'application/json','x-csrf-token':csrf}, body:JSON.stringify({filename:file.name,total_size:file.size})});
-    if (!init.ok) throw new Error(await init.text());
-    const session = await init.json();
+    const delta = file.size > 64 * 1024 ** 2 ? await deltaUpload(file, status) : null;
+    if (delta) {
+      document.getElementById('upload-id').value = delta.id;
+      status.textContent = `Ready · ${delta.blend_path}`;
+      status.className = 'alert good';
+      submit.disabled = false;
+      return;
+    }
+    const session = await uploadSession(file);
+    if (session.status === 'ready') {
+      document.getElementById('upload-id').value = session.id;
+      status.textContent = `Ready · ${session.blend_path} (already on the farm)`;
+      status.className = 'alert good';
+      submit.disabled = false;
+      return;
+    }
+    const presigned = session.backend === 's3' ? partUrls(session.id) : null;
+    const received = new Map(session.parts.map(p => [p.part_number, p]));
     const completed = [];
-    for (let offset=0, part=1; offset<file.size; offset += session.chunk_size, part++) {
-      const blob = file.slice(offset, Math.min(offset + session.chunk_size, file.size));
-      status.textContent = `Uploading ${Math.round(offset/file.size*100)}%…`;
-      const hash = [...new Uint8Array(await crypto.subtle.digest('SHA-256', await blob.arrayBuffer()))].map(x=>x.toString(16).padStart(2,'0')).join('');
-      const target = session.backend === 's3' ? session.parts[part-1].url : `/api/v1/uploads/${session.id}/parts/${part}`;
-      const headers = session.backend === 's3' ? {} : {'x-csrf-token':csrf,'x-chunk-sha256':hash};
-      const sent = await fetch(target, {method:'PUT', headers, body:blob});
-      if (!sent.ok) throw new Error(await sent.text());
-      if (session.backend === 's3') completed.push({part_number:part,etag:sent.headers.get('etag')});
+    const missing = [];
+    let sent = 0;
+    for (let part = 1; part <= session.part_count; part++) {
+      const size = Math.min(session.chunk_size, file.size - (part-1) * session.chunk_size);
+      const have = received.get(part);
+      if (have && have.size === size) {
+        if (session.backend === 's3') completed.push({part_number:part,etag:have.etag});
+        sent += size;
+      } else missing.push(part);
     }
+    const uploadPart = async part => {
+      const blob = file.slice((part-1) * session.chunk_size, Math.min(part * session.chunk_size, file.size));
+      const hash = session.backend === 's3' ? null : await sha256Hex(blob);
+      const headers = session.backend === 's3' ? {} : {'x-csrf-token':csrf,'x-chunk-sha256':hash};
+      const response = await withRetry(async () => fetch(session.backend === 's3' ? await presigned(part) : `/api/v1/uploads/${session.id}/parts/${part}`, {method:'PUT', headers, body:blob}));
+      if (session.backend === 's3') completed.push({part_number:part,etag:response.headers.get('etag')});
+      sent += blob.size;
+      status.textContent = `Uploading ${Math.round(sent/file.size*100)}%…`;
+    };
+    status.textContent = `Uploading ${Math.round(sent/file.size*100)}%…`;
+    await runPool(missing.length, session.concurrency || 4, index => uploadPart(missing[index-1]));
+    completed.sort((a, b) => a.part_number - b.part_number);
     status.textContent = 'Validating project…';
     const done = await fetch(`/api/v1/uploads/${session.id}/complete`, {method:'POST',headers:{'content-type':'application/json','x-csrf-token':csrf},body:JSON.stringify({parts:completed})});
     if (!done.ok) throw new Error(await done.text());
+    localStorage.removeItem(session.key);
     const result = await done.json();
     document.getElementById('upload-id').value = result.id;
     status.textContent = `Ready · ${result.blend_path}`;
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import hashlib
+import io
+import json
 import os
 import shutil
 import tempfile
 from abc import ABC, abstractmethod
-from pathlib import Path, PurePosixPath
-from typing import BinaryIO
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from threading import Lock
+from typing import BinaryIO, Iterator
 from zipfile import BadZipFile, ZipFile
 
 from .config import Settings
@@ -16,18 +20,166 @@ class StorageError(RuntimeError):
     pass
 
 
+def chunk_key(sha256: str) -> str:
+    """Storage key of a content-defined package chunk."""
+    if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+        raise StorageError("invalid chunk hash")
+    return f"chunks/{sha256[:2]}/{sha256}"
+
+
+def usage_group(key: str) -> str:
+    """Ledger bucket for a key: ``jobs/<id>``, ``uploads/<token>`` and so on."""
+    return "/".join(safe_key(key).parts[:2])
+
+
+class UsageLedger:
+    """Running byte totals per key group, so usage never requires a full scan.
+
+    ``total`` is ``None`` until a persisted ledger is loaded or a reconciliation
+    scan has run; deltas recorded before then are kept per group regardless.
+    """
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self.lock = Lock()
+        self.groups: dict[str, int] = {}
+        self.known = False
+        self.dirty = False
+        # While a reconciliation scan runs: its totals so far, the last key it
+        # reached, and per-key deltas the scan has not observed yet.
+        self.scan: dict[str, int] = {}
+        self.cursor = ""
+        self.journal: dict[str, int] | None = None
+        if path and path.exists():
+            try:
+                self.groups = {str(k): int(v) for k, v in json.loads(path.read_text(encoding="utf-8")).items()}
+                self.known = True
+            except (OSError, ValueError, AttributeError):
+                self.groups = {}
+
+    def add(self, key: str, delta: int) -> None:
+        if not delta:
+            return
+        group = usage_group(key)
+        with self.lock:
+            value = self.groups.get(group, 0) + delta
+            if value > 0:
+                self.groups[group] = value
+            else:
+                self.groups.pop(group, None)
+            if self.journal is not None:
+                if delta < 0 and key > self.cursor:
+                    # The scan has yet to reach this key and will find it smaller or gone.
+                    self.journal.pop(key, None)
+                else:
+                    self.journal[key] = self.journal.get(key, 0) + delta
+            self.dirty = True
+
+    def forget(self, prefix: str) -> int:
+        """Drop a whole group and return the bytes it held."""
+        group = usage_group(prefix)
+        with self.lock:
+            self.dirty = True
+            if self.journal is not None:
+                self.scan.pop(group, None)
+                for key in [key for key in self.journal if usage_group(key) == group]:
+                    del self.journal[key]
+            return self.groups.pop(group, 0)
+
+    def begin_scan(self) -> None:
+        with self.lock:
+            self.scan, self.cursor, self.journal = {}, "", {}
+
+    def end_scan(self) -> None:
+        with self.lock:
+            self.scan, self.cursor, self.journal = {}, "", None
+
+    def scanned(self, objects: list[tuple[str, int]]) -> None:
+        """Count objects the scan observed; their sizes already include any deltas journaled so far."""
+        with self.lock:
+            for key, size in objects:
+                group = usage_group(key)
+                self.scan[group] = self.scan.get(group, 0) + size
+                self.journal.pop(key, None)
+            if objects:
+                self.cursor = max(self.cursor, objects[-1][0])
+
+    def finish_scan(self) -> None:
+        """Take the scan's totals, plus the changes it cannot have observed."""
+        with self.lock:
+            merged = self.scan
+            for key, delta in self.journal.items():
+                group = usage_group(key)
+                merged[group] = merged.get(group, 0) + delta
+            self.groups = {group: size for group, size in merged.items() if size > 0}
+            self.scan, self.cursor, self.journal = {}, "", None
+            self.known = True
+            self.dirty = True
+
+    def replace(self, groups: dict[str, int]) -> None:
+        with self.lock:
+            self.groups = {group: size for group, size in groups.items() if size > 0}
+            self.known = True
+            self.dirty = True
+
+    def usage(self, prefix: str | None = None) -> int | None:
+        with self.lock:
+            if prefix is not None:
+                return self.groups.get(usage_group(prefix), 0)
+            return sum(self.groups.values()) if self.known else None
+
+    def save(self) -> None:
+        with self.lock:
+            if not self.path or not self.dirty or not self.known:
+                return
+            data = json.dumps(self.groups)
+            self.dirty = False
+        temp = self.path.with_suffix(".tmp")
+        temp.write_text(data, encoding="utf-8")
+        os.replace(temp, self.path)
+
+
 class Storage(ABC):
+    ledger: UsageLedger
+
     @abstractmethod
     def put_file(self, key: str, source: Path, content_type: str = "application/octet-stream") -> None: ...
 
     @abstractmethod
     def copy_to(self, key: str, destination: Path) -> None: ...
 
+    @abstractmethod
+    def open_read(self, key: str) -> BinaryIO:
+        """Open a stored object for seekable reading without copying it."""
+
     @abstractmethod
     def delete_prefix(self, prefix: str) -> None: ...
 
+    def move_file(self, key: str, source: Path, content_type: str = "application/octet-stream") -> None:
+        """Store ``source`` under ``key`` and consume it."""
+        self.put_file(key, source, content_type)
+        source.unlink(missing_ok=True)
+
     @abstractmethod
-    def size(self) -> int | None: ...
+    def scan_usage(self) -> Iterator[list[tuple[str, int]]]:
+        """Walk every stored object in key order, yielding ``(key, size)`` batches as they are observed."""
+
+    def size(self) -> int | None:
+        return self.ledger.usage()
+
+    def usage(self, prefix: str) -> int:
+        return self.ledger.usage(prefix) or 0
+
+    def reconcile_usage(self) -> int:
+        self.ledger.begin_scan()
+        try:
+            for objects in self.scan_usage():
+                self.ledger.scanned(objects)
+        except BaseException:
+            self.ledger.end_scan()
+            raise
+        self.ledger.finish_scan()
+        self.ledger.save()
+        return self.ledger.usage() or 0
 
     def presigned_get(self, key: str, expires: int = 900) -> str | None:
         return None
@@ -38,6 +190,9 @@ class Storage(ABC):
     def presign_part(self, key: str, upload_id: str, part_number: int, expires: int = 3600) -> str | None:
         return None
 
+    def list_parts(self, key: str, upload_id: str) -> list[dict]:
+        return []
+
     def finish_multipart(self, key: str, upload_id: str, parts: list[dict]) -> None:
         raise StorageError("multipart uploads are unavailable")
 
@@ -56,9 +211,12 @@ def safe_key(key: str) -> PurePosixPath:
 
 
 class LocalStorage(Storage):
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, ledger_path: Path | None = None):
         self.root = root.resolve()
         self.root.mkdir(parents=True, exist_ok=True)
+        self.ledger = UsageLedger(ledger_path)
+        if not self.ledger.known and next(self.root.iterdir(), None) is None:
+            self.ledger.replace({})
 
     def path_for(self, key: str) -> Path:
         path = self.root.joinpath(*safe_key(key).parts).resolve()
@@ -71,20 +229,54 @@ class LocalStorage(Storage):
         target.parent.mkdir(parents=True, exist_ok=True)
         temp = target.with_suffix(target.suffix + ".partial")
         shutil.copyfile(source, temp)
+        previous = target.stat().st_size if target.is_file() else 0
         os.replace(temp, target)
+        self.ledger.add(key, target.stat().st_size - previous)
+
+    def move_file(self, key: str, source: Path, content_type: str = "application/octet-stream") -> None:
+        target = self.path_for(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        previous = target.stat().st_size if target.is_file() else 0
+        try:
+            # Same filesystem: a rename, not a third pass over a multi-GB file.
+            os.replace(source, target)
+        except OSError:
+            super().move_file(key, source, content_type)
+            return
+        # Upload parts are private while in flight; stored artifacts are readable
+        # like put_file copies, which nginx relies on with X-Accel-Redirect.
+        target.chmod(0o644)
+        self.ledger.add(key, target.stat().st_size - previous)
 
     def copy_to(self, key: str, destination: Path) -> None:
         shutil.copyfile(self.path_for(key), destination)
 
+    def open_read(self, key: str) -> BinaryIO:
+        return self.path_for(key).open("rb")
+
     def delete_prefix(self, prefix: str) -> None:
         target = self.path_for(prefix)
+        whole_group = len(safe_key(prefix).parts) == 2
         if target.is_dir():
+            removed = [] if whole_group else [(p, p.stat().st_size) for p in target.rglob("*") if p.is_file() and not p.name.endswith(".partial")]
             shutil.rmtree(target)
         elif target.exists():
+            removed = [(target, target.stat().st_size)]
             target.unlink()
-
-    def size(self) -> int:
-        return sum(p.stat().st_size for p in self.root.rglob("*") if p.is_file())
+        else:
+            return
+        if whole_group:
+            self.ledger.forget(prefix)
+        for path, size in removed:
+            self.ledger.add(path.relative_to(self.root).as_posix(), -size)
+
+    def scan_usage(self) -> Iterator[list[tuple[str, int]]]:
+        keys = sorted(path.relative_to(self.root).as_posix() for path in self.root.rglob("*") if path.is_file() and not path.name.endswith(".partial"))
+        for key in keys:
+            try:
+                yield [(key, (self.root / key).stat().st_size)]
+            except FileNotFoundError:
+                continue
 
     def health(self) -> None:
         if not self.root.is_dir() or not os.access(self.root, os.R_OK | os.W_OK):
@@ -92,35 +284,47 @@ class LocalStorage(Storage):
 
 
 class S3Storage(Storage):
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, ledger_path: Path | None = None):
         import boto3
         if not settings.s3_bucket:
             raise StorageError("S3_BUCKET is required")
         self.bucket = settings.s3_bucket
+        self.ledger = UsageLedger(ledger_path)
         self.client = boto3.client(
             "s3", endpoint_url=settings.s3_endpoint, region_name=settings.s3_region,
             aws_access_key_id=settings.s3_access_key, aws_secret_access_key=settings.s3_secret_key,
         )
 
+    def object_size(self, key: str) -> int:
+        try:
+            return int(self.client.head_object(Bucket=self.bucket, Key=str(safe_key(key)))["ContentLength"])
+        except self.client.exceptions.ClientError:
+            return 0
+
     def put_file(self, key: str, source: Path, content_type: str = "application/octet-stream") -> None:
+        previous = self.object_size(key)
         self.client.upload_file(str(source), self.bucket, str(safe_key(key)), ExtraArgs={"ContentType": content_type})
+        self.ledger.add(key, source.stat().st_size - previous)
 
     def copy_to(self, key: str, destination: Path) -> None:
         self.client.download_file(self.bucket, str(safe_key(key)), str(destination))
 
+    def open_read(self, key: str) -> BinaryIO:
+        return io.BufferedReader(S3RangeReader(self.client, self.bucket, str(safe_key(key))), buffer_size=256 * 1024)
+
     def delete_prefix(self, prefix: str) -> None:
         paginator = self.client.get_paginator("list_objects_v2")
         for page in paginator.paginate(Bucket=self.bucket, Prefix=str(safe_key(prefix))):
             objects = [{"Key": item["Key"]} for item in page.get("Contents", [])]
             if objects:
                 self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects})
+                for item in page["Contents"]:
+                    self.ledger.add(item["Key"], -item["Size"])
 
-    def size(self) -> int | None:
-        total = 0
-        paginator = self.client.get_paginator("list_objects_v2")
-        for page in paginator.paginate(Bucket=self.bucket):
-            total += sum(item["Size"] for item in page.get("Contents", []))
-        return total
+    def scan_usage(self) -> Iterator[list[tuple[str, int]]]:
+        # Listings come back in key order, one page per request.
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket):
+            yield [(item["Key"], item["Size"]) for item in page.get("Contents", [])]
 
     def presigned_get(self, key: str, expires: int = 900) -> str:
         return self.client.generate_presigned_url("get_object", Params={"Bucket": self.bucket, "Key": str(safe_key(key))}, ExpiresIn=expires)
@@ -132,9 +336,17 @@ class S3Storage(Storage):
     def presign_part(self, key: str, upload_id: str, part_number: int, expires: int = 3600) -> str:
         return self.client.generate_presigned_url("upload_part", Params={"Bucket": self.bucket, "Key": str(safe_key(key)), "UploadId": upload_id, "PartNumber": part_number}, ExpiresIn=expires)
 
+    def list_parts(self, key: str, upload_id: str) -> list[dict]:
+        parts = []
+        for page in self.client.get_paginator("list_parts").paginate(Bucket=self.bucket, Key=str(safe_key(key)), UploadId=upload_id):
+            parts.extend({"part_number": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]} for p in page.get("Parts", []))
+        return parts
+
     def finish_multipart(self, key: str, upload_id: str, parts: list[dict]) -> None:
         clean = [{"ETag": p["etag"], "PartNumber": int(p["part_number"])} for p in parts]
+        previous = self.object_size(key)
         self.client.complete_multipart_upload(Bucket=self.bucket, Key=str(safe_key(key)), UploadId=upload_id, MultipartUpload={"Parts": clean})
+        self.ledger.add(key, self.object_size(key) - previous)
 
     def abort_multipart(self, key: str, upload_id: str) -> None:
         self.client.abort_multipart_upload(Bucket=self.bucket, Key=str(safe_key(key)), UploadId=upload_id)
@@ -143,11 +355,50 @@ class S3Storage(Storage):
         self.client.head_bucket(Bucket=self.bucket)
 
 
+class S3RangeReader(io.RawIOBase):
+    """Seekable view of an S3 object; every read is a ranged GET.
+
+    Reading a ZIP's central directory through this touches only the last few
+    hundred kilobytes of the object instead of downloading all of it.
+    """
+    def __init__(self, client, bucket: str, key: str):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.length = int(client.head_object(Bucket=bucket, Key=key)["ContentLength"])
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.length}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self.length - self.position)
+        if count <= 0:
+            return 0
+        body = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{self.position + count - 1}")["Body"]
+        data = body.read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
 def make_storage(settings: Settings) -> Storage:
+    ledger = settings.data_dir / "storage-usage.json"
     if settings.storage_backend == "local":
-        return LocalStorage(settings.local_storage_dir)
+        return LocalStorage(settings.local_storage_dir, ledger)
     if settings.storage_backend == "s3":
-        return S3Storage(settings)
+        return S3Storage(settings, ledger)
     raise StorageError("STORAGE_BACKEND must be local or s3")
 
 
@@ -159,18 +410,76 @@ def sha256_file(path: Path) -> str:
     return digest.hexdigest()
 
 
+class UploadDigest:
+    """Whole-file SHA-256 of an upload, fed by its parts as they are received.
+
+    Parts that arrive in order are hashed from memory while they stream in; any
+    remainder after an out-of-order part is hashed once, in order, at the end. A part
+    written again after it was hashed sends the whole file back to that final pass.
+    """
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.next_part = 1
+        self.offset = 0
+        self.lock = Lock()
+
+    def candidate(self, part_number: int):
+        with self.lock:
+            if part_number < self.next_part:
+                # A part already hashed is being written again, possibly with other bytes.
+                self.restart()
+            return self.digest.copy() if part_number == self.next_part else None
+
+    def accept(self, part_number: int, candidate, size: int) -> None:
+        with self.lock:
+            if part_number < self.next_part:
+                # Another request for this part was accepted first; either may have written last.
+                self.restart()
+            elif candidate is not None and part_number == self.next_part:
+                self.digest = candidate
+                self.next_part += 1
+                self.offset += size
+
+    def restart(self) -> None:
+        self.digest = hashlib.sha256()
+        self.next_part = 1
+        self.offset = 0
+
+    def finish(self, path: Path) -> str:
+        with self.lock, path.open("rb") as source:
+            source.seek(self.offset)
+            for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                self.digest.update(chunk)
+            return self.digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class ProjectArchive:
+    blend_path: str
+    expanded_size: int
+    files: list[str]
+
+
 def validate_project_archive(path: Path, max_archive: int, max_expanded: int) -> str:
-    if path.stat().st_size > max_archive:
+    with path.open("rb") as source:
+        return inspect_project_archive(source, max_archive, max_expanded).blend_path
+
+
+def inspect_project_archive(source: BinaryIO, max_archive: int, max_expanded: int) -> ProjectArchive:
+    """Validate a project ZIP from its central directory alone."""
+    if source.seek(0, os.SEEK_END) > max_archive:
         raise StorageError("archive exceeds configured size limit")
     try:
-        with ZipFile(path) as archive:
+        with ZipFile(source) as archive:
             names: set[str] = set()
+            files: list[str] = []
             blend_files: list[str] = []
             expanded = 0
             compressed = 0
             for item in archive.infolist():
                 posix = PurePosixPath(item.filename.replace("\\", "/"))
-                if posix.is_absolute() or ".." in posix.parts:
+                windows = PureWindowsPath(item.filename)
+                if posix.is_absolute() or ".." in posix.parts or windows.drive or windows.anchor or ":" in item.filename:
                     raise StorageError("archive contains an unsafe path")
                 normalized = str(posix)
                 if normalized in names:
@@ -183,11 +492,13 @@ def validate_project_archive(path: Path, max_archive: int, max_expanded: int) ->
                 compressed += max(item.compress_size, 1)
                 if expanded > max_expanded or expanded > compressed * 200:
                     raise StorageError("archive expands beyond safety limits")
-                if not item.is_dir() and posix.suffix.lower() == ".blend":
-                    blend_files.append(normalized)
+                if not item.is_dir():
+                    files.append(normalized)
+                    if posix.suffix.lower() == ".blend":
+                        blend_files.append(normalized)
             if len(blend_files) != 1:
                 raise StorageError("archive must contain exactly one .blend file")
-            return blend_files[0]
+            return ProjectArchive(blend_files[0], expanded, files)
     except BadZipFile as exc:
         raise StorageError("project is not a valid ZIP archive") from exc
 
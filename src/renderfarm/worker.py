@@ -2,13 +2,18 @@ from __future__ import annotations
 
 import argparse
 import hashlib
+import hmac
 import json
 import os
 import platform
 import posixpath
+import queue
 import random
+import re
 import shutil
 import signal
+import socket
+import struct
 import subprocess
 import sys
 import tarfile
@@ -16,8 +21,12 @@ import tempfile
 import threading
 import time
 import traceback
-from pathlib import Path, PurePosixPath
-from zipfile import ZipFile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
 import httpx
 from platformdirs import user_cache_dir, user_config_dir
@@ -29,12 +38,31 @@ CONFIG_DIR = Path(user_config_dir("blend-farm", "BlendFarm"))
 CACHE_DIR = Path(user_cache_dir("blend-farm", "BlendFarm"))
 CONFIG_FILE = CONFIG_DIR / "worker.json"
 CHUNK_SIZE = 32 * 1024**2
+PART_ATTEMPTS = 4
+CHUNK_THREADS = 4
+DOWNLOAD_ATTEMPTS = 6
+SEGMENT_BYTES = 64 * 1024**2
+RESUME_ROUNDS = 3
+EXTRACT_THREADS = 4
+BLOCK_SIZE = 1024**2
+INLINE_BYTES = 16 * 1024**2
+QUEUED_BYTES = 256 * 1024**2
+ZIP_LOCAL_HEADER = b"PK\x03\x04"
+ZIP_CENTRAL_HEADER = b"PK\x01\x02"
+ZIP_END_HEADER = b"PK\x05\x06"
+ZIP_DESCRIPTOR = b"PK\x07\x08"
+FRAME_RENDERED = re.compile(r"Blend Farm: frame (-?\d+) rendered")
+FRAME_TELEMETRY = re.compile(r"Blend Farm: telemetry (\{.*\})")
 
 
 class WorkerError(RuntimeError):
     pass
 
 
+class UnsupportedArchive(WorkerError):
+    """The package cannot be extracted front to back and has to be downloaded first."""
+
+
 def load_config() -> dict:
     if not CONFIG_FILE.exists():
         raise WorkerError(f"Worker is not enrolled. Run 'blend-farm-worker enroll'. Expected {CONFIG_FILE}")
@@ -52,21 +80,64 @@ def save_config(config: dict) -> None:
     os.replace(temp, CONFIG_FILE)
 
 
-def capabilities(device: str = "AUTO", batch_size: int = 5) -> dict:
-    gpu = "unknown"
+# Hardware facts are probed at startup and then refreshed in the background, so
+# heartbeats and lease requests never wait for nvidia-smi or rocminfo.
+CAPABILITY_REFRESH_SECONDS = 300
+probed: dict = {}
+probed_lock = threading.Lock()
+
+
+def probe_gpu() -> str:
     for command in (["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"], ["rocminfo"]):
         try:
             result = subprocess.run(command, capture_output=True, text=True, timeout=5, check=False)
             if result.returncode == 0 and result.stdout.strip():
-                gpu = result.stdout.strip().splitlines()[0][:200]
-                break
+                return result.stdout.strip().splitlines()[0][:200]
         except (OSError, subprocess.TimeoutExpired):
             pass
+    return "unknown"
+
+
+def refresh_free_disk() -> None:
+    """Update the reported free disk space; called after the cache grows or is trimmed."""
+    free = shutil.disk_usage(CACHE_DIR.parent).free
+    with probed_lock:
+        probed["free_disk_bytes"] = free
+
+
+def refresh_capabilities() -> None:
+    gpu = probe_gpu()
+    with probed_lock:
+        probed["gpu"] = gpu
+    refresh_free_disk()
+
+
+def start_capability_probe(interval: float = CAPABILITY_REFRESH_SECONDS) -> threading.Thread:
+    refresh_capabilities()
+
+    def refresh() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                refresh_capabilities()
+            except Exception as exc:
+                print(f"Capability probe warning: {exc}", file=sys.stderr, flush=True)
+    thread = threading.Thread(target=refresh, name="blend-farm-capabilities", daemon=True)
+    thread.start()
+    return thread
+
+
+def capabilities(device: str = "AUTO", batch_size: int = 5, slots: int = 1) -> dict:
+    """Capabilities announced to the farm, from the last probe (run now if there has been none)."""
+    if "gpu" not in probed:
+        refresh_capabilities()
+    with probed_lock:
+        snapshot = dict(probed)
     return {
         "worker_version": __version__, "os": platform.system(), "os_version": platform.version(),
-        "architecture": platform.machine(), "cpu_count": os.cpu_count(), "gpu": gpu,
-        "render_device": device, "batch_size": batch_size,
-        "free_disk_bytes": shutil.disk_usage(CACHE_DIR.parent).free,
+        "architecture": platform.machine(), "cpu_count": os.cpu_count(), "gpu": snapshot["gpu"],
+        "render_device": device, "batch_size": batch_size, "slots": slots,
+        "free_disk_bytes": snapshot["free_disk_bytes"],
     }
 
 
@@ -74,13 +145,23 @@ class Api:
     def __init__(self, config: dict):
         self.base = config["server_url"].rstrip("/")
         self.token = config["token"]
-        self.client = httpx.Client(timeout=httpx.Timeout(60, connect=20), follow_redirects=True, headers={"Authorization": f"Bearer {self.token}", "User-Agent": f"blend-farm-worker/{__version__}"})
+        self.client = httpx.Client(timeout=httpx.Timeout(60, connect=20), follow_redirects=True, limits=httpx.Limits(max_connections=32, max_keepalive_connections=16), headers={"Authorization": f"Bearer {self.token}", "User-Agent": f"blend-farm-worker/{__version__}"})
+        # Presigned object-store URLs must not receive the farm credential, but
+        # still share one keep-alive pool across parallel part uploads.
+        self.transfers = httpx.Client(timeout=httpx.Timeout(600, connect=20), limits=httpx.Limits(max_connections=32, max_keepalive_connections=16), headers={"User-Agent": f"blend-farm-worker/{__version__}"})
+        # Farm-wide secret for LAN peer transfers, handed out by heartbeats in peer mode.
+        self.peer_secret: str | None = None
 
     def post(self, path: str, body: dict | None = None, **kwargs):
         response = self.client.post(self.base + path, json=body or {}, **kwargs)
         response.raise_for_status()
         return response
 
+    def get(self, path: str, **kwargs):
+        response = self.client.get(self.base + path, **kwargs)
+        response.raise_for_status()
+        return response
+
 
 def official_build(version: str) -> tuple[str, str, str]:
     parts = version.split(".")
@@ -101,13 +182,156 @@ def official_build(version: str) -> tuple[str, str, str]:
     return f"{root}/{filename}", f"{root}/blender-{version}.sha256", filename
 
 
-def safe_extract_zip(archive: Path, target: Path) -> None:
+def unsafe_member(name: str) -> bool:
+    """Absolute, parent-relative or drive-qualified (``C:/x``, ``C:x``) archive paths, which would escape the target on some platform."""
+    path = PurePosixPath(name.replace("\\", "/"))
+    windows = PureWindowsPath(name)
+    return path.is_absolute() or ".." in path.parts or bool(windows.drive or windows.anchor) or ":" in name
+
+
+def member_path(target: Path, name: str) -> Path:
+    """Where an archive member is written; unlike ``ZipFile.extract`` nothing is stripped, so it must stay under ``target``."""
+    path = target / name.replace("\\", "/")
+    if unsafe_member(name) or not path.resolve().is_relative_to(target.resolve()):
+        raise WorkerError("Downloaded archive contains an unsafe path")
+    return path
+
+
+def blob_path(sha256: str) -> Path:
+    return CACHE_DIR / "blobs" / sha256[:2] / sha256
+
+
+blob_lock = threading.Lock()
+hardlink_support: dict[Path, bool] = {}
+
+
+def hardlinks() -> bool:
+    """Whether project folders can hardlink into the blob store on this cache's filesystem; probed once."""
+    with blob_lock:
+        if CACHE_DIR not in hardlink_support:
+            incoming = CACHE_DIR / "blobs" / "incoming"
+            incoming.mkdir(parents=True, exist_ok=True)
+            (CACHE_DIR / "projects").mkdir(parents=True, exist_ok=True)
+            probe, link = incoming / "probe", CACHE_DIR / "projects" / ".probe"
+            probe.write_bytes(b"")
+            link.unlink(missing_ok=True)
+            try:
+                os.link(probe, link)
+                hardlink_support[CACHE_DIR] = True
+            except OSError:
+                hardlink_support[CACHE_DIR] = False
+            finally:
+                link.unlink(missing_ok=True)
+                probe.unlink(missing_ok=True)
+        return hardlink_support[CACHE_DIR]
+
+
+class BlobFile:
+    """One extracted project file, stored read-only under its SHA-256 and hardlinked into the project."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.linked = hardlinks()
+        self.digest = hashlib.sha256()
+        self.size = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Without hardlinks the file is simply written in place.
+        self.temp = CACHE_DIR / "blobs" / "incoming" / f"{os.urandom(8).hex()}.partial" if self.linked else path
+        self.temp.parent.mkdir(parents=True, exist_ok=True)
+        self.output = self.temp.open("wb")
+
+    def write(self, data: bytes) -> None:
+        if self.linked:
+            self.digest.update(data)
+        self.output.write(data)
+        self.size += len(data)
+
+    def discard(self) -> None:
+        self.output.close()
+        if self.linked:
+            self.temp.unlink(missing_ok=True)
+
+    def commit(self) -> tuple[str | None, int]:
+        """Link the file into place; returns its blob hash (None when written in place) and the bytes it added to the cache."""
+        self.output.close()
+        if not self.linked:
+            return None, self.size
+        sha256 = self.digest.hexdigest()
+        blob = blob_path(sha256)
+        stored = 0
+        with blob_lock:
+            if blob.exists():
+                self.temp.unlink()
+            else:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                # Read-only, so a scene writing through its project path cannot corrupt other versions.
+                self.temp.chmod(0o444)
+                os.replace(self.temp, blob)
+                stored = self.size
+            self.path.unlink(missing_ok=True)
+            os.link(blob, self.path)
+        return sha256, stored
+
+
+def make_writable(function, path, _error) -> None:
+    os.chmod(path, 0o644)
+    function(path)
+
+
+def remove_project(root: Path) -> int:
+    """Delete an extracted project and the blobs no other project links; returns the blob bytes freed."""
+    marker = root / ".blobs"
+    blobs = marker.read_text(encoding="utf-8").split() if marker.exists() else []
+    # Windows refuses to delete read-only files.
+    shutil.rmtree(root, onerror=make_writable) if root.exists() else None
+    freed = 0
+    with blob_lock:
+        for sha256 in blobs:
+            blob = blob_path(sha256)
+            try:
+                info = blob.stat()
+            except FileNotFoundError:
+                continue
+            if info.st_nlink == 1:
+                blob.chmod(0o644)
+                blob.unlink()
+                freed += info.st_size
+    return freed
+
+
+def safe_extract_zip(archive: Path, target: Path, threads: int = EXTRACT_THREADS, blobs: bool = False) -> list[tuple[str | None, int]]:
+    """Extract on several threads; with ``blobs``, files go through the blob store and their placements are returned."""
     with ZipFile(archive) as source:
-        for item in source.infolist():
-            path = PurePosixPath(item.filename.replace("\\", "/"))
-            if path.is_absolute() or ".." in path.parts:
-                raise WorkerError("Downloaded archive contains an unsafe path")
-        source.extractall(target)
+        members = source.infolist()
+    if any(unsafe_member(item.filename) for item in members):
+        raise WorkerError("Downloaded archive contains an unsafe path")
+    local = threading.local()
+    opened: list[ZipFile] = []
+
+    def extract(item) -> tuple[str | None, int] | None:
+        # ZipFile serializes reads on one handle, so each thread keeps its own.
+        if not hasattr(local, "source"):
+            local.source = ZipFile(archive)
+            opened.append(local.source)
+        if not blobs or item.is_dir():
+            local.source.extract(item, target)
+            return None
+        output = BlobFile(member_path(target, item.filename))
+        try:
+            with local.source.open(item) as data:
+                while block := data.read(BLOCK_SIZE):
+                    output.write(block)
+        except BaseException:
+            output.discard()
+            raise
+        return output.commit()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix="blend-farm-extract") as pool:
+            return [placed for placed in pool.map(extract, members) if placed]
+    finally:
+        for source in opened:
+            source.close()
 
 
 def safe_extract_tar(archive: Path, target: Path) -> None:
@@ -131,70 +355,208 @@ def safe_extract_tar(archive: Path, target: Path) -> None:
         source.extractall(target)
 
 
-def ensure_blender(version: str) -> Path:
-    install = CACHE_DIR / "blender"
+class PeerHandler(BaseHTTPRequestHandler):
+    """Serves cached package ZIPs and Blender archives to workers holding the farm's peer secret."""
+
+    def do_GET(self) -> None:
+        secret = self.server.secret
+        if not secret or not hmac.compare_digest(self.headers.get("X-Peer-Secret", ""), secret):
+            self.send_error(403)
+            return
+        kind, _, name = self.path.strip("/").partition("/")
+        path = None
+        if kind == "packages" and re.fullmatch(r"[0-9a-f]{64}", name):
+            path = package_archive(name, self.server.cache_dir)
+        elif kind == "blender" and re.fullmatch(r"blender-[0-9.]+-[a-z0-9-]+\.(zip|tar\.xz)", name):
+            path = self.server.cache_dir / "blender-archives" / name
+        try:
+            source = path.open("rb") if path else None
+        except OSError:
+            source = None
+        if not source:
+            self.send_error(404)
+            return
+        with source:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.fstat(source.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(source, self.wfile, BLOCK_SIZE)
+
+    def log_message(self, *_args) -> None:
+        return None
+
+
+def start_peer_server(port: int, cache_dir: Path | None = None, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), PeerHandler)
+    server.daemon_threads = True
+    server.secret = None
+    server.cache_dir = cache_dir or CACHE_DIR
+    threading.Thread(target=server.serve_forever, name="blend-farm-peer", daemon=True).start()
+    return server
+
+
+def lan_address(server_url: str) -> str:
+    """The local address used to reach the farm, which LAN peers can usually reach too."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        try:
+            probe.connect((httpx.URL(server_url).host, 9))
+            return probe.getsockname()[0]
+        except OSError:
+            return "127.0.0.1"
+
+
+def peer_capabilities(config: dict) -> dict:
+    """What this worker serves to LAN peers, announced with its capabilities."""
+    host = config.get("peer_host") or lan_address(config["server_url"])
+    archives = CACHE_DIR / "blender-archives"
+    return {
+        "url": f"http://{host}:{config['peer_port']}",
+        "packages": sorted(path.stem for path in (CACHE_DIR / "packages").glob("*.zip")),
+        "blender": sorted(path.name for path in archives.iterdir()) if archives.exists() else [],
+    }
+
+
+def fetch_from_peers(api: Api, peers: list[str], path: str, target: Path, expected: str) -> bool:
+    """Download from the first peer whose copy matches the expected SHA-256; False when none does.
+
+    Peers write to a scratch file that replaces ``target`` only once verified, so a resumable partial there survives.
+    """
+    scratch = target.with_name(target.name + ".peer")
+    for peer in peers:
+        try:
+            digest = hashlib.sha256()
+            with api.transfers.stream("GET", peer.rstrip("/") + path, headers={"X-Peer-Secret": api.peer_secret or ""}) as response:
+                response.raise_for_status()
+                with scratch.open("wb") as output:
+                    for chunk in response.iter_bytes():
+                        digest.update(chunk)
+                        output.write(chunk)
+            if digest.hexdigest() == expected:
+                os.replace(scratch, target)
+                print(f"Fetched {path.rsplit('/', 1)[-1][:24]} from peer {peer}", flush=True)
+                return True
+            print(f"Peer {peer} sent a copy with the wrong checksum", file=sys.stderr, flush=True)
+        except httpx.HTTPError as exc:
+            print(f"Peer {peer} unavailable ({exc})", file=sys.stderr, flush=True)
+        scratch.unlink(missing_ok=True)
+    return False
+
+
+blender_install_lock = threading.Lock()
+# Blender version known to be installed per cache directory, so batches skip the marker read.
+installed_blender: dict[Path, str] = {}
+# Batches and resident Blenders running from each install; guarded by blender_install_lock.
+blender_users: dict[Path, int] = {}
+
+
+def remove_unused_blenders() -> None:
+    """Delete installs older than the newest one that nothing runs from; called with blender_install_lock held."""
+    installs = [path for path in [CACHE_DIR / "blender", *(CACHE_DIR / "blenders").glob("*")] if (path / ".version").exists()]
+    if not installs:
+        return
+    newest = max(installs, key=lambda path: (path / ".version").stat().st_mtime)
+    for install in installs:
+        if install != newest and not blender_users.get(install):
+            shutil.rmtree(install, ignore_errors=True)
+
+
+def ensure_blender(version: str, api: Api | None = None, peers: list[dict] | None = None) -> Path:
+    """Install the farm's official Blender build; in peer mode (``peers`` given) LAN peers are tried first and the archive is kept for them.
+
+    Each version gets its own directory, so slots still rendering with the previous one keep it until they finish.
+    """
+    url, checksum_url, filename = official_build(version)
+    install = CACHE_DIR / "blenders" / version
     marker = install / ".version"
     executable = install / ("blender.exe" if platform.system() == "Windows" else "blender")
-    if marker.exists() and marker.read_text().strip() == version and executable.exists():
+    if installed_blender.get(CACHE_DIR) == version and executable.exists():
         return executable
-    url, checksum_url, filename = official_build(version)
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    with tempfile.TemporaryDirectory(prefix="blend-farm-install-") as temp_name:
-        temp = Path(temp_name)
-        archive = temp / filename
-        print(f"Downloading Blender {version}…")
-        with httpx.stream("GET", url, follow_redirects=True, timeout=600) as response:
-            response.raise_for_status()
-            with archive.open("wb") as output:
-                for chunk in response.iter_bytes(1024 * 1024):
-                    output.write(chunk)
-        checksums = httpx.get(checksum_url, follow_redirects=True, timeout=60)
-        checksums.raise_for_status()
-        expected = None
-        for line in checksums.text.splitlines():
-            if line.strip().endswith(filename):
-                expected = line.split()[0].lower()
-                break
-        if not expected or sha256_file(archive) != expected:
-            raise WorkerError("Blender download did not match the official published checksum")
-        extracted = temp / "extracted"
-        extracted.mkdir()
-        safe_extract_zip(archive, extracted) if filename.endswith(".zip") else safe_extract_tar(archive, extracted)
-        roots = [p for p in extracted.iterdir() if p.is_dir()]
-        source = roots[0] if len(roots) == 1 else extracted
-        staged = CACHE_DIR / "blender.new"
-        backup = CACHE_DIR / "blender.old"
-        shutil.rmtree(staged, ignore_errors=True)
-        shutil.rmtree(backup, ignore_errors=True)
-        shutil.move(str(source), staged)
-        (staged / ".version").write_text(version)
-        if install.exists():
-            shutil.move(install, backup)
-        try:
-            shutil.move(staged, install)
-        except Exception:
-            if backup.exists():
-                shutil.move(backup, install)
-            raise
-        shutil.rmtree(backup, ignore_errors=True)
+    # Render slots share one install; only the first of them downloads it.
+    with blender_install_lock:
+        if marker.exists() and marker.read_text().strip() == version and executable.exists():
+            installed_blender[CACHE_DIR] = version
+            return executable
+        installed_blender.pop(CACHE_DIR, None)
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="blend-farm-install-") as temp_name:
+            temp = Path(temp_name)
+            archive = temp / filename
+            checksums = httpx.get(checksum_url, follow_redirects=True, timeout=60)
+            checksums.raise_for_status()
+            expected = None
+            for line in checksums.text.splitlines():
+                if line.strip().endswith(filename):
+                    expected = line.split()[0].lower()
+                    break
+            if not expected:
+                raise WorkerError("Blender download did not match the official published checksum")
+            kept = CACHE_DIR / "blender-archives" / filename
+            sources = [peer["url"] for peer in peers or [] if filename in peer.get("blender", [])]
+            if kept.exists() and sha256_file(kept) == expected:
+                archive = kept
+            elif not (api and sources and fetch_from_peers(api, sources, f"/blender/{filename}", archive, expected)):
+                print(f"Downloading Blender {version}…")
+                with httpx.stream("GET", url, follow_redirects=True, timeout=600) as response:
+                    response.raise_for_status()
+                    with archive.open("wb") as output:
+                        for chunk in response.iter_bytes(1024 * 1024):
+                            output.write(chunk)
+                if sha256_file(archive) != expected:
+                    raise WorkerError("Blender download did not match the official published checksum")
+            extracted = temp / "extracted"
+            extracted.mkdir()
+            safe_extract_zip(archive, extracted) if filename.endswith(".zip") else safe_extract_tar(archive, extracted)
+            roots = [p for p in extracted.iterdir() if p.is_dir()]
+            source = roots[0] if len(roots) == 1 else extracted
+            staged = install.with_name(f"{version}.new")
+            shutil.rmtree(staged, ignore_errors=True)
+            # An install without a matching marker never finished, so nothing runs from it.
+            shutil.rmtree(install, ignore_errors=True)
+            staged.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(source), staged)
+            (staged / ".version").write_text(version)
+            os.replace(staged, install)
+            if peers is not None and archive != kept:
+                shutil.rmtree(kept.parent, ignore_errors=True)
+                kept.parent.mkdir(parents=True)
+                shutil.move(archive, kept)
+        remove_unused_blenders()
     if not executable.exists():
         raise WorkerError("Blender installation completed but its executable was not found")
+    installed_blender[CACHE_DIR] = version
+    refresh_free_disk()
     return executable
 
 
-def download_project(api: Api, lease: dict) -> Path:
-    projects = CACHE_DIR / "projects"
-    root = projects / lease["package_sha256"]
-    ready = root / ".ready"
-    if ready.exists():
-        os.utime(ready, None)
-        print(f"Using cached project {lease['package_sha256'][:12]}…", flush=True)
-        return root
-    shutil.rmtree(root, ignore_errors=True)
-    root.mkdir(parents=True)
-    archive = root / "project.zip"
-    print(f"Downloading project {lease['package_sha256'][:12]}…", flush=True)
-    request = api.client.build_request("GET", lease["package_url"], headers={"X-Lease-Token":lease["lease_token"]})
+def hold_blender(version: str) -> Path:
+    """ensure_blender for a batch; the install is kept until release_blender even if another slot moves to a newer version."""
+    while True:
+        blender = ensure_blender(version)
+        if hold_install(blender):
+            return blender
+
+
+def hold_install(blender: Path) -> bool:
+    """Count one more user of the install blender runs from; False when it was removed since it was checked."""
+    with blender_install_lock:
+        if not blender.parent.exists():
+            return False
+        blender_users[blender.parent] = blender_users.get(blender.parent, 0) + 1
+        return True
+
+
+def release_blender(blender: Path) -> None:
+    with blender_install_lock:
+        blender_users[blender.parent] -= 1
+        if not blender_users[blender.parent]:
+            del blender_users[blender.parent]
+            remove_unused_blenders()
+
+
+def stream_to(api: Api, url: str, lease_token: str, output) -> str:
+    """Stream a farm download, or the object-store URL it answers with, into output and return its SHA-256."""
+    request = api.client.build_request("GET", url, headers={"X-Lease-Token":lease_token})
     response = api.client.send(request, stream=True)
     remote_client = None
     if response.headers.get("content-type", "").startswith("application/json"):
@@ -206,75 +568,804 @@ def download_project(api: Api, lease: dict) -> Path:
     try:
         response.raise_for_status()
         digest = hashlib.sha256()
-        with archive.open("wb") as output:
-            for chunk in response.iter_bytes(1024 * 1024):
-                digest.update(chunk)
-                output.write(chunk)
+        for chunk in response.iter_bytes(1024 * 1024):
+            digest.update(chunk)
+            output.write(chunk)
+    finally:
+        response.close()
+        if remote_client:
+            remote_client.close()
+    return digest.hexdigest()
+
+
+def chunk_path(sha256: str) -> Path:
+    return CACHE_DIR / "chunks" / sha256[:2] / sha256
+
+
+def fetch_chunked_package(api: Api, lease: dict, archive: Path) -> str | None:
+    """Rebuild a package from cached chunks, downloading only the ones this worker lacks."""
+    try:
+        manifest = api.get(f"/api/v1/worker/leases/{lease['frame_id']}/package/manifest", headers={"X-Lease-Token":lease["lease_token"]}).json()
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code == 404:
+            return None
+        raise
+    needed = list(dict.fromkeys(sha for sha, _size in manifest["chunks"]))
+    missing = [sha for sha in needed if not chunk_path(sha).exists()]
+    print(f"Fetching {len(missing)} of {len(needed)} project chunks…", flush=True)
+
+    def fetch(sha: str) -> None:
+        path = chunk_path(sha)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(sha + ".partial")
+        with temp.open("wb") as output:
+            checksum = stream_to(api, api.base + f"/api/v1/worker/leases/{lease['frame_id']}/chunks/{sha}", lease["lease_token"], output)
+        if checksum != sha:
+            temp.unlink(missing_ok=True)
+            raise WorkerError("Project chunk checksum mismatch")
+        os.replace(temp, path)
+        index.record(f"chunks/{sha[:2]}/{sha}", path.stat().st_size)
+
+    index = cache_index()
+    with ThreadPoolExecutor(max_workers=CHUNK_THREADS, thread_name_prefix="blend-farm-chunks") as pool:
+        list(pool.map(fetch, missing))
+    digest = hashlib.sha256()
+    with archive.open("wb") as output:
+        for sha, _size in manifest["chunks"]:
+            path = chunk_path(sha)
+            index.touch(f"chunks/{sha[:2]}/{sha}")
+            with path.open("rb") as source:
+                while block := source.read(1024 * 1024):
+                    digest.update(block)
+                    output.write(block)
+    index.save()
+    return digest.hexdigest()
+
+
+def open_range(api: Api, url: str, lease_token: str, start: int = 0, end: int | None = None):
+    """GET a byte range from the farm, following it to object storage when it answers with a URL."""
+    ranged = {"Range": f"bytes={start}-{'' if end is None else end}"} if start or end is not None else {}
+    response = api.client.send(api.client.build_request("GET", url, headers={"X-Lease-Token":lease_token, **ranged}), stream=True)
+    remote_client = None
+    if response.headers.get("content-type", "").startswith("application/json"):
+        response.read()
+        remote_url = response.json()["url"]
+        response.close()
+        remote_client = httpx.Client(timeout=600)
+        response = remote_client.send(httpx.Request("GET", remote_url, headers=ranged), stream=True)
+    return response, remote_client
+
+
+def zip64_sizes(extra: bytes, size: int, compressed: int) -> tuple[int, int]:
+    while len(extra) >= 4:
+        field, length = struct.unpack("<HH", extra[:4])
+        if field == 0x0001:
+            values = iter(struct.unpack(f"<{length // 8}Q", extra[4:4 + length // 8 * 8]))
+            if size == 0xFFFFFFFF:
+                size = next(values)
+            if compressed == 0xFFFFFFFF:
+                compressed = next(values)
+            return size, compressed
+        extra = extra[4 + length:]
+    raise UnsupportedArchive("ZIP64 entry without sizes")
+
+
+class StreamReader:
+    """File-like view of a download that is read and hashed on its own thread, ahead of extraction."""
+
+    def __init__(self, chunks, depth: int = 64, copy=None):
+        self.digest = hashlib.sha256()
+        self.copy = copy
+        self.pending = bytearray()
+        self.done = False
+        self.queue: queue.Queue = queue.Queue(maxsize=depth)
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._pump, args=(chunks,), name="blend-farm-stream", daemon=True)
+        self.thread.start()
+
+    def _put(self, item) -> bool:
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _pump(self, chunks) -> None:
+        try:
+            for chunk in chunks:
+                self.digest.update(chunk)
+                if self.copy:
+                    self.copy.write(chunk)
+                if not self._put(chunk):
+                    return
+            self._put(None)
+        except BaseException as exc:
+            self._put(exc)
+
+    def read(self, size: int) -> bytes:
+        while len(self.pending) < size and not self.done:
+            item = self.queue.get()
+            if isinstance(item, BaseException):
+                self.done = True
+                raise item
+            if item is None:
+                self.done = True
+            else:
+                self.pending += item
+        data = bytes(self.pending[:size])
+        del self.pending[:size]
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) != size:
+            raise WorkerError("Project download ended early")
+        return data
+
+    def unread(self, data: bytes) -> None:
+        self.pending[:0] = data
+
+    def drain(self) -> None:
+        while not self.done:
+            self.read(len(self.pending) + CHUNK_SIZE)
+            self.pending.clear()
+
+    def close(self) -> None:
+        self.stopping.set()
+        self.thread.join(timeout=5)
+
+
+def write_member(path: Path, data: bytes, method: int, crc: int, size: int) -> tuple[str | None, int]:
+    if method == ZIP_DEFLATED:
+        data = zlib.decompressobj(-15).decompress(data, size + 1)
+    if len(data) != size or zlib.crc32(data) != crc:
+        raise WorkerError(f"Project archive entry is corrupt: {path.name}")
+    output = BlobFile(path)
+    output.write(data)
+    return output.commit()
+
+
+def stream_member(reader: StreamReader, path: Path, method: int, compressed: int | None, size: int | None) -> tuple[int, int, tuple[str | None, int]]:
+    """Inflate one entry from the stream to disk; ``compressed`` is None when only the deflate stream marks its end."""
+    decompressor = zlib.decompressobj(-15) if method == ZIP_DEFLATED else None
+    remaining = compressed
+    crc = written = 0
+    output = BlobFile(path)
+    try:
+        while remaining is None or remaining > 0:
+            block = reader.read(BLOCK_SIZE if remaining is None else min(remaining, BLOCK_SIZE))
+            if not block:
+                raise WorkerError("Project download ended early")
+            if remaining is not None:
+                remaining -= len(block)
+            while block:
+                data = decompressor.decompress(block, BLOCK_SIZE) if decompressor else block
+                block = decompressor.unconsumed_tail if decompressor else b""
+                crc = zlib.crc32(data, crc)
+                written += len(data)
+                if size is not None and written > size:
+                    raise WorkerError(f"Project archive entry is corrupt: {path.name}")
+                output.write(data)
+            if decompressor and decompressor.eof:
+                if remaining is None:
+                    reader.unread(decompressor.unused_data)
+                break
+        if decompressor and not decompressor.eof:
+            raise WorkerError(f"Project archive entry is corrupt: {path.name}")
+    except BaseException:
+        output.discard()
+        raise
+    return crc, written, output.commit()
+
+
+def extract_stream(reader: StreamReader, target: Path, threads: int = EXTRACT_THREADS) -> list[tuple[str | None, int]]:
+    """Extract a ZIP front to back from its local headers as it arrives, small entries on a thread pool; returns each file's placement."""
+    pending: deque = deque()
+    placed: list[tuple[str | None, int]] = []
+    queued = 0
+    with ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix="blend-farm-extract") as pool:
+        try:
+            while (signature := reader.read(4)) == ZIP_LOCAL_HEADER:
+                _version, flags, method, _time, _date, crc, compressed, size, name_length, extra_length = struct.unpack("<HHHHHIIIHH", reader.read_exact(26))
+                name = reader.read_exact(name_length).decode("utf-8" if flags & 0x800 else "cp437")
+                extra = reader.read_exact(extra_length)
+                if unsafe_member(name):
+                    raise WorkerError("Downloaded archive contains an unsafe path")
+                # Encrypted entries, other codecs and stored entries of unknown length need the central directory.
+                if flags & 0x1 or method not in (ZIP_STORED, ZIP_DEFLATED) or (flags & 0x8 and method == ZIP_STORED):
+                    raise UnsupportedArchive(f"entry {name} cannot be streamed")
+                zip64 = 0xFFFFFFFF in (size, compressed)
+                if zip64:
+                    size, compressed = zip64_sizes(extra, size, compressed)
+                path = member_path(target, name)
+                if name.endswith(("/", "\\")):
+                    path.mkdir(parents=True, exist_ok=True)
+                    reader.read_exact(compressed)
+                elif flags & 0x8:
+                    actual_crc, actual_size, placement = stream_member(reader, path, method, None, None)
+                    placed.append(placement)
+                    head = reader.read_exact(4)
+                    crc = struct.unpack("<I", reader.read_exact(4) if head == ZIP_DESCRIPTOR else head)[0]
+                    size = struct.unpack("<QQ" if zip64 else "<II", reader.read_exact(16 if zip64 else 8))[1]
+                    if (actual_crc, actual_size) != (crc, size):
+                        raise WorkerError(f"Project archive entry is corrupt: {name}")
+                elif compressed > INLINE_BYTES:
+                    actual_crc, actual_size, placement = stream_member(reader, path, method, compressed, size)
+                    placed.append(placement)
+                    if (actual_crc, actual_size) != (crc, size):
+                        raise WorkerError(f"Project archive entry is corrupt: {name}")
+                else:
+                    data = reader.read_exact(compressed)
+                    while pending and (queued + compressed > QUEUED_BYTES or pending[0][0].done()):
+                        future, amount = pending.popleft()
+                        placed.append(future.result())
+                        queued -= amount
+                    pending.append((pool.submit(write_member, path, data, method, crc, size), compressed))
+                    queued += compressed
+            if signature not in (ZIP_CENTRAL_HEADER, ZIP_END_HEADER):
+                raise UnsupportedArchive("unexpected record before the central directory")
+            placed.extend(future.result() for future, _amount in pending)
+        except BaseException:
+            for future, _amount in pending:
+                future.cancel()
+            raise
+    reader.drain()
+    return placed
+
+
+def stream_package(api: Api, lease: dict, target: Path, partial: Path, threads: int = EXTRACT_THREADS, keep: Path | None = None) -> tuple[str, list[tuple[str | None, int]]]:
+    """Extract the leased package straight from the download; returns its SHA-256 and file placements.
+
+    The received bytes are also written to ``partial``, which a failed stream leaves behind for
+    ``download_sequential`` to resume. On success it becomes ``keep`` (served to peers) or is removed.
+    """
+    response, remote_client = open_range(api, lease["package_url"], lease["lease_token"])
+    reader = checksum = None
+    partial.parent.mkdir(parents=True, exist_ok=True)
+    copy = partial.open("wb")
+    try:
+        response.raise_for_status()
+        reader = StreamReader(response.iter_bytes(), copy=copy)
+        placed = extract_stream(reader, target, threads)
+        checksum = reader.digest.hexdigest()
     finally:
+        if reader:
+            reader.close()
+        copy.close()
         response.close()
         if remote_client:
             remote_client.close()
-    if digest.hexdigest() != lease["package_sha256"]:
-        shutil.rmtree(root, ignore_errors=True)
-        raise WorkerError("Project package checksum mismatch")
-    safe_extract_zip(archive, root)
-    archive.unlink()
-    ready.write_text(lease["package_sha256"])
-    print(f"Project extracted to {root}", flush=True)
-    return root
-
-
-def trim_cache(max_bytes: int, keep: Path | None = None) -> None:
-    root = CACHE_DIR / "projects"
-    if not root.exists():
+        # A failure before any bytes arrived leaves nothing to resume; the next attempt streams again.
+        if checksum is None and not partial.stat().st_size:
+            partial.unlink()
+    if keep:
+        keep.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(partial, keep)
+    else:
+        partial.unlink()
+    return checksum, placed
+
+
+def download_sequential(api: Api, url: str, lease_token: str, target: Path) -> str:
+    """Append to target from where it stops, hashing as bytes arrive; returns the whole file's SHA-256."""
+    digest = hashlib.sha256()
+    offset = 0
+    if target.exists():
+        # Resuming after a restart: the hash state is rebuilt from the local prefix once.
+        with target.open("rb") as source:
+            while block := source.read(1024 * 1024):
+                digest.update(block)
+                offset += len(block)
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        response, remote_client = open_range(api, url, lease_token, offset)
+        try:
+            if response.status_code == 416 and offset:
+                return digest.hexdigest()
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                # Range was ignored; the body starts at byte zero.
+                digest, offset = hashlib.sha256(), 0
+            with target.open("ab" if offset else "wb") as output:
+                for chunk in response.iter_bytes():
+                    digest.update(chunk)
+                    output.write(chunk)
+                    offset += len(chunk)
+            return digest.hexdigest()
+        except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+            if attempt == DOWNLOAD_ATTEMPTS or not retryable(exc):
+                raise
+            print(f"Download interrupted at {offset / 1024**2:.0f} MiB ({exc}); resuming…", file=sys.stderr, flush=True)
+            time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1))
+        finally:
+            response.close()
+            if remote_client:
+                remote_client.close()
+    raise WorkerError("Project download did not complete")
+
+
+def download_segments(api: Api, url: str, lease_token: str, target: Path, threads: int) -> str | None:
+    """Fetch fixed-size ranges in parallel into a preallocated file; None when ranges are unsupported."""
+    state_file = target.with_name(target.name + ".json")
+    try:
+        state = json.loads(state_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        state = None
+    # The sidecar is only valid next to the preallocated file it describes.
+    if state and (not target.exists() or target.stat().st_size < state["size"]):
+        state = None
+    if state is None:
+        response, remote_client = open_range(api, url, lease_token, 0, 0)
+        try:
+            response.raise_for_status()
+            if response.status_code != 206 or "/" not in response.headers.get("content-range", ""):
+                return None
+            size = int(response.headers["content-range"].rsplit("/", 1)[1])
+        finally:
+            response.close()
+            if remote_client:
+                remote_client.close()
+        prefix = target.stat().st_size if target.exists() else 0
+        # A prefix left by a sequential download counts for the segments it covers.
+        state = {"size": size, "done": list(range(min(prefix, size) // SEGMENT_BYTES))}
+        state_file.write_text(json.dumps(state), encoding="utf-8")
+        with target.open("r+b" if target.exists() else "wb") as output:
+            output.truncate(size)
+    size = state["size"]
+    done = set(state["done"])
+    lock = threading.Lock()
+
+    def fetch(index: int) -> None:
+        start = index * SEGMENT_BYTES
+        end = min(start + SEGMENT_BYTES, size) - 1
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            response, remote_client = open_range(api, url, lease_token, start, end)
+            try:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise WorkerError("Server ignored a range request")
+                with target.open("r+b") as output:
+                    output.seek(start)
+                    written = 0
+                    for chunk in response.iter_bytes():
+                        output.write(chunk)
+                        written += len(chunk)
+                if written != end - start + 1:
+                    raise httpx.ReadError("short range response")
+                break
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                if attempt == DOWNLOAD_ATTEMPTS or not retryable(exc):
+                    raise
+                time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1))
+            finally:
+                response.close()
+                if remote_client:
+                    remote_client.close()
+        with lock:
+            done.add(index)
+            state_file.write_text(json.dumps({"size": size, "done": sorted(done)}), encoding="utf-8")
+
+    missing = [index for index in range(-(-size // SEGMENT_BYTES)) if index not in done]
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="blend-farm-download") as pool:
+        list(pool.map(fetch, missing))
+    state_file.unlink(missing_ok=True)
+    return sha256_file(target)
+
+
+def download_package(api: Api, lease: dict, target: Path, threads: int = 1) -> str:
+    """Download the leased package into a persistent partial file and return its SHA-256."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    checksum = None
+    if threads > 1 or target.with_name(target.name + ".json").exists():
+        checksum = download_segments(api, lease["package_url"], lease["lease_token"], target, max(threads, 1))
+    return checksum or download_sequential(api, lease["package_url"], lease["lease_token"], target)
+
+
+project_locks: dict[str, threading.Lock] = {}
+project_locks_guard = threading.Lock()
+
+
+def project_lock(sha256: str) -> threading.Lock:
+    """Serializes preparing one project between the render loop and the prefetch thread."""
+    with project_locks_guard:
+        return project_locks.setdefault(sha256, threading.Lock())
+
+
+def package_archive(sha256: str, cache_dir: Path | None = None) -> Path:
+    return (cache_dir or CACHE_DIR) / "packages" / f"{sha256}.zip"
+
+
+def download_project(api: Api, lease: dict, threads: int = 1, keep_archive: bool = False) -> Path:
+    """Prepare a leased project in the cache; ``keep_archive`` keeps its ZIP for LAN peers."""
+    sha256 = lease["package_sha256"]
+    with project_lock(sha256):
+        projects = CACHE_DIR / "projects"
+        root = projects / sha256
+        ready = root / ".ready"
+        index = cache_index()
+        # Loaded before extracting, so a rebuild scan cannot count this project's new blobs twice.
+        index.load()
+        if ready.exists():
+            index.touch(f"projects/{sha256}")
+            index.save()
+            print(f"Using cached project {sha256[:12]}…", flush=True)
+            return root
+        remove_project(root)
+        root.mkdir(parents=True)
+        archive = root / "project.zip"
+        kept = package_archive(sha256)
+        # The partial survives failures and restarts so the next attempt resumes it.
+        partial = CACHE_DIR / "downloads" / f"{sha256}.zip.partial"
+        print(f"Downloading project {sha256[:12]}…", flush=True)
+        checksum = None
+        if kept.exists():
+            archive, checksum = kept, sha256_file(kept)
+        elif lease.get("package_peers") and api.peer_secret:
+            partial.parent.mkdir(parents=True, exist_ok=True)
+            if fetch_from_peers(api, lease["package_peers"], f"/packages/{sha256}", partial, sha256):
+                archive, checksum = partial, sha256
+        if checksum is None and "frame_id" in lease:
+            checksum = fetch_chunked_package(api, lease, archive)
+        if checksum is None and threads <= 1 and not partial.exists():
+            try:
+                checksum, placed = stream_package(api, lease, root, partial, keep=kept if keep_archive else None)
+                archive = None
+            except (UnsupportedArchive, httpx.TransportError) as exc:
+                print(f"Extracting while downloading failed ({exc}); resuming the download into the archive…", file=sys.stderr, flush=True)
+                remove_project(root)
+                root.mkdir(parents=True)
+        if checksum is None:
+            archive = partial
+            checksum = download_package(api, lease, archive, threads)
+        if checksum != sha256:
+            for stale in (archive, kept):
+                if stale:
+                    stale.unlink(missing_ok=True)
+            remove_project(root)
+            raise WorkerError("Project package checksum mismatch")
+        if archive:
+            placed = safe_extract_zip(archive, root, blobs=True)
+            if keep_archive and archive != kept:
+                kept.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(archive, kept)
+            elif not keep_archive and archive != kept:
+                archive.unlink()
+        blobs = sorted({sha for sha, _stored in placed if sha})
+        (root / ".blobs").write_text("\n".join(blobs), encoding="utf-8")
+        ready.write_text(sha256)
+        # Linked files live in the shared blob total; only files written in place belong to the project.
+        index.record(f"projects/{sha256}", sum(stored for sha, stored in placed if not sha))
+        index.grow("blobs", sum(stored for sha, stored in placed if sha))
+        if kept.exists():
+            index.record(f"packages/{sha256}.zip", kept.stat().st_size)
+        index.save()
+        print(f"Project extracted to {root}", flush=True)
+        return root
+
+
+def owned_size(folder: Path) -> int:
+    """Bytes of the files under folder that are not shared with the blob store."""
+    return sum(info.st_size for f in folder.rglob("*") if f.is_file() and (info := f.stat()).st_nlink == 1)
+
+
+class CacheIndex:
+    """Size and last use of each cached project and chunk, plus the blob store total, kept in index.json so trimming never walks the cache."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.path = root / "index.json"
+        self.lock = threading.RLock()
+        self.entries: dict[str, dict] | None = None
+        # Slot name -> entry kept out of eviction: the project in use and the prefetched one.
+        self.pins: dict[str, str] = {"blobs": "blobs"}
+
+    def load(self) -> dict[str, dict]:
+        with self.lock:
+            if self.entries is None:
+                try:
+                    self.entries = json.loads(self.path.read_text(encoding="utf-8"))["entries"]
+                except (OSError, ValueError, KeyError):
+                    self.entries = self.scan()
+                    self.save()
+            return self.entries
+
+    def scan(self) -> dict[str, dict]:
+        """Rebuild the index from disk; only needed when index.json is missing or unreadable."""
+        entries = {}
+        for ready in (self.root / "projects").glob("*/.ready"):
+            entries[f"projects/{ready.parent.name}"] = {"size": owned_size(ready.parent), "used": ready.stat().st_mtime}
+        for chunk in (self.root / "chunks").glob("*/*"):
+            if not chunk.name.endswith(".partial"):
+                stat = chunk.stat()
+                entries[f"chunks/{chunk.parent.name}/{chunk.name}"] = {"size": stat.st_size, "used": stat.st_mtime}
+        stored = 0
+        for blob in (self.root / "blobs").glob("??/*"):
+            info = blob.stat()
+            if info.st_nlink == 1:
+                # Left behind by an interrupted extraction or eviction.
+                blob.chmod(0o644)
+                blob.unlink()
+            else:
+                stored += info.st_size
+        entries["blobs"] = {"size": stored, "used": 0}
+        return entries
+
+    def record(self, name: str, size: int) -> None:
+        with self.lock:
+            self.load()[name] = {"size": size, "used": time.time()}
+
+    def touch(self, name: str) -> None:
+        with self.lock:
+            entries = self.load()
+            if name not in entries:
+                entries[name] = {"size": owned_size(self.root / name), "used": 0}
+            entries[name]["used"] = time.time()
+
+    def grow(self, name: str, delta: int) -> None:
+        with self.lock:
+            self.load().setdefault(name, {"size": 0, "used": 0})["size"] += delta
+
+    def save(self) -> None:
+        with self.lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            temp = self.path.with_name("index.json.partial")
+            temp.write_text(json.dumps({"entries": self.entries or {}}), encoding="utf-8")
+            os.replace(temp, self.path)
+
+
+cache_indexes: dict[Path, CacheIndex] = {}
+
+
+def cache_index() -> CacheIndex:
+    with project_locks_guard:
+        if CACHE_DIR not in cache_indexes:
+            cache_indexes[CACHE_DIR] = CacheIndex(CACHE_DIR)
+        return cache_indexes[CACHE_DIR]
+
+
+def trim_cache(max_bytes: int) -> int:
+    """Evict least recently used cache entries down to max_bytes; returns the bytes still cached."""
+    index = cache_index()
+    downloads = CACHE_DIR / "downloads"
+    with index.lock:
+        entries = index.load()
+        # A partial download and its segment sidecar are one entry: evicting either alone leaves the other unusable.
+        partials: dict[str, list[tuple[Path, os.stat_result]]] = {}
+        for f in downloads.iterdir() if downloads.exists() else []:
+            if f.is_file():
+                partials.setdefault(f.name.split(".")[0], []).append((f, f.stat()))
+        current = sum(entry["size"] for entry in entries.values()) + sum(stat.st_size for group in partials.values() for _f, stat in group)
+        # Chunks and partial downloads may be mid-use while any project is being prepared.
+        preparing = {sha for sha, lock in list(project_locks.items()) if lock.locked()}
+        candidates = [(entry["used"], name, entry["size"]) for name, entry in entries.items() if name not in index.pins.values() and name.removeprefix("projects/") not in preparing and not (preparing and name.startswith("chunks/"))]
+        candidates += [(max(stat.st_mtime for _f, stat in group), [f for f, _stat in group], sum(stat.st_size for _f, stat in group)) for sha, group in partials.items() if sha not in preparing]
+        for _used, entry, size in sorted(candidates, key=lambda candidate: candidate[0]):
+            if current <= max_bytes:
+                break
+            if isinstance(entry, list):
+                for f in entry:
+                    f.unlink(missing_ok=True)
+            elif entry.startswith("projects/"):
+                freed = remove_project(CACHE_DIR / entry)
+                index.grow("blobs", -freed)
+                size += freed
+                del entries[entry]
+            else:
+                (CACHE_DIR / entry).unlink(missing_ok=True)
+                del entries[entry]
+            current -= size
+        index.save()
+    return current
+
+
+def prefetch_project(api: Api, config: dict, upcoming: dict, slot: int = 0) -> None:
+    """Prepare the package the farm expects to hand out next, if it fits in cache_gb next to the pinned ones."""
+    if (CACHE_DIR / "projects" / upcoming["sha256"] / ".ready").exists() or project_lock(upcoming["sha256"]).locked():
         return
-    entries = sorted((p for p in root.iterdir() if p.is_dir() and p != keep), key=lambda p: (p / ".ready").stat().st_mtime if (p / ".ready").exists() else 0)
-    def size(): return sum(f.stat().st_size for p in root.iterdir() for f in p.rglob("*") if f.is_file())
-    current = size()
-    for entry in entries:
-        if current <= max_bytes:
-            break
-        entry_size = sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
-        shutil.rmtree(entry)
-        current -= entry_size
+    max_bytes = int(config.get("cache_gb", 50)) * 1024**3
+    if trim_cache(max_bytes - upcoming["expanded_size"]) + upcoming["expanded_size"] > max_bytes:
+        print(f"Not prefetching project {upcoming['sha256'][:12]}: it does not fit in the cache", flush=True)
+        return
+    try:
+        download_project(api, {"package_sha256": upcoming["sha256"], "package_url": upcoming["url"], "lease_token": "", "package_peers": upcoming.get("peers", [])}, int(config.get("download_threads", 1)), bool(config.get("peer_port")))
+        cache_index().pins[f"slot-{slot}-next"] = f"projects/{upcoming['sha256']}"
+        refresh_free_disk()
+    except Exception as exc:
+        print(f"Prefetch warning: {exc}", file=sys.stderr, flush=True)
 
 
-def upload_artifact(api: Api, lease_token: str, path: Path, purpose: str, content_type: str) -> str:
-    checksum = sha256_file(path)
-    frame_id = path.parent.name
-    # The caller places outputs in a directory named with the assigned frame id.
-    init = api.post(f"/api/v1/worker/leases/{frame_id}/uploads", {"purpose":purpose,"filename":path.name,"total_size":path.stat().st_size,"sha256":checksum,"content_type":content_type}, headers={"X-Lease-Token":lease_token}).json()
-    completed = []
+class PartUrls:
+    """Presigned part URLs fetched lazily in small windows and refreshed before expiry."""
+    def __init__(self, api: Api, path: str, lease_token: str, window: int = 16):
+        self.api = api
+        self.path = path
+        self.lease_token = lease_token
+        self.window = window
+        self.urls: dict[int, tuple[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, part: int) -> str:
+        with self.lock:
+            url, expires = self.urls.get(part, ("", 0.0))
+            if time.monotonic() < expires:
+                return url
+            result = self.api.post(self.path, {"start": part, "count": self.window}, headers={"X-Lease-Token": self.lease_token}).json()
+            expires = time.monotonic() + max(int(result["expires_in"]) - 60, 30)
+            self.urls.update({int(item["part_number"]): (item["url"], expires) for item in result["parts"]})
+            return self.urls[part][0]
+
+    def invalidate(self, part: int) -> None:
+        with self.lock:
+            self.urls.pop(part, None)
+
+
+def retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code in (408, 429)
+    return isinstance(exc, httpx.TransportError)
+
+
+def read_part(path: Path, chunk_size: int, part: int) -> bytes:
     with path.open("rb") as source:
-        part = 1
-        while chunk := source.read(init["chunk_size"]):
-            digest = hashlib.sha256(chunk).hexdigest()
+        source.seek((part - 1) * chunk_size)
+        return source.read(chunk_size)
+
+
+def upload_part(api: Api, init: dict, frame_id: str, lease_token: str, path: Path, part: int, urls: PartUrls | None = None) -> dict:
+    chunk = read_part(path, init["chunk_size"], part)
+    digest = hashlib.sha256(chunk).hexdigest()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
             if init["backend"] == "s3":
-                response = httpx.put(init["parts"][part-1]["url"], content=chunk, timeout=600)
+                response = api.transfers.put(urls.get(part), content=chunk)
+                if response.status_code == 403 and attempt < PART_ATTEMPTS:
+                    # Most likely an expired signature; fetch a fresh URL.
+                    urls.invalidate(part)
+                    continue
                 response.raise_for_status()
-                completed.append({"part_number":part,"etag":response.headers["etag"]})
-            else:
-                response = api.client.put(api.base + f"/api/v1/worker/leases/{frame_id}/uploads/{init['id']}/parts/{part}", content=chunk, headers={"X-Lease-Token":lease_token,"X-Chunk-SHA256":digest})
-                response.raise_for_status()
-            part += 1
+                return {"part_number":part,"etag":response.headers["etag"]}
+            response = api.client.put(api.base + f"/api/v1/worker/leases/{frame_id}/uploads/{init['id']}/parts/{part}", content=chunk, headers={"X-Lease-Token":lease_token,"X-Chunk-SHA256":digest})
+            response.raise_for_status()
+            return {"part_number":part,"sha256":digest}
+        except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+            if attempt == PART_ATTEMPTS or not retryable(exc):
+                raise
+            print(f"Part {part} of {path.name} failed ({exc}); retrying…", file=sys.stderr, flush=True)
+            time.sleep(min(2 ** attempt, 30) * random.uniform(0.5, 1))
+
+
+def received_parts(api: Api, init: dict, frame_id: str, lease_token: str, path: Path) -> dict[int, dict]:
+    """Parts the server already holds with the same bytes as ``path``, keyed by part number."""
+    listing = api.get(f"/api/v1/worker/leases/{frame_id}/uploads/{init['id']}/parts", headers={"X-Lease-Token":lease_token}).json()
+    received = {}
+    for part in listing["parts"]:
+        chunk = read_part(path, init["chunk_size"], int(part["part_number"]))
+        if "sha256" in part:
+            same = part["sha256"] == hashlib.sha256(chunk).hexdigest()
+        else:
+            # S3 lists an unencrypted part's MD5 as its ETag; any other part is sent again.
+            same = part.get("etag", "").strip('"') == hashlib.md5(chunk, usedforsecurity=False).hexdigest()
+        if same and part.get("size") == len(chunk):
+            received[int(part["part_number"])] = part
+    return received
+
+
+def upload_artifact(api: Api, lease_token: str, path: Path, purpose: str, content_type: str, concurrency: int | None = None) -> str:
+    checksum = sha256_file(path)
+    size = path.stat().st_size
+    frame_id = path.parent.name
+    # The caller places outputs in a directory named with the assigned frame id.
+    # A restarted worker holds a new lease and re-renders, so only a dropped
+    # connection within this call is resumed.
+    init, received = api.post(f"/api/v1/worker/leases/{frame_id}/uploads", {"purpose":purpose,"filename":path.name,"total_size":size,"sha256":checksum,"content_type":content_type}, headers={"X-Lease-Token":lease_token}).json(), {}
+    count = max((size + init["chunk_size"] - 1) // init["chunk_size"], 1)
+    urls = PartUrls(api, f"/api/v1/worker/leases/{frame_id}/uploads/{init['id']}/presign", lease_token) if init["backend"] == "s3" else None
+    for round_number in range(1, RESUME_ROUNDS + 1):
+        missing = [part for part in range(1, count + 1) if part not in received]
+        workers = min(max(int(concurrency or init.get("concurrency", 4)), 1), max(len(missing), 1))
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blend-farm-upload") as pool:
+                received.update((part["part_number"], part) for part in pool.map(lambda part: upload_part(api, init, frame_id, lease_token, path, part, urls), missing))
+            break
+        except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+            if round_number == RESUME_ROUNDS or not retryable(exc):
+                raise
+            # After a network drop, ask the server what arrived and send only the rest.
+            print(f"Upload of {path.name} interrupted ({exc}); resuming…", file=sys.stderr, flush=True)
+            time.sleep(min(5 * round_number, 30))
+            received = received_parts(api, init, frame_id, lease_token, path)
+    completed = [{"part_number":n,"etag":received[n]["etag"]} for n in sorted(received)] if init["backend"] == "s3" else []
     api.post(f"/api/v1/worker/leases/{frame_id}/uploads/{init['id']}/complete", {"parts":completed}, headers={"X-Lease-Token":lease_token})
     return init["id"]
 
 
-def render_batch(api: Api, config: dict, leases: list[dict]) -> None:
+class BlenderServer:
+    """Blender kept running with one project's scene loaded, rendering one manifest per stdin line."""
+
+    def __init__(self, key: tuple, command: list[str]):
+        self.key = key
+        self.finished = False
+        self.batches = 0
+        # Started within a batch that holds the install; it stays held until close().
+        self.blender = Path(command[0])
+        hold_install(self.blender)
+        self.process = subprocess.Popen(command + ["--serve"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+
+    def render(self, batch: dict):
+        assert self.process.stdin and self.process.stdout
+        self.process.stdin.write(json.dumps(batch) + "\n")
+        self.process.stdin.flush()
+        self.finished = False
+        self.batches += 1
+        for line in self.process.stdout:
+            if line.strip() == "Blend Farm: batch finished":
+                self.finished = True
+                return
+            yield line
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        release_blender(self.blender)
+
+
+resident_blenders: dict[int, BlenderServer] = {}
+blender_processes: set[subprocess.Popen] = set()
+
+
+def close_blender_server(slot: int | None = None) -> None:
+    """Stop the resident Blender of one render slot, or of all of them."""
+    for key in [slot] if slot is not None else list(resident_blenders):
+        server = resident_blenders.pop(key, None)
+        if server:
+            server.close()
+
+
+def blender_server(slot: int, key: tuple, command: list[str]) -> BlenderServer:
+    """The slot's resident Blender for ``key`` (package, blend file, device, Blender version), restarted when any of them changes."""
+    server = resident_blenders.get(slot)
+    if server and (server.key != key or server.process.poll() is not None):
+        close_blender_server(slot)
+    if slot not in resident_blenders:
+        resident_blenders[slot] = BlenderServer(key, command)
+    return resident_blenders[slot]
+
+
+def render_batch(api: Api, config: dict, leases: list[dict], slot: int | None = None) -> None:
+    """Render one leased batch; ``slot`` pins Blender to that GPU on a multi-slot worker."""
+    blender = hold_blender(leases[0]["blender_version"])
+    try:
+        run_batch(api, config, leases, blender, slot)
+    finally:
+        release_blender(blender)
+
+
+def run_batch(api: Api, config: dict, leases: list[dict], blender: Path, slot: int | None) -> None:
     batch_started = time.monotonic()
     first = leases[0]
-    blender = ensure_blender(first["blender_version"])
     stopped = threading.Event()
     lease_lost = threading.Event()
     process_holder: list[subprocess.Popen] = []
+    # Frames whose lease was completed mid-batch; a completed lease is
+    # intentionally no longer active and must not cancel the rest of the batch.
+    finished: set[str] = set()
 
     def heartbeats():
         while not stopped.wait(15):
             for lease in leases:
+                if lease["frame_id"] in finished:
+                    continue
                 try:
                     result = api.post("/api/v1/worker/heartbeat", {"lease_token":lease["lease_token"]}).json()
-                    if result.get("lease_active") is False:
+                    if result.get("lease_active") is False and lease["frame_id"] not in finished:
                         lease_lost.set()
                         if process_holder:
                             process_holder[0].terminate()
@@ -291,8 +1382,13 @@ def render_batch(api: Api, config: dict, leases: list[dict]) -> None:
     thread = threading.Thread(target=heartbeats, daemon=True)
     thread.start()
     try:
-        project = download_project(api, first)
-        trim_cache(int(config.get("cache_gb", 50)) * 1024**3, project)
+        # Pinned before it is ready so other slots trimming the cache leave it alone.
+        cache_index().pins[f"slot-{slot or 0}"] = f"projects/{first['package_sha256']}"
+        project = download_project(api, first, int(config.get("download_threads", 1)), bool(config.get("peer_port")))
+        trim_cache(int(config.get("cache_gb", 50)) * 1024**3)
+        refresh_free_disk()
+        if first.get("next_package"):
+            threading.Thread(target=prefetch_project, args=(api, config, first["next_package"], slot or 0), name="blend-farm-prefetch", daemon=True).start()
         blend = project.joinpath(*PurePosixPath(first["blend_path"]).parts)
         entries = []
         for lease in leases:
@@ -305,16 +1401,29 @@ def render_batch(api: Api, config: dict, leases: list[dict]) -> None:
                 "output": str(output_dir / f"frame-{lease['frame']:06d}.{extension}"),
                 "preview": str(output_dir / f"frame-{lease['frame']:06d}-preview.jpg"),
             })
+        batch = {"device": config.get("device", "AUTO"), "device_slot": slot, "frames": entries}
         manifest_dir = CACHE_DIR / "outputs"
         manifest_dir.mkdir(parents=True, exist_ok=True)
         manifest = manifest_dir / f"batch-{leases[0]['frame_id']}.json"
-        manifest.write_text(json.dumps({"device": config.get("device", "AUTO"), "frames": entries}), encoding="utf-8")
         runner = Path(__file__).with_name("blender_runner.py")
-        command = [str(blender), "--disable-autoexec", "-b", str(blend), "--python-exit-code", "1", "--python", str(runner), "--", str(manifest)]
+        command = [str(blender), "--disable-autoexec", "-b", str(blend), "--python-exit-code", "1", "--python", str(runner), "--"]
         frame_numbers = ", ".join(str(lease["frame"]) for lease in leases)
-        print(f"Launching Blender once for job {first['job_id']} frames {frame_numbers}…", flush=True)
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+        launched = time.monotonic()
+        if config.get("persistent_blender"):
+            server = blender_server(slot or 0, (first["package_sha256"], first["blend_path"], batch["device"], first["blender_version"]), command)
+            # A Blender that already rendered a batch has the scene loaded; its first frame has no load time.
+            loading = not server.batches
+            print(f"Rendering job {first['job_id']} frames {frame_numbers} in resident Blender (pid {server.process.pid})…", flush=True)
+            process, lines = server.process, server.render(batch)
+        else:
+            server, loading = None, True
+            close_blender_server(slot or 0)
+            manifest.write_text(json.dumps(batch), encoding="utf-8")
+            print(f"Launching Blender once for job {first['job_id']} frames {frame_numbers}…", flush=True)
+            process = subprocess.Popen(command + [str(manifest)], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace")
+            lines = process.stdout
         process_holder.append(process)
+        blender_processes.add(process)
     except Exception:
         stopped.set()
         thread.join(timeout=2)
@@ -325,15 +1434,63 @@ def render_batch(api: Api, config: dict, leases: list[dict]) -> None:
         raise WorkerError("A batch assignment was cancelled while preparing the project")
     logs: list[str] = []
     log_size = 0
-    assert process.stdout
+    by_frame = {lease["frame"]: (lease, entry) for lease, entry in zip(leases, entries)}
+    submitted: dict[str, Future] = {}
+    uploads = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blend-farm-uploads")
+    concurrency = config.get("upload_concurrency")
+
+    def deliver(lease: dict, entry: dict, duration: float, stats: dict, log_text: str) -> None:
+        output = Path(entry["output"])
+        preview = Path(entry["preview"])
+        extension = output.suffix.removeprefix(".")
+        output_id = upload_artifact(api, lease["lease_token"], output, "output", {"png":"image/png","jpg":"image/jpeg","exr":"image/x-exr"}[extension], concurrency)
+        preview_id = upload_artifact(api, lease["lease_token"], preview, "preview", "image/jpeg", concurrency) if preview.exists() else None
+        finished.add(lease["frame_id"])
+        try:
+            api.post(f"/api/v1/worker/leases/{lease['frame_id']}/complete", {"output_upload_id":output_id,"preview_upload_id":preview_id,"duration_seconds":duration,"telemetry":stats,"logs":log_text}, headers={"X-Lease-Token":lease["lease_token"]})
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != 409:
+                finished.discard(lease["frame_id"])
+                raise
+        shutil.rmtree(output.parent, ignore_errors=True)
+
+    def submit(lease: dict, entry: dict, duration: float) -> None:
+        if lease["frame_id"] not in submitted and Path(entry["output"]).exists():
+            # The runner's own timings exclude downloads, uploads and the scene load.
+            stats = telemetry.get(lease["frame"], {})
+            if stats:
+                duration = sum(stats.get(key, 0) for key in ("sync_seconds", "render_seconds", "save_seconds"))
+            submitted[lease["frame_id"]] = uploads.submit(deliver, lease, entry, duration, stats, "".join(logs)[-65536:])
+
+    telemetry: dict[int, dict] = {}
+    load_seconds = None
+    frame_started = batch_started
+    assert lines
     try:
-        for line in process.stdout:
+        for line in lines:
             print(line, end="", flush=True)
             logs.append(line)
             log_size += len(line)
             while log_size > 65536 and len(logs) > 1:
                 log_size -= len(logs.pop(0))
-        code = process.wait()
+            if loading and load_seconds is None and line.startswith("Blend Farm: rendering frame"):
+                load_seconds = round(time.monotonic() - launched, 3)
+            measured = FRAME_TELEMETRY.match(line.strip())
+            if measured:
+                stats = json.loads(measured[1])
+                frame = stats.pop("frame")
+                telemetry[frame] = {key: value for key, value in stats.items() if value is not None}
+                # Only the batch's first frame waited for Blender to load the scene.
+                if len(telemetry) == 1 and load_seconds is not None:
+                    telemetry[frame]["load_seconds"] = load_seconds
+            # Each frame is uploaded and completed while Blender renders the next one.
+            rendered = FRAME_RENDERED.match(line.strip())
+            if rendered and int(rendered[1]) in by_frame and not lease_lost.is_set():
+                now = time.monotonic()
+                submit(*by_frame[int(rendered[1])], now - frame_started)
+                frame_started = now
+        # A resident Blender that reported the end of the batch stays running for the next one.
+        code = 0 if server and server.finished else process.wait()
     except BaseException:
         if process.poll() is None:
             process.terminate()
@@ -342,81 +1499,71 @@ def render_batch(api: Api, config: dict, leases: list[dict]) -> None:
             except subprocess.TimeoutExpired:
                 process.kill()
                 process.wait()
+        uploads.shutdown(cancel_futures=True)
+        blender_processes.discard(process)
         stopped.set()
         thread.join(timeout=2)
         raise
-    log_text = "".join(logs)[-65536:]
     manifest.unlink(missing_ok=True)
-    missing = [entry for entry in entries if not Path(entry["output"]).exists()]
-    if code != 0 or missing or lease_lost.is_set():
-        try:
-            for lease in leases:
-                try:
-                    api.post(f"/api/v1/worker/leases/{lease['frame_id']}/fail", {"error":f"Blender batch exited with code {code}","logs":log_text}, headers={"X-Lease-Token":lease["lease_token"]})
-                except httpx.HTTPStatusError as exc:
-                    if exc.response.status_code != 409:
-                        raise
-        finally:
-            stopped.set()
-            thread.join(timeout=2)
-        return
     try:
-        completed = []
-        for lease, entry in zip(leases, entries):
-            output = Path(entry["output"])
-            preview = Path(entry["preview"])
-            extension = output.suffix.removeprefix(".")
-            output_id = upload_artifact(api, lease["lease_token"], output, "output", {"png":"image/png","jpg":"image/jpeg","exr":"image/x-exr"}[extension])
-            preview_id = upload_artifact(api, lease["lease_token"], preview, "preview", "image/jpeg") if preview.exists() else None
-            completed.append((lease, entry, output_id, preview_id))
-        # Stop heartbeats before completing tokens; a completed lease is
-        # intentionally no longer active and must not cancel the rest of a batch.
-        stopped.set()
-        thread.join(timeout=2)
-        per_frame_duration = (time.monotonic() - batch_started) / len(leases)
-        for lease, entry, output_id, preview_id in completed:
-            api.post(f"/api/v1/worker/leases/{lease['frame_id']}/complete", {"output_upload_id":output_id,"preview_upload_id":preview_id,"duration_seconds":per_frame_duration,"logs":log_text}, headers={"X-Lease-Token":lease["lease_token"]})
-            shutil.rmtree(Path(entry["output"]).parent, ignore_errors=True)
+        if code == 0 and not lease_lost.is_set():
+            pending = [(lease, entry) for lease, entry in zip(leases, entries) if lease["frame_id"] not in submitted]
+            for lease, entry in pending:
+                submit(lease, entry, (time.monotonic() - frame_started) / len(pending))
+        uploads.shutdown(wait=True)
+        log_text = "".join(logs)[-65536:]
+        for lease in leases:
+            upload = submitted.get(lease["frame_id"])
+            if upload and upload.exception() is None:
+                continue
+            error = f"Frame upload failed: {upload.exception()}" if upload else f"Blender batch exited with code {code} without writing this frame"
+            try:
+                api.post(f"/api/v1/worker/leases/{lease['frame_id']}/fail", {"error":error,"logs":log_text}, headers={"X-Lease-Token":lease["lease_token"]})
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != 409:
+                    raise
     finally:
+        uploads.shutdown(cancel_futures=True)
+        blender_processes.discard(process)
         stopped.set()
         thread.join(timeout=2)
 
 
 def enroll(args) -> None:
     server = args.server.rstrip("/")
+    if args.gpu_slots and args.device in ("AUTO", "CPU"):
+        raise WorkerError("--gpu-slots needs a GPU backend: --device CUDA, OPTIX or HIP")
     body = {"code":args.code.upper(),"name":args.name or platform.node() or "worker","capabilities":capabilities(args.device, args.batch_size)}
     response = httpx.post(server + "/api/v1/worker/enroll", json=body, timeout=30)
     response.raise_for_status()
     result = response.json()
-    save_config({"server_url":server,"worker_id":result["worker_id"],"token":result["token"],"device":args.device,"cache_gb":args.cache_gb,"batch_size":args.batch_size})
+    save_config({"server_url":server,"worker_id":result["worker_id"],"token":result["token"],"device":args.device,"cache_gb":args.cache_gb,"batch_size":args.batch_size,"upload_concurrency":args.upload_concurrency,"download_threads":args.download_threads,"peer_port":args.peer_port,"peer_host":args.peer_host,"persistent_blender":args.persistent_blender,"gpu_slots":args.gpu_slots})
     print(f"Enrolled {body['name']} as {result['worker_id']}. Configuration saved to {CONFIG_FILE}")
 
 
-def run_worker(_args) -> None:
-    config = load_config()
-    api = Api(config)
-    if threading.current_thread() is threading.main_thread() and hasattr(signal, "SIGTERM"):
-        def stop_on_term(_signum, _frame):
-            raise KeyboardInterrupt
-        signal.signal(signal.SIGTERM, stop_on_term)
-    print(f"Blend Farm worker {__version__} connected to {api.base}")
+def run_slot(api: Api, config: dict, peer_server: ThreadingHTTPServer | None = None, slot: int = 0, slots: int = 1) -> None:
+    """Lease and render batches for one render slot; slots lease independently under the worker's credential."""
+    label = f"Slot {slot}: l" if slots > 1 else "L"
     while True:
         lease = None
         try:
             batch_size = min(max(int(config.get("batch_size", 5)), 1), 20)
-            heartbeat = api.post("/api/v1/worker/heartbeat", {"capabilities":capabilities(config.get("device", "AUTO"), batch_size)}).json()
-            ensure_blender(heartbeat["blender_version"])
-            response = api.post(f"/api/v1/worker/lease?wait=20&count={batch_size}")
+            announced = capabilities(config.get("device", "AUTO"), batch_size, slots)
+            if peer_server:
+                announced["peer"] = peer_capabilities(config)
+            heartbeat = api.post("/api/v1/worker/heartbeat", {"capabilities":announced}).json()
+            if peer_server:
+                api.peer_secret = peer_server.secret = heartbeat.get("peer_secret")
+            ensure_blender(heartbeat["blender_version"], api, heartbeat.get("peers", []) if peer_server else None)
+            response = api.post(f"/api/v1/worker/lease?wait=20&count={batch_size}&slot={slot}")
             if response.status_code == 204:
                 time.sleep(random.uniform(1, 3))
                 continue
             leases = response.json()["assignments"]
             lease = leases[0]
-            print(f"Leased {len(leases)} frames: {', '.join(str(item['frame']) for item in leases)}", flush=True)
-            render_batch(api, config, leases)
-        except KeyboardInterrupt:
-            print("Stopping worker.")
-            return
+            print(f"{label}eased {len(leases)} frames: {', '.join(str(item['frame']) for item in leases)}", flush=True)
+            render_batch(api, config, leases, slot if slots > 1 else None)
+            refresh_free_disk()
         except Exception as exc:
             details = traceback.format_exc()
             print(f"Worker error: {exc}\n{details}Retrying…", file=sys.stderr, flush=True)
@@ -433,12 +1580,44 @@ def run_worker(_args) -> None:
             time.sleep(random.uniform(5, 15))
 
 
-def doctor(_args) -> None:
+def run_worker(_args) -> None:
     config = load_config()
     api = Api(config)
-    result = api.post("/api/v1/worker/heartbeat", {"capabilities":capabilities(config.get("device", "AUTO"), int(config.get("batch_size", 5)))}).json()
-    blender = ensure_blender(result["blender_version"])
-    device = config.get("device", "AUTO")
+    if threading.current_thread() is threading.main_thread() and hasattr(signal, "SIGTERM"):
+        def stop_on_term(_signum, _frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, stop_on_term)
+    print(f"Blend Farm worker {__version__} connected to {api.base}")
+    peer_server = start_peer_server(int(config["peer_port"])) if config.get("peer_port") else None
+    if peer_server:
+        print(f"Sharing cached packages with LAN peers on port {config['peer_port']}")
+    start_capability_probe()
+    try:
+        slots = 1
+        if config.get("gpu_slots"):
+            device = config.get("device", "AUTO")
+            result = api.post("/api/v1/worker/heartbeat", {"capabilities":capabilities(device, int(config.get("batch_size", 5)))}).json()
+            slots = max(len(probe_device(ensure_blender(result["blender_version"]), device)[0]["devices"]), 1)
+            print(f"Rendering on {slots} {device} GPUs, one batch each", flush=True)
+        if slots == 1:
+            run_slot(api, config, peer_server)
+            return
+        threads = [threading.Thread(target=run_slot, args=(api, config, peer_server, slot, slots), name=f"blend-farm-slot-{slot}", daemon=True) for slot in range(slots)]
+        for thread in threads:
+            thread.start()
+        # Joined in short steps so Ctrl+C and SIGTERM still reach the main thread.
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+    except KeyboardInterrupt:
+        print("Stopping worker.")
+        for process in list(blender_processes):
+            process.terminate()
+        close_blender_server()
+
+
+def probe_device(blender: Path, device: str) -> tuple[dict, str]:
+    """Run ``blender_probe.py`` for ``device``; returns its result (including the enabled devices) and Blender's output."""
     probe = Path(__file__).with_name("blender_probe.py")
     check = subprocess.run(
         [str(blender), "--background", "--factory-startup", "--python-exit-code", "1", "--python", str(probe), "--", device],
@@ -447,7 +1626,16 @@ def doctor(_args) -> None:
     probe_output = (check.stdout + "\n" + check.stderr).strip()
     if check.returncode != 0 or "BLEND_FARM_PROBE=" not in probe_output:
         raise WorkerError(f"Blender {device} device check failed:\n{probe_output[-8000:]}")
-    print(probe_output)
+    return json.loads(probe_output.split("BLEND_FARM_PROBE=", 1)[1].splitlines()[0]), probe_output
+
+
+def doctor(_args) -> None:
+    config = load_config()
+    api = Api(config)
+    result = api.post("/api/v1/worker/heartbeat", {"capabilities":capabilities(config.get("device", "AUTO"), int(config.get("batch_size", 5)))}).json()
+    blender = ensure_blender(result["blender_version"])
+    device = config.get("device", "AUTO")
+    print(probe_device(blender, device)[1])
     print(json.dumps({"server":"ok","blender":str(blender),"blender_version":result["blender_version"],"capabilities":capabilities(device, int(config.get("batch_size", 5)))}, indent=2))
 
 
@@ -461,6 +1649,12 @@ def build_parser() -> argparse.ArgumentParser:
     enroll_cmd.add_argument("--device", choices=["AUTO","CPU","CUDA","OPTIX","HIP"], default="AUTO")
     enroll_cmd.add_argument("--cache-gb", type=int, default=50)
     enroll_cmd.add_argument("--batch-size", type=int, default=5)
+    enroll_cmd.add_argument("--upload-concurrency", type=int, default=4, help="parallel part uploads per artifact")
+    enroll_cmd.add_argument("--download-threads", type=int, default=1, help="parallel ranges per project download")
+    enroll_cmd.add_argument("--peer-port", type=int, help="share cached packages and Blender with LAN workers on this port")
+    enroll_cmd.add_argument("--peer-host", help="address other workers use to reach this one (default: detected)")
+    enroll_cmd.add_argument("--persistent-blender", action="store_true", help="keep Blender and the loaded scene running between batches of the same project")
+    enroll_cmd.add_argument("--gpu-slots", action="store_true", help="render one batch per detected GPU of the chosen device")
     enroll_cmd.set_defaults(function=enroll)
     run_cmd = commands.add_parser("run", help="start requesting frames")
     run_cmd.set_defaults(function=run_worker)
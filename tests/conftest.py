@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# renderfarm.app reads its settings at import time; keep test imports out of ./data.
+os.environ.setdefault("FARM_DATA_DIR", tempfile.mkdtemp(prefix="blend-farm-tests-"))
+os.environ.setdefault("SECURE_COOKIES", "false")
@@ -0,0 +1,409 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import timedelta
+from zipfile import ZipFile
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+import renderfarm.app as app_module
+from renderfarm.database import Base, utcnow
+from renderfarm.models import Chunk, FarmSetting, Frame, Job, Package, UploadSession, Worker
+from renderfarm.scheduler import Scheduler
+from renderfarm.security import token_hash
+from renderfarm.storage import LocalStorage
+
+WORKER_TOKEN = "worker-token"
+
+
+@pytest.fixture
+def farm(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'farm.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, data_dir=tmp_path, storage_backend="local"))
+    monkeypatch.setattr(app_module, "SessionFactory", sessions)
+    monkeypatch.setattr(app_module, "ReadSessionFactory", sessions)
+    monkeypatch.setattr(app_module, "storage", LocalStorage(tmp_path / "artifacts"))
+    monkeypatch.setattr(app_module, "scheduler", Scheduler(sessions))
+    with sessions.begin() as db:
+        worker = Worker(name="worker", token_hash=token_hash(WORKER_TOKEN))
+        job = Job(name="job", frame_start=1, frame_end=1, output_format="PNG", package_key="package", package_sha256="a" * 64, blend_path="scene.blend", queue_order=1)
+        db.add_all([worker, job, FarmSetting(key="blender_version", value="4.2.5")])
+        db.flush()
+        db.add(Frame(job_id=job.id, frame_number=1))
+    return sessions, app_module.scheduler.lease(worker)
+
+
+def stage_worker_upload(sessions, tmp_path, lease, payload: bytes) -> str:
+    with sessions.begin() as db:
+        upload = UploadSession(purpose="output", owner_kind="worker", owner_id=lease["frame_id"], storage_key=f"jobs/{lease['job_id']}/frames/000001/output.png", filename="000001.png", total_size=len(payload), sha256=hashlib.sha256(payload).hexdigest(), expires_at=utcnow() + timedelta(hours=1))
+        db.add(upload)
+        db.flush()
+        upload_id = upload.id
+    folder = tmp_path / "uploads" / upload_id
+    folder.mkdir(parents=True)
+    (folder / "data.partial").write_bytes(payload)
+    (folder / "00001.done").write_text("{}")
+    return upload_id
+
+
+def test_heartbeat_stays_responsive_while_upload_finalizes(farm, tmp_path, monkeypatch):
+    sessions, lease = farm
+    upload_id = stage_worker_upload(sessions, tmp_path, lease, os.urandom(16 * 1024**2))
+    finalize = app_module.finalize_upload
+
+    def slow_finalize(*args):
+        # Stands in for assembling and hashing a multi-GB project package.
+        time.sleep(1.5)
+        return finalize(*args)
+
+    monkeypatch.setattr(app_module, "finalize_upload", slow_finalize)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        headers = {"Authorization": f"Bearer {WORKER_TOKEN}"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://farm.test", headers=headers) as client:
+            finalizing = asyncio.create_task(client.post(f"/api/v1/worker/leases/{lease['frame_id']}/uploads/{upload_id}/complete", json={"parts": []}, headers={"X-Lease-Token": lease["lease_token"]}))
+            await asyncio.sleep(0.3)
+            started = time.perf_counter()
+            beat = await client.post("/api/v1/worker/heartbeat", json={"lease_token": lease["lease_token"]})
+            latency = time.perf_counter() - started
+            still_finalizing = not finalizing.done()
+            return beat, latency, still_finalizing, await finalizing
+
+    beat, latency, still_finalizing, completed = asyncio.run(scenario())
+
+    assert beat.json()["lease_active"] is True
+    assert still_finalizing
+    assert latency < 0.5
+    assert completed.status_code == 200
+    assert completed.json()["key"].endswith("output.png")
+
+
+def test_local_parts_are_written_in_place_and_hashed_once(farm, tmp_path, monkeypatch):
+    sessions, lease = farm
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, chunk_size=4))
+    payload = b"0123456789"
+    checksum = hashlib.sha256(payload).hexdigest()
+    monkeypatch.setattr(app_module, "sha256_file", lambda _path: pytest.fail("local uploads must not be re-read for hashing"))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        headers = {"Authorization": f"Bearer {WORKER_TOKEN}", "X-Lease-Token": lease["lease_token"]}
+        async with httpx.AsyncClient(transport=transport, base_url="http://farm.test", headers=headers) as client:
+            base = f"/api/v1/worker/leases/{lease['frame_id']}/uploads"
+            init = (await client.post(base, json={"purpose": "output", "total_size": len(payload), "sha256": checksum})).json()
+            for part in (1, 3, 2):
+                chunk = payload[(part - 1) * 4:part * 4]
+                sent = await client.put(f"{base}/{init['id']}/parts/{part}", content=chunk, headers={"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()})
+                assert sent.status_code == 200
+            return await client.post(f"{base}/{init['id']}/complete", json={"parts": []})
+
+    completed = asyncio.run(scenario())
+
+    assert completed.json()["sha256"] == checksum
+    assert app_module.storage.path_for(completed.json()["key"]).read_bytes() == payload
+    assert not any((tmp_path / "uploads").iterdir())
+
+
+def test_s3_parts_are_presigned_in_windows(farm, monkeypatch):
+    sessions, lease = farm
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, storage_backend="s3", max_archive_bytes=500 * 1024**3))
+
+    class FakeS3:
+        def begin_multipart(self, key, content_type):
+            return "multipart-id"
+
+        def presign_part(self, key, upload_id, part_number, expires):
+            return f"https://s3.test/{key}?part={part_number}&expires={expires}"
+
+    monkeypatch.setattr(app_module, "storage", FakeS3())
+    with sessions() as db:
+        upload, init = app_module.create_upload(db, purpose="project", owner_kind="admin", owner_id=None, filename="big.zip", total_size=200 * 1024**3, checksum="", content_type="application/zip")
+        assert "parts" not in init
+        assert init["part_count"] <= app_module.S3_MAX_PARTS and init["chunk_size"] * init["part_count"] >= upload.total_size
+        window = app_module.presign_parts(upload, {"start": init["part_count"] - 5, "count": 100})
+    assert [p["part_number"] for p in window["parts"]] == list(range(init["part_count"] - 5, init["part_count"] + 1))
+    assert window["expires_in"] == app_module.settings.presign_seconds
+
+
+def test_received_parts_lists_local_markers(farm, tmp_path):
+    sessions, lease = farm
+    upload_id = stage_worker_upload(sessions, tmp_path, lease, b"abcdefgh")
+    (tmp_path / "uploads" / upload_id / "00001.done").write_text('{"sha256": "aa", "size": 4}')
+    (tmp_path / "uploads" / upload_id / "00002.done").unlink(missing_ok=True)
+    with sessions() as db:
+        db.get(UploadSession, upload_id).chunk_size = 4
+        db.commit()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://farm.test", headers={"Authorization": f"Bearer {WORKER_TOKEN}"}) as client:
+            return await client.get(f"/api/v1/worker/leases/{lease['frame_id']}/uploads/{upload_id}/parts", headers={"X-Lease-Token": lease["lease_token"]})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.json()["part_count"] == 2
+    assert response.json()["parts"] == [{"part_number": 1, "sha256": "aa", "size": 4}]
+
+
+def test_identical_project_packages_are_stored_once(farm, tmp_path):
+    sessions, _lease = farm
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as archive:
+        archive.writestr("scene.blend", b"BLENDER")
+    payload = buffer.getvalue()
+
+    def upload_project() -> str:
+        with sessions() as db:
+            upload, _init = app_module.create_upload(db, purpose="project", owner_kind="admin", owner_id=None, filename="project.zip", total_size=len(payload), checksum="", content_type="application/zip")
+        (tmp_path / "uploads" / upload.id / "data.partial").write_bytes(payload)
+        (tmp_path / "uploads" / upload.id / "00001.done").write_text("{}")
+        with sessions() as db:
+            app_module.complete_admin_upload(db, upload.id, [])
+        return upload.id
+
+    first, second = upload_project(), upload_project()
+    with sessions() as db:
+        assert db.scalar(select(func.count()).select_from(Package)) == 1
+        package = db.get(Package, hashlib.sha256(payload).hexdigest())
+        assert package.storage_key == db.get(UploadSession, first).storage_key
+        assert not app_module.storage.path_for(db.get(UploadSession, second).storage_key).exists()
+        reused = app_module.reuse_package(db, {"sha256": package.sha256, "total_size": len(payload)})
+        assert reused["status"] == "ready" and reused["blend_path"] == "scene.blend"
+        jobs = []
+        for upload_id in (first, second, reused["id"]):
+            app_module.create_job(None, name=upload_id, upload_id=upload_id, frame_start=1, frame_end=1, output_format="PNG", db=db)
+            jobs.append(db.scalar(select(Job).where(Job.name == upload_id)))
+        assert {job.package_key for job in jobs} == {package.storage_key}
+        assert db.get(Package, package.sha256).ref_count == 3
+        for job in jobs:
+            assert app_module.storage.path_for(package.storage_key).exists()
+            app_module.delete_job(job.id, None, confirm=job.name, db=db)
+        assert db.get(Package, package.sha256) is None
+        assert not app_module.storage.path_for(package.storage_key).exists()
+
+
+def test_concurrent_identical_completions_share_one_package(farm, tmp_path, monkeypatch):
+    sessions, _lease = farm
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as archive:
+        archive.writestr("scene.blend", b"BLENDER")
+    payload = buffer.getvalue()
+    uploads = []
+    for _ in range(2):
+        with sessions() as db:
+            upload, _init = app_module.create_upload(db, purpose="project", owner_kind="admin", owner_id=None, filename="project.zip", total_size=len(payload), checksum="", content_type="application/zip")
+        (tmp_path / "uploads" / upload.id / "data.partial").write_bytes(payload)
+        (tmp_path / "uploads" / upload.id / "00001.done").write_text("{}")
+        uploads.append(upload.id)
+
+    # Both completions find no package before either registers one, then commit from their own sessions.
+    both_checked = threading.Barrier(2, timeout=10)
+    register = app_module.register_package
+
+    def register_after_both_checked(db, upload):
+        both_checked.wait()
+        return register(db, upload)
+
+    monkeypatch.setattr(app_module, "register_package", register_after_both_checked)
+
+    def complete(upload_id):
+        with sessions() as db:
+            return app_module.complete_admin_upload(db, upload_id, [])
+
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(complete, uploads))
+    assert [result["blend_path"] for result in results] == ["scene.blend", "scene.blend"]
+    with sessions() as db:
+        assert db.scalar(select(func.count()).select_from(Package)) == 1
+        package = db.get(Package, hashlib.sha256(payload).hexdigest())
+        assert app_module.storage.path_for(package.storage_key).exists()
+        ready = [db.get(UploadSession, upload_id) for upload_id in uploads]
+        assert [upload.status for upload in ready] == ["ready", "ready"]
+        duplicate = next(upload for upload in ready if upload.storage_key != package.storage_key)
+        assert not app_module.storage.path_for(duplicate.storage_key).exists()
+
+
+def test_unused_project_uploads_expire_and_release_their_package(farm, tmp_path):
+    sessions, _lease = farm
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as archive:
+        archive.writestr("scene.blend", b"BLENDER")
+    payload = buffer.getvalue()
+    with sessions() as db:
+        upload, _init = app_module.create_upload(db, purpose="project", owner_kind="admin", owner_id=None, filename="project.zip", total_size=len(payload), checksum="", content_type="application/zip")
+    (tmp_path / "uploads" / upload.id / "data.partial").write_bytes(payload)
+    (tmp_path / "uploads" / upload.id / "00001.done").write_text("{}")
+    with sessions() as db:
+        app_module.complete_admin_upload(db, upload.id, [])
+    assert app_module.cleanup_expired_uploads() == 0
+    with sessions.begin() as db:
+        db.get(UploadSession, upload.id).expires_at = utcnow() - timedelta(minutes=1)
+    with sessions() as db:
+        with pytest.raises(HTTPException) as expired:
+            app_module.create_job(None, name="late", upload_id=upload.id, frame_start=1, frame_end=1, output_format="PNG", db=db)
+        assert "expired" in expired.value.detail
+    assert app_module.cleanup_expired_uploads() == 1
+    with sessions() as db:
+        assert db.get(UploadSession, upload.id).status == "expired"
+        assert db.get(Package, hashlib.sha256(payload).hexdigest()) is None
+        assert not app_module.storage.path_for(upload.storage_key).exists()
+
+
+def test_manifest_upload_reuses_stored_chunks(farm, tmp_path, monkeypatch):
+    sessions, _lease = farm
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, delta_uploads=True))
+    (tmp_path / "uploads").mkdir(exist_ok=True)
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as archive:
+        archive.writestr("textures/wood.png", os.urandom(64 * 1024))
+        archive.writestr("scene.blend", b"BLENDER")
+    payload = buffer.getvalue()
+    pieces = [payload[:40000], payload[40000:]]
+
+    def store(piece: bytes) -> list:
+        sha = hashlib.sha256(piece).hexdigest()
+        temp = tmp_path / "uploads" / "chunk.partial"
+        temp.write_bytes(piece)
+        with sessions() as db:
+            app_module.store_chunk(db, sha, temp, len(piece))
+        return [sha, len(piece)]
+
+    manifest = [store(piece) for piece in pieces]
+    with sessions() as db:
+        with pytest.raises(HTTPException) as missing:
+            app_module.commit_manifest(db, {"filename": "project.zip", "chunks": manifest + [["b" * 64, 10]]})
+        assert missing.value.status_code == 409
+        result = app_module.commit_manifest(db, {"filename": "project.zip", "chunks": manifest})
+        assert result["sha256"] == hashlib.sha256(payload).hexdigest() and result["blend_path"] == "scene.blend"
+        package = db.get(Package, result["sha256"])
+        assert app_module.read_manifest(package)["chunks"] == manifest
+        assert [db.get(Chunk, sha).ref_count for sha, _size in manifest] == [1, 1]
+        assert app_module.storage.path_for(package.storage_key).read_bytes() == payload
+
+
+def test_chunks_reported_as_stored_survive_a_job_deletion(farm, tmp_path, monkeypatch):
+    sessions, lease = farm
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, delta_uploads=True))
+    (tmp_path / "uploads").mkdir(exist_ok=True)
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as archive:
+        archive.writestr("scene.blend", b"BLENDER" * 1000)
+    payload = buffer.getvalue()
+    stray = os.urandom(100)
+    manifest = []
+    for piece in (payload[:3000], payload[3000:], stray):
+        temp = tmp_path / "uploads" / "chunk.partial"
+        temp.write_bytes(piece)
+        with sessions() as db:
+            app_module.store_chunk(db, hashlib.sha256(piece).hexdigest(), temp, len(piece))
+        manifest.append([hashlib.sha256(piece).hexdigest(), len(piece)])
+    manifest, stray_sha = manifest[:2], manifest[2][0]
+    with sessions() as db:
+        sha = app_module.commit_manifest(db, {"filename": "project.zip", "chunks": manifest})["sha256"]
+        job = db.get(Frame, lease["frame_id"]).job
+        job.package_sha256 = sha
+        db.get(Package, sha).ref_count = 1
+        db.scalar(select(UploadSession).where(UploadSession.sha256 == sha)).owner_id = job.id
+        db.commit()
+
+    async def fetch(chunk_sha):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://farm.test", headers={"Authorization": f"Bearer {WORKER_TOKEN}"}) as client:
+            return await client.get(f"/api/v1/worker/leases/{lease['frame_id']}/chunks/{chunk_sha}", headers={"X-Lease-Token": lease["lease_token"]})
+
+    # A lease reads the chunks of its own package, not any stored chunk.
+    assert asyncio.run(fetch(manifest[0][0])).content == payload[:3000]
+    assert asyncio.run(fetch(stray_sha)).status_code == 404
+
+    with sessions() as db:
+        # An upload is told these chunks are stored, then the only job using them is deleted.
+        assert app_module.pin_chunks(db, {sha for sha, _size in manifest}).keys() == {sha for sha, _size in manifest}
+        app_module.release_package(db, db.get(Job, job.id))
+        db.commit()
+        assert db.get(Package, sha) is None and [db.get(Chunk, sha).ref_count for sha, _size in manifest] == [0, 0]
+        assert app_module.commit_manifest(db, {"filename": "project.zip", "chunks": manifest})["sha256"] == sha
+
+
+def test_package_download_supports_range_and_accel_redirect(farm, tmp_path, monkeypatch):
+    _sessions, lease = farm
+    source = tmp_path / "project.zip"
+    source.write_bytes(b"0123456789")
+    app_module.storage.put_file("package", source)
+
+    async def fetch(headers):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://farm.test", headers={"Authorization": f"Bearer {WORKER_TOKEN}"}) as client:
+            return await client.get(f"/api/v1/worker/package/{lease['frame_id']}", headers={"X-Lease-Token": lease["lease_token"], **headers})
+
+    partial = asyncio.run(fetch({"Range": "bytes=4-"}))
+    assert partial.status_code == 206 and partial.content == b"456789"
+
+    monkeypatch.setattr(app_module, "settings", replace(app_module.settings, accel_redirect_prefix="/_artifacts"))
+    handed_off = asyncio.run(fetch({}))
+    assert handed_off.headers["x-accel-redirect"] == "/_artifacts/package"
+    assert handed_off.content == b""
+
+
+def test_lease_hints_next_package_for_prefetch(farm, tmp_path):
+    sessions, _lease = farm
+    source = tmp_path / "next.zip"
+    source.write_bytes(b"NEXT PACKAGE")
+    app_module.storage.put_file("packages/next", source)
+    with sessions.begin() as db:
+        db.add(Package(sha256="c" * 64, storage_key="packages/next", size=12, archive_json='{"blend_path": "scene.blend", "expanded_size": 4096, "files": 1}', ref_count=1))
+        current = Job(name="current", frame_start=1, frame_end=2, output_format="PNG", package_key="current", package_sha256="b" * 64, blend_path="scene.blend", queue_order=2)
+        upcoming = Job(name="upcoming", frame_start=1, frame_end=1, output_format="PNG", package_key="packages/next", package_sha256="c" * 64, blend_path="scene.blend", queue_order=3)
+        other = Worker(name="other", token_hash=token_hash("other-token"))
+        db.add_all([current, upcoming, other])
+        db.flush()
+        db.add_all([Frame(job_id=current.id, frame_number=1), Frame(job_id=current.id, frame_number=2), Frame(job_id=upcoming.id, frame_number=1)])
+
+    async def lease_and_prefetch(sha256):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://farm.test", headers={"Authorization": "Bearer other-token"}) as client:
+            leased = await client.post("/api/v1/worker/lease?wait=0")
+            return leased, await client.get(f"/api/v1/worker/packages/{sha256}")
+
+    leased, package = asyncio.run(lease_and_prefetch("c" * 64))
+    leased = leased.json()
+    assert leased["package_sha256"] == "b" * 64
+    assert leased["next_package"] == {"sha256": "c" * 64, "expanded_size": 4096, "url": f"{app_module.settings.public_url}/api/v1/worker/packages/{'c' * 64}", "peers": []}
+    assert package.content == b"NEXT PACKAGE"
+    _leased, unknown = asyncio.run(lease_and_prefetch("d" * 64))
+    assert unknown.status_code == 404
+
+
+def test_leases_and_heartbeats_point_at_lan_peers(farm):
+    sessions, _lease = farm
+    peer = {"url": "http://10.0.0.5:8765", "packages": ["e" * 64], "blender": ["blender-4.2.5-linux-x64.tar.xz"]}
+    with sessions.begin() as db:
+        job = Job(name="shared", frame_start=1, frame_end=1, output_format="PNG", package_key="shared", package_sha256="e" * 64, blend_path="scene.blend", queue_order=2)
+        db.add_all([job, FarmSetting(key="peer_secret", value="peer-secret")])
+        db.add(Worker(name="sharing", token_hash=token_hash("sharing-token"), capabilities_json=json.dumps({"peer": peer}), last_seen_at=utcnow()))
+        db.add(Worker(name="stale", token_hash=token_hash("stale-token"), capabilities_json=json.dumps({"peer": {**peer, "url": "http://10.0.0.6:8765"}}), last_seen_at=utcnow() - timedelta(hours=1)))
+        db.add(Worker(name="other", token_hash=token_hash("other-token")))
+        db.flush()
+        db.add(Frame(job_id=job.id, frame_number=1))
+
+    async def call():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://farm.test", headers={"Authorization": "Bearer other-token"}) as client:
+            beat = await client.post("/api/v1/worker/heartbeat", json={"capabilities": {"peer": {"url": "http://10.0.0.7:8765", "packages": [], "blender": []}}})
+            return beat.json(), (await client.post("/api/v1/worker/lease?wait=0")).json()
+
+    beat, leased = asyncio.run(call())
+    assert beat["peer_secret"] == "peer-secret" and beat["peers"] == [{"url": peer["url"], "blender": peer["blender"]}]
+    assert leased["package_sha256"] == "e" * 64 and leased["package_peers"] == [peer["url"]]
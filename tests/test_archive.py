@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from renderfarm.archive import archive_finished_jobs, frame_counts, job_frame, job_frames, restore_frames
+from renderfarm.database import Base
+from renderfarm.models import Frame, FrameStatus, Job, JobStatus
+
+
+def setup_job(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(engine, expire_on_commit=False)
+    with sessions.begin() as db:
+        job = Job(name="job", frame_start=1, frame_end=2, output_format="PNG", package_key="package", package_sha256="a" * 64, blend_path="scene.blend", status=JobStatus.failed.value, result_zip_key="jobs/x/results.zip")
+        db.add(job)
+        db.flush()
+        db.add_all([
+            Frame(job_id=job.id, frame_number=1, status=FrameStatus.succeeded.value, attempts=1, output_key="one.png", output_sha256="b" * 64, duration_seconds=2.5, log_text="long log", completed_at=datetime(2026, 1, 1, 12, 0)),
+            Frame(job_id=job.id, frame_number=2, status=FrameStatus.failed.value, attempts=3, error_text="out of memory", log_text="x" * 10000 + "CUDA error: out of memory"),
+        ])
+    return sessions, job.id
+
+
+def test_terminal_job_is_archived_and_read_transparently(tmp_path):
+    sessions, job_id = setup_job(tmp_path)
+
+    assert archive_finished_jobs(sessions) == 1
+    assert archive_finished_jobs(sessions) == 0
+
+    with sessions() as db:
+        job = db.get(Job, job_id)
+        assert db.scalar(select(func.count()).select_from(Frame)) == 0
+        frames = job_frames(db, job)
+        assert [(f.frame_number, f.status, f.output_key, f.duration_seconds) for f in frames] == [(1, "succeeded", "one.png", 2.5), (2, "failed", None, None)]
+        assert frames[0].output_sha256 == "b" * 64
+        assert frames[0].completed_at == datetime(2026, 1, 1, 12, 0)
+        assert job_frame(db, job, 2).error_text == "out of memory"
+        # The failed frame keeps the tail of its log for the job page; successful logs are dropped.
+        assert job_frame(db, job, 2).log_text.endswith("CUDA error: out of memory") and len(job_frame(db, job, 2).log_text) == 8192
+        assert frames[0].log_text == ""
+        assert frame_counts(db, job) == {"succeeded": 1, "failed": 1}
+
+
+def test_restore_recreates_frames_for_retry(tmp_path):
+    sessions, job_id = setup_job(tmp_path)
+    archive_finished_jobs(sessions)
+
+    with sessions.begin() as db:
+        job = db.get(Job, job_id)
+        restored = restore_frames(db, job)
+        assert [frame.frame_number for frame in restored] == [1, 2]
+        assert job.frames_archive is None
+
+    with sessions() as db:
+        assert frame_counts(db, db.get(Job, job_id)) == {"succeeded": 1, "failed": 1}
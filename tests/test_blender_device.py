@@ -46,3 +46,12 @@ def test_requested_gpu_must_exist():
 def test_gpu_backend_requires_cycles():
     with pytest.raises(RuntimeError, match="only applies to Cycles"):
         configure_cycles_device(scene("BLENDER_EEVEE_NEXT"), Preferences([]), "CUDA")
+
+
+def test_slot_pins_one_gpu():
+    first, second = device("RTX A", "OPTIX"), device("RTX B", "OPTIX")
+
+    assert configure_cycles_device(scene(), Preferences([first, second]), "OPTIX", slot=1) == ["RTX B"]
+    assert not first.use and second.use
+    with pytest.raises(RuntimeError, match="no GPU for slot 2"):
+        configure_cycles_device(scene(), Preferences([first, second]), "OPTIX", slot=2)
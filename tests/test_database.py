@@ -0,0 +1,23 @@
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from renderfarm.config import Settings
+from renderfarm.database import make_engine, make_read_engine
+
+
+def test_sqlite_profile_and_read_only_engine(tmp_path):
+    settings = replace(Settings.from_env(), database_url=f"sqlite:///{tmp_path / 'farm.db'}", database_read_url=None, sqlite_profile="tuned")
+    writer = make_engine(settings)
+    with writer.begin() as connection:
+        assert connection.scalar(text("PRAGMA synchronous")) == 1
+        assert connection.scalar(text("PRAGMA temp_store")) == 2
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+        connection.execute(text("INSERT INTO items VALUES (1)"))
+    reader = make_read_engine(settings)
+    with reader.connect() as connection:
+        assert connection.scalar(text("SELECT count(*) FROM items")) == 1
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO items VALUES (2)"))
@@ -0,0 +1,151 @@
+import io
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from zipfile import ZIP_STORED, ZipFile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from renderfarm.database import Base
+from renderfarm.models import Frame, FrameStatus, Job, JobStatus
+from renderfarm.results import ResultEntry, cursor_of, next_cursor, prebuild_results, select_entries, stream_results
+from renderfarm.storage import LocalStorage
+
+
+def test_stream_results_writes_stored_entries_with_manifest_last(tmp_path):
+    storage = LocalStorage(tmp_path / "artifacts")
+    outputs = {}
+    for number in range(1, 7):
+        source = tmp_path / f"{number}.png"
+        source.write_bytes(os.urandom(100_000 * number))
+        storage.put_file(f"jobs/j/frames/{number:06d}/output.png", source)
+        outputs[number] = source.read_bytes()
+    entries = [ResultEntry(n, FrameStatus.succeeded.value, 1, "", f"jobs/j/frames/{n:06d}/output.png") for n in outputs]
+    entries.append(ResultEntry(7, FrameStatus.failed.value, 3, "out of memory", None))
+
+    pieces = list(stream_results(storage, "job", JobStatus.failed.value, entries))
+
+    assert len(pieces) > 7
+    with ZipFile(io.BytesIO(b"".join(pieces))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist()[-1] == "manifest.json"
+        assert all(info.compress_type == ZIP_STORED for info in archive.infolist())
+        assert archive.read("frames/frame-000003.png") == outputs[3]
+        assert json.loads(archive.read("manifest.json"))["frames"][-1] == {"frame": 7, "status": "failed", "attempts": 3, "error": "out of memory"}
+
+
+def test_prebuild_publishes_results_when_job_finishes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(engine, expire_on_commit=False)
+    storage = LocalStorage(tmp_path / "artifacts")
+    source = tmp_path / "frame.png"
+    source.write_bytes(b"PNG")
+    storage.put_file("jobs/j/frames/000001/output.png", source)
+    with sessions.begin() as db:
+        job = Job(name="job", frame_start=1, frame_end=2, output_format="PNG", package_key="package", package_sha256="a" * 64, blend_path="scene.blend", status=JobStatus.running.value)
+        db.add(job)
+        db.flush()
+        db.add_all([Frame(job_id=job.id, frame_number=1, status=FrameStatus.succeeded.value, output_key="jobs/j/frames/000001/output.png"), Frame(job_id=job.id, frame_number=2)])
+
+    assert prebuild_results(sessions, storage, tmp_path / "results") == 0
+    with ZipFile(tmp_path / "results" / f"{job.id}.zip.partial") as partial:
+        assert partial.namelist() == ["frames/frame-000001.png"]
+
+    with sessions.begin() as db:
+        db.get(Job, job.id).status = JobStatus.failed.value
+    assert prebuild_results(sessions, storage, tmp_path / "results") == 1
+    with sessions() as db:
+        key = db.get(Job, job.id).result_zip_key
+    with ZipFile(storage.path_for(key)) as published:
+        assert published.namelist() == ["frames/frame-000001.png", "manifest.json"]
+    assert not (tmp_path / "results" / f"{job.id}.zip.partial").exists()
+
+
+def results_farm(tmp_path, jobs: int):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(engine, expire_on_commit=False)
+    storage = LocalStorage(tmp_path / "artifacts")
+    source = tmp_path / "frame.png"
+    source.write_bytes(b"PNG")
+    storage.put_file("frame.png", source)
+    with sessions.begin() as db:
+        created = [Job(name=f"job{n}", frame_start=1, frame_end=9, output_format="PNG", package_key="package", package_sha256="a" * 64, blend_path="scene.blend", status=JobStatus.running.value, queue_order=n) for n in range(jobs)]
+        db.add_all(created)
+    return sessions, storage, created
+
+
+def test_prebuild_appends_only_frames_finished_since_the_last_pass(tmp_path):
+    sessions, storage, (job,) = results_farm(tmp_path, 1)
+    start = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    with sessions.begin() as db:
+        db.add(Frame(job_id=job.id, frame_number=1, status=FrameStatus.succeeded.value, output_key="frame.png", completed_at=start))
+    prebuild_results(sessions, storage, tmp_path / "results")
+    with sessions.begin() as db:
+        db.add(Frame(job_id=job.id, frame_number=2, status=FrameStatus.succeeded.value, output_key="frame.png", completed_at=start + timedelta(hours=1)))
+        # Finished long before the cursor, so an incremental pass does not look at it.
+        db.add(Frame(job_id=job.id, frame_number=3, status=FrameStatus.succeeded.value, output_key="frame.png", completed_at=start - timedelta(hours=1)))
+    prebuild_results(sessions, storage, tmp_path / "results")
+    with ZipFile(tmp_path / "results" / f"{job.id}.zip.partial") as partial:
+        assert partial.namelist() == ["frames/frame-000001.png", "frames/frame-000002.png"]
+        assert partial.comment.decode() == str(cursor_of(start + timedelta(hours=1)))
+
+    with sessions.begin() as db:
+        db.get(Job, job.id).status = JobStatus.completed.value
+    assert prebuild_results(sessions, storage, tmp_path / "results") == 1
+    with sessions() as db:
+        key = db.get(Job, job.id).result_zip_key
+    with ZipFile(storage.path_for(key)) as published:
+        assert published.namelist() == ["frames/frame-000001.png", "frames/frame-000002.png", "frames/frame-000003.png", "manifest.json"]
+
+
+def test_prebuild_isolates_damaged_partials_and_missing_outputs(tmp_path):
+    sessions, storage, (damaged, missing, healthy) = results_farm(tmp_path, 3)
+    with sessions.begin() as db:
+        db.add_all([Frame(job_id=job.id, frame_number=1, status=FrameStatus.succeeded.value, output_key="frame.png" if job is not missing else "gone.png") for job in (damaged, missing, healthy)])
+    folder = tmp_path / "results"
+    folder.mkdir()
+    (folder / f"{damaged.id}.zip.partial").write_bytes(b"PK\x03\x04truncated")
+
+    assert prebuild_results(sessions, storage, folder) == 0
+    assert not (folder / f"{damaged.id}.zip.partial").exists()
+    with ZipFile(folder / f"{healthy.id}.zip.partial") as partial:
+        assert partial.namelist() == ["frames/frame-000001.png"]
+
+    prebuild_results(sessions, storage, folder)
+    with ZipFile(folder / f"{damaged.id}.zip.partial") as partial:
+        assert partial.namelist() == ["frames/frame-000001.png"]
+
+
+def test_prebuild_skips_jobs_without_frames_and_stops_at_the_size_cap(tmp_path):
+    sessions, storage, (idle, first, second) = results_farm(tmp_path, 3)
+    with sessions.begin() as db:
+        db.add_all([Frame(job_id=job.id, frame_number=1, status=FrameStatus.succeeded.value, output_key="frame.png") for job in (first, second)])
+        db.add(Frame(job_id=idle.id, frame_number=1))
+    folder = tmp_path / "results"
+
+    prebuild_results(sessions, storage, folder, max_bytes=1)
+    assert sorted(path.name for path in folder.iterdir()) == [f"{first.id}.zip.partial"]
+
+    prebuild_results(sessions, storage, folder)
+    assert sorted(path.name for path in folder.iterdir()) == sorted(f"{job.id}.zip.partial" for job in (first, second))
+
+
+def test_select_entries_filters_by_range_status_and_cursor():
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    entries = [ResultEntry(n, FrameStatus.succeeded.value if n <= 6 else FrameStatus.pending.value, 1, "", f"{n}.png" if n <= 6 else None, start + timedelta(seconds=n) if n <= 6 else None) for n in range(1, 11)]
+
+    assert [e.frame_number for e in select_entries(entries, frames="2-4,9")] == [2, 3, 4, 9]
+    assert [e.frame_number for e in select_entries(entries, frames="1-8", status="pending")] == [7, 8]
+    first = select_entries(entries, frames="1-500", status="succeeded")
+    cursor = next_cursor(first)
+    assert cursor == str(cursor_of(start + timedelta(seconds=6)))
+    assert select_entries(entries, since=cursor) == []
+    assert [e.frame_number for e in select_entries(entries, since=str(cursor_of(start + timedelta(seconds=4))))] == [5, 6]
+    with pytest.raises(ValueError):
+        select_entries(entries, frames="9-1")
+    with pytest.raises(ValueError):
+        select_entries(entries, status="rendered")
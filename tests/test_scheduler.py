@@ -1,3 +1,4 @@
+import json
 from datetime import timedelta
 
 from sqlalchemy import create_engine, select
@@ -5,7 +6,7 @@ from sqlalchemy.orm import sessionmaker
 
 from renderfarm.database import Base, utcnow
 from renderfarm.models import Frame, FrameStatus, Job, JobStatus, Worker
-from renderfarm.scheduler import Scheduler
+from renderfarm.scheduler import Scheduler, job_eta
 
 
 def setup_farm(tmp_path):
@@ -26,7 +27,10 @@ def test_lease_complete_and_job_aggregation(tmp_path):
     scheduler = Scheduler(sessions)
     first = scheduler.lease(worker)
     assert first["frame"] == 1
-    assert scheduler.heartbeat(worker.id, first["lease_token"])
+    assert scheduler.record_heartbeat(worker.id, first["lease_token"])
+    assert scheduler.flush_heartbeats() == 2
+    with sessions() as db:
+        assert db.scalar(select(Frame.status).where(Frame.frame_number == 1)) == FrameStatus.rendering.value
     assert scheduler.complete(worker.id, first["lease_token"], "one.png", None, "b" * 64, 1.2, "ok")
     second = scheduler.lease(worker)
     assert second["frame"] == 2
@@ -87,3 +91,57 @@ def test_worker_cannot_hold_two_batches(tmp_path):
 
     assert len(leases) == 1
     assert scheduler.lease_batch(worker, 1) == []
+
+
+def test_heartbeats_are_coalesced_until_flush(tmp_path):
+    sessions, worker = setup_farm(tmp_path)
+    scheduler = Scheduler(sessions)
+    lease = scheduler.lease(worker)
+
+    assert scheduler.record_heartbeat(worker.id, lease["lease_token"], {"gpu": "T4"}) is True
+    assert scheduler.record_heartbeat(worker.id, lease["lease_token"]) is True
+    assert scheduler.record_heartbeat(worker.id, "unknown-lease") is False
+    with sessions() as db:
+        assert db.get(Frame, lease["frame_id"]).status == FrameStatus.leased.value
+        assert db.get(Worker, worker.id).last_seen_at is None
+
+    assert scheduler.flush_heartbeats() == 2
+    with sessions() as db:
+        assert db.get(Frame, lease["frame_id"]).status == FrameStatus.rendering.value
+        assert db.get(Worker, worker.id).capabilities_json == '{"gpu": "T4"}'
+    assert scheduler.flush_heartbeats() == 0
+
+
+def test_each_worker_slot_holds_its_own_batch(tmp_path):
+    sessions, worker = setup_farm(tmp_path)
+    scheduler = Scheduler(sessions)
+
+    first = scheduler.lease_batch(worker, 1, slot=0)
+    second = scheduler.lease_batch(worker, 1, slot=1)
+
+    assert [lease["frame"] for lease in first + second] == [1, 2]
+    assert [lease["slot"] for lease in first + second] == [0, 1]
+    assert scheduler.lease_batch(worker, 1, slot=1) == []
+    assert scheduler.fail(worker.id, second[0]["lease_token"], "boom", "")
+    with sessions() as db:
+        assert db.get(Frame, first[0]["frame_id"]).worker_slot == 0
+        assert db.get(Frame, second[0]["frame_id"]).worker_slot is None
+
+
+def test_runner_timings_size_batches_and_estimate_the_job(tmp_path):
+    sessions, worker = setup_farm(tmp_path)
+    with sessions.begin() as db:
+        job = db.scalar(select(Job))
+        job.frame_end = 5
+        db.add_all([Frame(job_id=job.id, frame_number=n) for n in (3, 4, 5)])
+    scheduler = Scheduler(sessions)
+    first = scheduler.lease_batch(worker, 1)[0]
+    assert scheduler.complete(worker.id, first["lease_token"], "one.png", None, "b" * 64, 400.0, "ok", {"render_seconds": 399.5, "load_seconds": 12.0})
+    with sessions() as db:
+        assert json.loads(db.get(Frame, first["frame_id"]).telemetry_json)["render_seconds"] == 399.5
+        assert job_eta(db, db.get(Job, first["job_id"])) == 4 * 400.0
+
+    # 900 s per batch at 400 s per frame leaves room for two frames.
+    assert [lease["frame"] for lease in scheduler.lease_batch(worker, 5)] == [2, 3]
+    with sessions() as db:
+        assert job_eta(db, db.get(Job, first["job_id"])) == 4 * 400.0
@@ -1,9 +1,12 @@
+import hashlib
+import io
+import os
 from pathlib import Path
-from zipfile import ZipFile, ZipInfo
+from zipfile import ZIP_STORED, ZipFile, ZipInfo
 
 import pytest
 
-from renderfarm.storage import LocalStorage, StorageError, sha256_file, validate_project_archive
+from renderfarm.storage import LocalStorage, S3RangeReader, StorageError, UploadDigest, inspect_project_archive, sha256_file, validate_project_archive
 
 
 def make_zip(path: Path, files: dict[str, bytes]):
@@ -26,6 +29,8 @@ def test_valid_project_and_local_storage(tmp_path):
 
 @pytest.mark.parametrize("files", [
     {"../escape.blend": b"x"},
+    {"scene.blend": b"x", "C:/Windows/escape.dll": b"x"},
+    {"scene.blend": b"x", "C:escape.txt": b"x"},
     {"one.blend": b"x", "two.blend": b"x"},
     {"readme.txt": b"x"},
 ])
@@ -46,3 +51,100 @@ def test_archive_rejects_symlink(tmp_path):
     with pytest.raises(StorageError):
         validate_project_archive(project, 1024, 4096)
 
+
+
+def test_usage_ledger_tracks_writes_and_deletes_without_scanning(tmp_path):
+    ledger = tmp_path / "usage.json"
+    store = LocalStorage(tmp_path / "objects", ledger)
+    one, two = tmp_path / "one.bin", tmp_path / "two.bin"
+    one.write_bytes(b"x" * 10)
+    two.write_bytes(b"y" * 25)
+    store.put_file("jobs/a/frames/000001/output.png", one)
+    store.put_file("jobs/a/frames/000002/output.png", two)
+    store.put_file("jobs/a/frames/000001/output.png", two)
+    store.put_file("uploads/token", one)
+    assert store.size() == 60
+    assert store.usage("jobs/a") == 50
+
+    store.delete_prefix("jobs/a/frames/000002")
+    assert store.usage("jobs/a") == 25
+    store.delete_prefix("uploads/token")
+    assert store.size() == 25
+
+    store.ledger.add("jobs/a/drift", 999)
+    assert store.reconcile_usage() == 25
+    assert LocalStorage(tmp_path / "objects", ledger).size() == 25
+
+
+def test_reconcile_counts_changes_made_during_the_scan_once(tmp_path):
+    store = LocalStorage(tmp_path / "objects")
+    small, large = tmp_path / "small.bin", tmp_path / "large.bin"
+    small.write_bytes(b"x" * 10)
+    large.write_bytes(b"y" * 25)
+    for key in ("jobs/a/output.png", "jobs/b/output.png", "jobs/d/output.png", "jobs/e/output.png"):
+        store.put_file(key, small)
+    scan = store.scan_usage
+
+    def concurrent_scan():
+        batches = scan()
+        yield next(batches)
+        # Writes and deletes landing behind and ahead of the walk once it has reached jobs/a.
+        store.put_file("jobs/a/later.png", small)
+        store.put_file("jobs/b/output.png", large)
+        store.put_file("jobs/c/output.png", small)
+        store.delete_prefix("jobs/d/output.png")
+        store.delete_prefix("jobs/e")
+        yield from batches
+
+    store.scan_usage = concurrent_scan
+    assert store.reconcile_usage() == 55
+    assert [store.usage(f"jobs/{name}") for name in "abcde"] == [20, 25, 10, 0, 0]
+    assert store.ledger.journal is None
+
+
+def test_upload_digest_rehashes_parts_written_again(tmp_path):
+    data = tmp_path / "data.partial"
+    progress = UploadDigest()
+
+    def write(part: int, chunk: bytes) -> None:
+        whole = progress.candidate(part)
+        with data.open("r+b" if data.exists() else "wb") as output:
+            output.seek((part - 1) * 4)
+            output.write(chunk)
+        if whole:
+            whole.update(chunk)
+        progress.accept(part, whole, len(chunk))
+
+    write(1, b"abcd")
+    write(2, b"efgh")
+    # A resumed upload sends part 1 again with other bytes of the same size.
+    write(1, b"ABCD")
+
+    assert progress.finish(data) == hashlib.sha256(b"ABCDefgh").hexdigest()
+
+
+def test_s3_archive_inspection_reads_only_the_central_directory(tmp_path):
+    project = tmp_path / "project.zip"
+    with ZipFile(project, "w", ZIP_STORED) as archive:
+        archive.writestr("scene/main.blend", b"BLENDER")
+        archive.writestr("textures/huge.exr", os.urandom(4 * 1024**2))
+    data = project.read_bytes()
+
+    class Client:
+        fetched = 0
+
+        def head_object(self, **_kwargs):
+            return {"ContentLength": len(data)}
+
+        def get_object(self, Range, **_kwargs):
+            start, end = (int(x) for x in Range.removeprefix("bytes=").split("-"))
+            Client.fetched += end - start + 1
+            return {"Body": io.BytesIO(data[start:end + 1])}
+
+    with io.BufferedReader(S3RangeReader(Client(), "bucket", "uploads/project"), buffer_size=64 * 1024) as source:
+        archive = inspect_project_archive(source, len(data), 10 * len(data))
+
+    assert archive.blend_path == "scene/main.blend"
+    assert archive.files == ["scene/main.blend", "textures/huge.exr"]
+    assert archive.expanded_size == 4 * 1024**2 + 7
+    assert Client.fetched < 256 * 1024
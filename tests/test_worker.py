@@ -1,10 +1,13 @@
 import io
 import hashlib
+import json
+import os
 import tarfile
 from pathlib import Path
 from types import SimpleNamespace
-from zipfile import ZipFile
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
 
+import httpx
 import pytest
 
 import renderfarm.worker as worker_module
@@ -55,12 +58,13 @@ def test_download_project_closes_stream_without_response_context_manager(tmp_pat
 
     class Response:
         headers = {"content-type": "application/zip"}
+        status_code = 200
         closed = False
 
         def raise_for_status(self):
             return None
 
-        def iter_bytes(self, _size):
+        def iter_bytes(self, _size=None):
             yield package
 
         def close(self):
@@ -76,3 +80,595 @@ def test_download_project_closes_stream_without_response_context_manager(tmp_pat
 
     assert (project / "scene.blend").read_bytes() == b"BLENDER"
     assert response.closed
+
+
+def test_upload_artifact_sends_parts_in_parallel_and_retries(tmp_path: Path, monkeypatch) -> None:
+    frame_dir = tmp_path / "frame-id"
+    frame_dir.mkdir()
+    output = frame_dir / "frame.png"
+    output.write_bytes(b"abcdefghij")
+    monkeypatch.setattr(worker_module.time, "sleep", lambda _seconds: None)
+    received: dict[int, bytes] = {}
+    failures = {2: 1}
+    calls = []
+
+    class Posted:
+        def __init__(self, body):
+            self.body = body
+
+        def json(self):
+            return self.body
+
+    def post(path, body=None, **_kwargs):
+        calls.append((path, body))
+        return Posted({"id": "upload", "backend": "local", "chunk_size": 4, "concurrency": 3})
+
+    def put(url, content, headers):
+        part = int(url.rsplit("/", 1)[1])
+        request = httpx.Request("PUT", url)
+        if failures.get(part):
+            failures[part] -= 1
+            return httpx.Response(503, request=request)
+        assert headers["X-Chunk-SHA256"] == hashlib.sha256(content).hexdigest()
+        received[part] = content
+        return httpx.Response(200, request=request)
+
+    api = SimpleNamespace(base="https://farm.test", post=post, client=SimpleNamespace(put=put), transfers=None)
+
+    assert worker_module.upload_artifact(api, "lease", output, "output", "image/png") == "upload"
+    assert b"".join(received[part] for part in sorted(received)) == b"abcdefghij"
+    assert calls[-1][0].endswith("/uploads/upload/complete")
+
+
+def test_upload_artifact_resumes_only_missing_parts(tmp_path: Path, monkeypatch) -> None:
+    frame_dir = tmp_path / "frame-id"
+    frame_dir.mkdir()
+    output = frame_dir / "frame.png"
+    output.write_bytes(b"abcdefghij")
+    monkeypatch.setattr(worker_module.time, "sleep", lambda _seconds: None)
+    init = {"id": "upload", "backend": "local", "chunk_size": 4, "concurrency": 1}
+    sent = []
+    posted = []
+    listings = []
+    # Part 2 fails every retry of its first round, so the upload has to resume from the listing.
+    failures = {2: worker_module.PART_ATTEMPTS}
+
+    def get(path, **_kwargs):
+        listings.append(path)
+        # Part 3 is listed with bytes from an earlier attempt, so it does not count as received.
+        return SimpleNamespace(json=lambda: {"parts": [{"part_number": part, "size": len(content), "sha256": hashlib.sha256(content if part != 3 else b"old!").hexdigest()} for part, content in sent]})
+
+    def post(path, body=None, **_kwargs):
+        posted.append(path)
+        return SimpleNamespace(json=lambda: init)
+
+    def put(url, content, headers):
+        part = int(url.rsplit("/", 1)[1])
+        if failures.get(part):
+            failures[part] -= 1
+            raise httpx.ConnectError("connection dropped")
+        sent.append((part, content))
+        return httpx.Response(200, request=httpx.Request("PUT", url))
+
+    api = SimpleNamespace(base="https://farm.test", get=get, post=post, client=SimpleNamespace(put=put), transfers=None)
+
+    assert worker_module.upload_artifact(api, "lease", output, "output", "image/png") == "upload"
+    assert listings == ["/api/v1/worker/leases/frame-id/uploads/upload/parts"]
+    # Part 1 arrived before the drop and is not sent again; the mismatching part 3 is.
+    assert sent == [(1, b"abcd"), (3, b"ij"), (2, b"efgh"), (3, b"ij")]
+    assert posted == ["/api/v1/worker/leases/frame-id/uploads", "/api/v1/worker/leases/frame-id/uploads/upload/complete"]
+
+
+def test_download_project_fetches_only_uncached_chunks(tmp_path: Path, monkeypatch) -> None:
+    payload = io.BytesIO()
+    with ZipFile(payload, "w") as archive:
+        archive.writestr("scene.blend", b"BLENDER")
+        archive.writestr("textures/wood.png", b"WOOD" * 1000)
+    package = payload.getvalue()
+    pieces = {hashlib.sha256(piece).hexdigest(): piece for piece in (package[:1500], package[1500:])}
+    cached, fetched = list(pieces)
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    worker_module.chunk_path(cached).parent.mkdir(parents=True)
+    worker_module.chunk_path(cached).write_bytes(pieces[cached])
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/package/manifest"):
+            return httpx.Response(200, json={"chunks": [[sha, len(piece)] for sha, piece in pieces.items()]})
+        requested.append(request.url.path.rsplit("/", 1)[1])
+        return httpx.Response(200, content=pieces[requested[-1]], headers={"content-type": "application/octet-stream"})
+
+    api = worker_module.Api({"server_url": "https://farm.test", "token": "token"})
+    api.client = httpx.Client(transport=httpx.MockTransport(handler))
+    lease = {"frame_id": "frame", "package_sha256": hashlib.sha256(package).hexdigest(), "package_url": "https://farm.test/package", "lease_token": "lease"}
+
+    project = download_project(api, lease)
+
+    assert requested == [fetched]
+    assert (project / "scene.blend").read_bytes() == b"BLENDER"
+    assert worker_module.chunk_path(fetched).read_bytes() == pieces[fetched]
+
+
+class DroppingStream(httpx.SyncByteStream):
+    def __init__(self, body: bytes, drop_after: int | None):
+        self.body = body
+        self.drop_after = drop_after
+
+    def __iter__(self):
+        if self.drop_after is None:
+            yield self.body
+            return
+        yield self.body[:self.drop_after]
+        raise httpx.ReadError("connection dropped")
+
+
+def ranged_package_api(package: bytes, drops: list[int]) -> tuple[worker_module.Api, list[str]]:
+    ranges = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        header = request.headers.get("range")
+        ranges.append(header)
+        if not header:
+            return httpx.Response(200, stream=DroppingStream(package, drops.pop(0) if drops else None))
+        first, _, last = header.removeprefix("bytes=").partition("-")
+        start, end = int(first), int(last) if last else len(package) - 1
+        body = package[start:end + 1]
+        return httpx.Response(206, headers={"content-range": f"bytes {start}-{end}/{len(package)}"}, stream=DroppingStream(body, drops.pop(0) if drops else None))
+
+    api = worker_module.Api({"server_url": "https://farm.test", "token": "token"})
+    api.client = httpx.Client(transport=httpx.MockTransport(handler))
+    return api, ranges
+
+
+def test_download_resumes_with_range_after_dropped_connection(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module.time, "sleep", lambda _seconds: None)
+    package = os.urandom(300_000)
+    api, ranges = ranged_package_api(package, [100_000])
+    target = tmp_path / "project.zip.partial"
+
+    checksum = worker_module.download_package(api, {"package_url": "https://farm.test/package", "lease_token": "lease"}, target)
+
+    assert ranges == [None, "bytes=100000-"]
+    assert checksum == hashlib.sha256(package).hexdigest()
+    assert target.read_bytes() == package
+
+
+def test_download_fetches_parallel_ranges_and_resumes_segments(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module.time, "sleep", lambda _seconds: None)
+    monkeypatch.setattr(worker_module, "SEGMENT_BYTES", 64 * 1024)
+    package = os.urandom(300_000)
+    api, ranges = ranged_package_api(package, [])
+    target = tmp_path / "project.zip.partial"
+    target.write_bytes(package[:140_000])
+
+    checksum = worker_module.download_package(api, {"package_url": "https://farm.test/package", "lease_token": "lease"}, target, threads=3)
+
+    assert checksum == hashlib.sha256(package).hexdigest()
+    assert "bytes=0-65535" not in ranges and "bytes=131072-196607" in ranges
+    assert not target.with_name(target.name + ".json").exists()
+
+
+def test_partial_and_segment_state_are_evicted_together(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(worker_module, "SEGMENT_BYTES", 64 * 1024)
+    package = os.urandom(300_000)
+    target = tmp_path / "downloads" / "abc.zip.partial"
+    target.parent.mkdir()
+    target.write_bytes(b"x" * 1000)
+    os.utime(target, (1000, 1000))
+    state = target.with_name(target.name + ".json")
+    state.write_text(json.dumps({"size": len(package), "done": [0, 1]}))
+
+    assert worker_module.trim_cache(500) == 0
+    assert not list(target.parent.iterdir())
+
+    # A sidecar whose partial is gone is discarded instead of failing every attempt.
+    state.write_text(json.dumps({"size": len(package), "done": [0, 1]}))
+    api, _ranges = ranged_package_api(package, [])
+    checksum = worker_module.download_package(api, {"package_url": "https://farm.test/package", "lease_token": "lease"}, target, threads=2)
+
+    assert checksum == hashlib.sha256(package).hexdigest()
+
+
+class Unseekable(io.RawIOBase):
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+def project_zip(seekable: bool, compression: int = ZIP_DEFLATED) -> tuple[bytes, dict[str, bytes]]:
+    files = {"scene.blend": os.urandom(200_000), "textures/wood.png": b"wood" * 50_000, "textures/empty.txt": b""}
+    output = io.BytesIO() if seekable else Unseekable()
+    with ZipFile(output, "w", compression) as archive:
+        archive.mkdir("caches")
+        for name, data in files.items():
+            with archive.open(name, "w", force_zip64=name == "scene.blend") as entry:
+                entry.write(data)
+    return bytes(output.getvalue() if seekable else output.data), files
+
+
+@pytest.mark.parametrize("seekable", [True, False])
+def test_download_project_extracts_while_downloading(tmp_path: Path, monkeypatch, seekable: bool) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(worker_module, "INLINE_BYTES", 64 * 1024)
+    package, files = project_zip(seekable)
+    api, ranges = ranged_package_api(package, [])
+    lease = {"package_sha256": hashlib.sha256(package).hexdigest(), "package_url": "https://farm.test/package", "lease_token": "lease"}
+
+    project = download_project(api, lease)
+
+    assert ranges == [None]
+    assert {name: (project / name).read_bytes() for name in files} == files
+    assert (project / "caches").is_dir()
+    assert not list(tmp_path.rglob("*.zip*"))
+
+
+@pytest.mark.parametrize("drops, compression", [([150_000], ZIP_DEFLATED), ([], ZIP_STORED)])
+def test_download_project_resumes_a_failed_stream(tmp_path: Path, monkeypatch, drops: list[int], compression: int) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(worker_module.time, "sleep", lambda _seconds: None)
+    # Stored entries written without seeking carry no length and cannot be streamed.
+    package, files = project_zip(False, compression)
+    api, ranges = ranged_package_api(package, drops)
+    lease = {"package_sha256": hashlib.sha256(package).hexdigest(), "package_url": "https://farm.test/package", "lease_token": "lease"}
+
+    received = drops[0] if drops else len(package)
+
+    project = download_project(api, lease)
+
+    # The bytes streamed before the failure are kept, so only the rest is requested again.
+    assert ranges == [None, f"bytes={received}-"]
+    assert {name: (project / name).read_bytes() for name in files} == files
+    assert not list((tmp_path / "downloads").iterdir())
+
+
+@pytest.mark.parametrize("name", ["../escape.txt", "C:/Windows/escape.txt", "C:escape.txt", "//server/share/escape.txt"])
+def test_extract_stream_rejects_unsafe_paths(tmp_path: Path, name: str) -> None:
+    payload = io.BytesIO()
+    with ZipFile(payload, "w") as archive:
+        archive.writestr(name, b"nope")
+    reader = worker_module.StreamReader(iter([payload.getvalue()]))
+
+    with pytest.raises(WorkerError, match="unsafe path"):
+        worker_module.extract_stream(reader, tmp_path / "project")
+    reader.close()
+    assert not (tmp_path / "escape.txt").exists()
+
+
+@pytest.mark.parametrize("name", ["C:/Windows/escape.txt", "C:escape.txt"])
+def test_blob_extraction_rejects_drive_paths(tmp_path: Path, monkeypatch, name: str) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path / "cache")
+    archive = tmp_path / "project.zip"
+    with ZipFile(archive, "w") as source:
+        source.writestr("scene.blend", b"blend")
+        source.writestr(name, b"nope")
+
+    with pytest.raises(WorkerError, match="unsafe path"):
+        worker_module.safe_extract_zip(archive, tmp_path / "project", blobs=True)
+    with pytest.raises(WorkerError, match="unsafe path"):
+        worker_module.member_path(tmp_path / "project", name)
+    assert not list((tmp_path / "project").rglob("*escape*"))
+
+
+def test_prefetch_project_fills_cache_only_within_budget(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    package, files = project_zip(True)
+    api, ranges = ranged_package_api(package, [])
+    checksum = hashlib.sha256(package).hexdigest()
+    current = tmp_path / "projects" / "current"
+    current.mkdir(parents=True)
+    (current / ".ready").write_text("current")
+    worker_module.cache_index().pins["current"] = "projects/current"
+    upcoming = {"sha256": checksum, "expanded_size": 2 * 1024**3, "url": "https://farm.test/api/v1/worker/packages/" + checksum}
+
+    worker_module.prefetch_project(api, {"cache_gb": 1}, upcoming)
+    assert ranges == [] and not (tmp_path / "projects" / checksum).exists()
+
+    worker_module.prefetch_project(api, {"cache_gb": 1}, {**upcoming, "expanded_size": 1024**2})
+    assert ranges == [None]
+    assert (tmp_path / "projects" / checksum / "scene.blend").read_bytes() == files["scene.blend"]
+    assert (current / ".ready").exists()
+    assert worker_module.cache_index().load()["blobs"]["size"] == sum(len(data) for data in files.values())
+
+
+def test_trim_cache_uses_index_and_rebuilds_it_when_missing(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    for age, name in enumerate(["old", "pinned", "recent"]):
+        project = tmp_path / "projects" / name
+        project.mkdir(parents=True)
+        (project / "scene.blend").write_bytes(b"x" * 1000)
+        (project / ".ready").write_text(name)
+        os.utime(project / ".ready", (1000 + age, 1000 + age))
+    index = worker_module.cache_index()
+    index.pins["current"] = "projects/pinned"
+
+    assert set(index.load()) == {"projects/old", "projects/pinned", "projects/recent", "blobs"}
+    assert json.loads((tmp_path / "index.json").read_text())["entries"]["projects/old"]["size"] == 1003
+    # Once indexed, trimming never walks the project trees.
+    monkeypatch.setattr(worker_module, "owned_size", lambda _folder: pytest.fail("walked the cache"))
+    assert worker_module.trim_cache(2100) == 2012
+    assert sorted(p.name for p in (tmp_path / "projects").iterdir()) == ["pinned", "recent"]
+    assert worker_module.trim_cache(1500) == 1006
+    assert [p.name for p in (tmp_path / "projects").iterdir()] == ["pinned"]
+
+
+def versioned_project(tmp_path: Path, monkeypatch, blend: bytes, texture: bytes) -> Path:
+    payload = io.BytesIO()
+    with ZipFile(payload, "w", ZIP_DEFLATED) as archive:
+        archive.writestr("scene.blend", blend)
+        archive.writestr("textures/wood.png", texture)
+    package = payload.getvalue()
+    api, _ranges = ranged_package_api(package, [])
+    return download_project(api, {"package_sha256": hashlib.sha256(package).hexdigest(), "package_url": "https://farm.test/package", "lease_token": "lease"})
+
+
+def test_project_versions_share_files_through_blob_store(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    texture = os.urandom(100_000)
+    first = versioned_project(tmp_path, monkeypatch, b"BLEND v1", texture)
+    second = versioned_project(tmp_path, monkeypatch, b"BLEND v2", texture)
+
+    shared = (second / "textures" / "wood.png").stat()
+    assert shared.st_ino == (first / "textures" / "wood.png").stat().st_ino and shared.st_nlink == 3
+    assert not shared.st_mode & 0o222
+    index = worker_module.cache_index()
+    assert index.load()["blobs"]["size"] == len(texture) + 16
+
+    assert worker_module.trim_cache(len(texture) + 8) == len(texture) + 8
+    assert not first.exists() and (second / "textures" / "wood.png").read_bytes() == texture
+    assert worker_module.trim_cache(0) == 0
+    assert not list((tmp_path / "blobs").glob("??/*"))
+
+
+def test_project_files_are_written_in_place_without_hardlinks(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setitem(worker_module.hardlink_support, tmp_path, False)
+    project = versioned_project(tmp_path, monkeypatch, b"BLEND", b"wood" * 1000)
+
+    assert (project / "textures" / "wood.png").stat().st_nlink == 1
+    assert not list((tmp_path / "blobs").glob("??/*"))
+    assert worker_module.cache_index().load()[f"projects/{project.name}"]["size"] == 4005
+
+
+def test_project_is_fetched_from_lan_peer_and_verified(tmp_path: Path, monkeypatch) -> None:
+    package, files = project_zip(True)
+    checksum = hashlib.sha256(package).hexdigest()
+    lease = {"package_sha256": checksum, "package_url": "https://farm.test/package", "lease_token": "lease"}
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path / "sharing")
+    sharing_api, _ranges = ranged_package_api(package, [])
+    download_project(sharing_api, lease, keep_archive=True)
+    assert worker_module.package_archive(checksum).read_bytes() == package
+    assert worker_module.peer_capabilities({"server_url": "https://farm.test", "peer_port": 8765, "peer_host": "127.0.0.1"})["packages"] == [checksum]
+    server = worker_module.start_peer_server(0, tmp_path / "sharing", host="127.0.0.1")
+    server.secret = "peer-secret"
+    peers = ["http://127.0.0.1:9", f"http://127.0.0.1:{server.server_port}"]
+    try:
+        monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path / "fetching")
+        api, ranges = ranged_package_api(package, [])
+        api.peer_secret = "peer-secret"
+        project = download_project(api, {**lease, "package_peers": peers})
+        assert ranges == []
+        assert {name: (project / name).read_bytes() for name in files} == files
+
+        # A peer that refuses the secret, or is unreachable, leaves the server as the source,
+        # and the partial download from an earlier attempt is resumed rather than overwritten.
+        monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path / "refused")
+        partial = tmp_path / "refused" / "downloads" / f"{checksum}.zip.partial"
+        partial.parent.mkdir(parents=True)
+        partial.write_bytes(package[:100_000])
+        api, ranges = ranged_package_api(package, [])
+        api.peer_secret = "wrong"
+        project = download_project(api, {**lease, "package_peers": peers})
+        assert ranges == ["bytes=100000-"]
+        assert (project / "scene.blend").read_bytes() == files["scene.blend"]
+    finally:
+        server.shutdown()
+
+
+class RenderingBlender:
+    """Stands in for the Blender process: writes frame 1, reports it, then crashes before frame 2."""
+
+    def __init__(self, command, **kwargs):
+        manifest = json.loads(Path(command[-1]).read_text())
+        first = manifest["frames"][0]
+        Path(first["output"]).write_bytes(b"png")
+        telemetry = {"frame": first["frame"], "sync_seconds": 0.5, "render_seconds": 2.0, "save_seconds": 0.25, "peak_memory_bytes": None}
+        self.stdout = iter([f"Blend Farm: rendering frame {first['frame']} (1/2)\n", "Blend Farm: telemetry " + json.dumps(telemetry) + "\n", f"Blend Farm: frame {first['frame']} rendered in 2.75s\n", "Segmentation fault\n"])
+
+    def wait(self, timeout=None) -> int:
+        return -11
+
+    def poll(self) -> int:
+        return -11
+
+
+def test_render_batch_completes_written_frames_and_fails_the_rest(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(worker_module, "ensure_blender", lambda version: tmp_path / "blender")
+    monkeypatch.setattr(worker_module, "download_project", lambda *args: tmp_path / "project")
+    monkeypatch.setattr(worker_module.subprocess, "Popen", RenderingBlender)
+    uploaded = []
+    monkeypatch.setattr(worker_module, "upload_artifact", lambda api, token, path, kind, content_type, concurrency: uploaded.append((token, kind)) or f"{token}-{kind}")
+    posted = []
+    api = SimpleNamespace(post=lambda path, payload, headers=None: posted.append((path, payload)))
+    leases = [{"frame_id": f"f{n}", "frame": n, "lease_token": f"t{n}", "output_format": "PNG", "job_id": "job", "blender_version": "4.2", "blend_path": "scene.blend", "package_sha256": "a" * 64} for n in (1, 2)]
+
+    worker_module.render_batch(api, {}, leases)
+    assert uploaded == [("t1", "output")]
+    assert [path for path, _ in posted] == ["/api/v1/worker/leases/f1/complete", "/api/v1/worker/leases/f2/fail"]
+    assert posted[0][1]["output_upload_id"] == "t1-output" and posted[0][1]["preview_upload_id"] is None
+    assert posted[0][1]["duration_seconds"] == 2.75
+    assert set(posted[0][1]["telemetry"]) == {"sync_seconds", "render_seconds", "save_seconds", "load_seconds"}
+    assert "code -11" in posted[1][1]["error"] and "Segmentation fault" in posted[1][1]["logs"]
+    assert not (tmp_path / "outputs" / "f1").exists()
+
+
+launches: list = []
+
+
+class ResidentBlender:
+    """Stands in for ``blender_runner.py --serve``: renders each manifest written to stdin."""
+
+    def __init__(self, command, **kwargs):
+        self.command, self.pid, self.pending, self.batches, self.closed = command, 1, [], [], False
+        self.stdin = self.stdout = self
+        launches.append(self)
+
+    def write(self, text: str) -> None:
+        self.batches.append(json.loads(text))
+        for item in self.batches[-1]["frames"]:
+            Path(item["output"]).write_bytes(b"png")
+            telemetry = {"frame": item["frame"], "sync_seconds": 0.1, "render_seconds": 0.8, "save_seconds": 0.1, "peak_memory_bytes": 1024}
+            self.pending += [f"Blend Farm: rendering frame {item['frame']}\n", "Blend Farm: telemetry " + json.dumps(telemetry) + "\n", f"Blend Farm: frame {item['frame']} rendered in 1.00s\n"]
+        self.pending.append("Blend Farm: batch finished\n")
+
+    def flush(self) -> None:
+        return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.pending:
+            raise StopIteration
+        return self.pending.pop(0)
+
+    def poll(self) -> int | None:
+        return 0 if self.closed else None
+
+    def close(self) -> None:
+        self.closed = True
+
+    def wait(self, timeout=None) -> int:
+        return 0
+
+
+def resident_worker(tmp_path: Path, monkeypatch) -> list[str]:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(worker_module, "resident_blenders", {})
+    monkeypatch.setattr(worker_module, "ensure_blender", lambda version: tmp_path / "blender")
+    monkeypatch.setattr(worker_module, "download_project", lambda *args: tmp_path / "project")
+    monkeypatch.setattr(worker_module.subprocess, "Popen", ResidentBlender)
+    monkeypatch.setattr(worker_module, "upload_artifact", lambda api, token, path, kind, content_type, concurrency: f"{token}-{kind}")
+    launches.clear()
+    return []
+
+
+def batch(sha: str, *frames: int) -> list[dict]:
+    return [{"frame_id": f"{sha}{n}", "frame": n, "lease_token": f"t{n}", "output_format": "PNG", "job_id": "job", "blender_version": "4.2", "blend_path": "scene.blend", "package_sha256": sha * 64} for n in frames]
+
+
+def test_persistent_blender_is_reused_until_the_package_changes(tmp_path: Path, monkeypatch) -> None:
+    posted = resident_worker(tmp_path, monkeypatch)
+    api = SimpleNamespace(post=lambda path, payload, headers=None: posted.append(path))
+
+    for leases in (batch("a", 1, 2), batch("a", 3), batch("b", 1)):
+        worker_module.render_batch(api, {"persistent_blender": True}, leases)
+    assert len(launches) == 2 and launches[0].closed and not launches[1].closed
+    assert launches[0].command[-1] == "--serve" and "--python-exit-code" in launches[0].command
+    assert posted == [f"/api/v1/worker/leases/{frame_id}/complete" for frame_id in ("a1", "a2", "a3", "b1")]
+    worker_module.close_blender_server()
+    assert launches[1].closed and worker_module.resident_blenders == {}
+
+
+def test_only_a_freshly_launched_blender_reports_the_scene_load(tmp_path: Path, monkeypatch) -> None:
+    posted = resident_worker(tmp_path, monkeypatch)
+    api = SimpleNamespace(post=lambda path, payload, headers=None: posted.append((path, payload)))
+
+    for leases in (batch("a", 1, 2), batch("a", 3)):
+        worker_module.render_batch(api, {"persistent_blender": True}, leases)
+    assert len(launches) == 1
+    assert ["load_seconds" in payload["telemetry"] for _path, payload in posted] == [True, False, False]
+    assert posted[2][1]["telemetry"]["peak_memory_bytes"] == 1024
+    worker_module.close_blender_server()
+
+
+def test_persistent_blender_restarts_for_a_new_blender_version(tmp_path: Path, monkeypatch) -> None:
+    posted = resident_worker(tmp_path, monkeypatch)
+    api = SimpleNamespace(post=lambda path, payload, headers=None: posted.append(path))
+    upgraded = [{**lease, "blender_version": "4.3"} for lease in batch("a", 2)]
+
+    for leases in (batch("a", 1), upgraded):
+        worker_module.render_batch(api, {"persistent_blender": True}, leases)
+    assert len(launches) == 2 and launches[0].closed and not launches[1].closed
+    worker_module.close_blender_server()
+
+
+def test_render_slots_pin_their_gpu_and_project(tmp_path: Path, monkeypatch) -> None:
+    posted = resident_worker(tmp_path, monkeypatch)
+    api = SimpleNamespace(post=lambda path, payload, headers=None: posted.append(path))
+
+    worker_module.render_batch(api, {"persistent_blender": True}, batch("a", 1), 0)
+    worker_module.render_batch(api, {"persistent_blender": True}, batch("b", 1), 1)
+    assert len(launches) == 2 and not any(server.closed for server in launches)
+    assert [server.batches[0]["device_slot"] for server in launches] == [0, 1]
+    pins = worker_module.cache_index().pins
+    assert pins["slot-0"] == "projects/" + "a" * 64 and pins["slot-1"] == "projects/" + "b" * 64
+    worker_module.close_blender_server()
+    assert all(server.closed for server in launches)
+
+
+def test_capabilities_reuse_the_last_probe(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(worker_module, "probed", {})
+    probes = []
+    monkeypatch.setattr(worker_module.subprocess, "run", lambda command, **kwargs: probes.append(command[0]) or SimpleNamespace(returncode=0, stdout="Tesla T4\n"))
+    disk = iter([100, 40])
+    monkeypatch.setattr(worker_module.shutil, "disk_usage", lambda path: SimpleNamespace(free=next(disk)))
+
+    first = worker_module.capabilities("CUDA", 5)
+    second = worker_module.capabilities("CUDA", 5, 2)
+    assert probes == ["nvidia-smi"]
+    assert (first["gpu"], first["free_disk_bytes"], second["free_disk_bytes"], second["slots"]) == ("Tesla T4", 100, 100, 2)
+    worker_module.refresh_free_disk()
+    assert worker_module.capabilities("CUDA")["free_disk_bytes"] == 40 and probes == ["nvidia-smi"]
+
+
+def test_ensure_blender_remembers_the_installed_version(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(worker_module, "installed_blender", {})
+    monkeypatch.setattr(worker_module.platform, "system", lambda: "Linux")
+    monkeypatch.setattr(worker_module.platform, "machine", lambda: "x86_64")
+    install = tmp_path / "blenders" / "4.2.3"
+    install.mkdir(parents=True)
+    (install / "blender").write_text("")
+    (install / ".version").write_text("4.2.3")
+
+    assert worker_module.ensure_blender("4.2.3") == install / "blender"
+    (install / ".version").unlink()
+    assert worker_module.ensure_blender("4.2.3") == install / "blender"
+    assert worker_module.installed_blender == {tmp_path: "4.2.3"}
+
+
+def test_previous_blender_is_kept_until_its_last_batch_finishes(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_module, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(worker_module, "installed_blender", {})
+    monkeypatch.setattr(worker_module, "blender_users", {})
+    monkeypatch.setattr(worker_module.platform, "system", lambda: "Linux")
+    monkeypatch.setattr(worker_module.platform, "machine", lambda: "x86_64")
+
+    def install(version: str, installed_at: int) -> Path:
+        path = tmp_path / "blenders" / version
+        path.mkdir(parents=True)
+        (path / "blender").write_text("")
+        (path / ".version").write_text(version)
+        os.utime(path / ".version", (installed_at, installed_at))
+        return path
+
+    previous = install("4.2.3", 1000)
+    blender = worker_module.hold_blender("4.2.3")
+    # Another slot installs the farm's new version while this batch still renders.
+    current = install("4.3.0", 2000)
+    with worker_module.blender_install_lock:
+        worker_module.remove_unused_blenders()
+    assert blender.exists()
+
+    worker_module.release_blender(blender)
+    assert not previous.exists() and current.exists()
+    assert worker_module.blender_users == {}